@@ -0,0 +1,326 @@
+#!/usr/bin/python3
+# -.- coding: utf-8 -.-
+# -.- dependencies: Python 3.8+ -.-
+
+"""
+Generates a synthetic (but realistically shaped) Saltarelle javascript file and matching Doxygen C{all.xml} file for benchmarking.
+
+Most classes have a constructor, static factory methods (some of them generic), properties (with getters and setters) and instance
+methods whose bodies refer to other classes.  Most extend another class and some implement an interface.  Every so often a class is
+instead an interface, an enum or a generic class.  The file also contains global functions and static initialization blocks.  Only
+the line shapes which C{read_js} accepts are generated, and the output is entirely determined by the arguments.
+"""
+
+import argparse, os
+from typing import List, Optional, Tuple
+
+SEPARATOR = "\t////////////////////////////////////////////////////////////////////////////////\n"
+
+
+def class_names(classes: int, per_namespace: int) -> List[Tuple[str, str]]:
+    """
+    Returns the namespace and name of each class.
+    """
+    return [("Bench%d.Model" % (i // per_namespace), "Item%d" % i) for i in range(classes)]
+
+
+def class_kinds(classes: int, interfaces: int, enums: int, generics: int) -> List[str]:
+    """
+    Returns the kind of each class, where every Nth class is an interface, enum or generic class (0 for none).
+    """
+    kinds = []
+    for i in range(1, classes + 1):
+        if interfaces and i % interfaces == 0:
+            kinds.append("interface")
+        elif enums and i % enums == 0:
+            kinds.append("enum")
+        elif generics and i % generics == 0:
+            kinds.append("generic")
+        else:
+            kinds.append("class")
+    return kinds
+
+
+def var_id(namespace: str, name: str) -> str:
+    """
+    Returns the variable name Saltarelle uses to refer to the specified class.
+    """
+    return "$%s_%s" % (namespace.replace(".", "_"), name)
+
+
+def doc_id(namespace: str, name: str) -> str:
+    """
+    Returns the ID Doxygen uses to refer to the specified class.
+    """
+    return "class_%s_1_1%s" % (namespace.lower().replace(".", "_1_1"), name.lower())
+
+
+class Corpus:
+    """
+    The shape of a synthetic corpus (see L{write_corpus}).
+    """
+
+    def __init__(self, classes: int, props: int, methods: int, body: int, per_namespace: int, interfaces: int, enums: int, generics: int):
+        self.names = class_names(classes, per_namespace)
+        """ The namespace and name of each class. """
+
+        self.kinds = class_kinds(classes, interfaces, enums, generics)
+        """ The kind of each class. """
+
+        self.props = props
+        """ The number of properties per class. """
+
+        self.methods = methods
+        """ The number of instance methods per class. """
+
+        self.body = body
+        """ The number of lines in the body of each method (not counting the return). """
+
+    def base(self, i: int) -> Optional[int]:
+        """
+        Returns the position of the base class of the class at the specified position (None if it has no base class).
+        """
+        if i % 4 == 0:
+            return None
+        for pos in range(i - 1, -1, -1):
+            if self.kinds[pos] == "class":
+                return pos
+        return None
+
+    def interface(self, i: int) -> Optional[int]:
+        """
+        Returns the position of the interface implemented by the class at the specified position (None if it implements none).
+        """
+        if i % 3 == 0:
+            for pos in range(i - 1, -1, -1):
+                if self.kinds[pos] == "interface":
+                    return pos
+        return None
+
+
+def write_js(filename: str, corpus: Corpus, global_blocks: int) -> None:
+    """
+    Writes the synthetic javascript file.
+    """
+    names = corpus.names
+    with open(filename, "w") as fil:
+        fil.write("(function() {\n\t'use strict';\n\tvar $asm = {};\n")
+        for namespace in sorted({namespace for namespace, _ in names}):
+            parts = namespace.split(".")
+            for i in range(1, len(parts) + 1):
+                fil.write("\tglobal.%s = global.%s || {};\n" % (".".join(parts[:i]), ".".join(parts[:i])))
+        fil.write("\tss.initAssembly($asm, 'Bench.Lib');\n")
+
+        for i, (namespace, name) in enumerate(names):
+            vid = var_id(namespace, name)
+            kind = corpus.kinds[i]
+            fil.write(SEPARATOR)
+            fil.write("\t// %s.%s\n" % (namespace, name))
+
+            if kind == "generic":
+                fil.write("\tvar %s = function(T) {\n\t\tvar $type = function() {\n" % vid)
+                fil.write("\t\t\tthis.value = ss.getDefaultValue(T);\n\t\t};\n\t\treturn $type;\n\t};\n")
+                fil.write("\t%s.__typeName = '%s.%s$1';\n" % (vid, namespace, name))
+                fil.write("\tglobal.%s.%s$1 = %s;\n" % (namespace, name, vid))
+                continue
+
+            if kind in ("interface", "enum"):
+                fil.write("\tvar %s = function() {\n\t};\n" % vid)
+                fil.write("\t%s.__typeName = '%s.%s';\n" % (vid, namespace, name))
+                fil.write("\tglobal.%s.%s = %s;\n" % (namespace, name, vid))
+                continue
+
+            fil.write("\tvar %s = function(name, count) {\n" % vid)
+            if (base := corpus.base(i)) is not None:
+                fil.write("\t\t%s.call(this, name, count);\n" % var_id(*names[base]))
+            for j in range(corpus.props):
+                fil.write("\t\tthis.$prop%d = null;\n" % j)
+            fil.write("\t\tthis.$name = name;\n\t\tthis.$count = count;\n\t};\n")
+            fil.write("\t%s.__typeName = '%s.%s';\n" % (vid, namespace, name))
+            fil.write("\t%s.create = function(name) {\n\t\treturn new %s(name, 0);\n\t};\n" % (vid, vid))
+            fil.write("\t%s.convert = function(T) {\n\t\treturn function(value) {\n" % vid)
+            fil.write("\t\t\treturn ss.cast(value, T);\n\t\t};\n\t};\n")
+            fil.write("\tglobal.%s.%s = %s;\n" % (namespace, name, vid))
+
+        for i in range(global_blocks):
+            namespace, name = names[i * len(names) // global_blocks]
+            fil.write("\tglobal.%s.Run%d = function() {\n" % (namespace, i))
+            fil.write("\t\t%s.create('run%d');\n\t};\n" % (var_id(namespace, name), i))
+
+        for i, (namespace, name) in enumerate(names):
+            vid = var_id(namespace, name)
+            kind = corpus.kinds[i]
+
+            if kind == "generic":
+                fil.write("\tss.initGenericClass(%s, $asm, 1);\n" % vid)
+                continue
+
+            if kind == "interface":
+                members = ", ".join("get_prop%d: null" % j for j in range(corpus.props))
+                fil.write("\tss.initInterface(%s, $asm, { %s });\n" % (vid, members))
+                continue
+
+            if kind == "enum":
+                members = ", ".join("value%d: %d" % (j, j) for j in range(max(corpus.props, 1)))
+                fil.write("\tss.initEnum(%s, $asm, { %s });\n" % (vid, members))
+                continue
+
+            members = []
+            for j in range(corpus.props):
+                members.append("\t\tget_prop%d: function() {\n\t\t\treturn this.$prop%d;\n\t\t}" % (j, j))
+                members.append("\t\tset_prop%d: function(value) {\n\t\t\tthis.$prop%d = value;\n\t\t}" % (j, j))
+            for j in range(corpus.methods):
+                other = var_id(*names[(i * 7 + j * 13 + 3) % len(names)])
+                lines = ["\t\t\tvar item%d = %s.create(this.$name + a);" % (k, other) for k in range(corpus.body)]
+                lines.append("\t\t\treturn ss.cast(item0, %s) || b;" % other if corpus.body else "\t\t\treturn b;")
+                members.append("\t\tmethod%d: function(a, b) {\n%s\n\t\t}" % (j, "\n".join(lines)))
+
+            base = corpus.base(i)
+            interface = corpus.interface(i)
+            ending = ", %s" % var_id(*names[base]) if base is not None else ""
+            if interface is not None:
+                ending = "%s, [%s]" % (ending or ", null", var_id(*names[interface]))
+
+            if members:
+                fil.write("\tss.initClass(%s, $asm, {\n%s\n\t}%s);\n" % (vid, ",\n".join(members), ending))
+            else:
+                fil.write("\tss.initClass(%s, $asm, {}%s);\n" % (vid, ending))
+
+        fil.write("\t(function() {\n")
+        for i, (namespace, name) in enumerate(names):
+            if corpus.kinds[i] == "class":
+                fil.write("\t\t%s.total = 0;\n" % var_id(namespace, name))
+        fil.write("\t\tconsole.log('init');\n\t})();\n")
+        fil.write("})();\n")
+
+
+def write_xml(filename: str, corpus: Corpus) -> None:
+    """
+    Writes the synthetic Doxygen C{all.xml} file.  Enums (which Doxygen does not document as classes) are not included.
+    """
+    names = corpus.names
+    with open(filename, "w") as fil:
+        fil.write('<?xml version="1.0"?>\n<doxygen>\n')
+
+        for i, (namespace, name) in enumerate(names):
+            kind = corpus.kinds[i]
+            if kind == "enum":
+                continue
+
+            other_ns, other = names[(i * 7 + 3) % len(names)]
+            ref = '<ref refid="%s">%s</ref>' % (doc_id(other_ns, other), other)
+            fil.write('<compounddef id="%s" kind="%s" prot="public">\n' % (doc_id(namespace, name), "interface" if kind == "interface" else "class"))
+            fil.write("  <compoundname>%s::%s</compoundname>\n" % (namespace.replace(".", "::"), name))
+            if kind == "class" and (base := corpus.base(i)) is not None:
+                fil.write('  <basecompoundref refid="%s">%s</basecompoundref>\n' % (doc_id(*names[base]), names[base][1]))
+
+            fil.write('  <sectiondef kind="property">\n')
+            for j in range(corpus.props if kind != "generic" else 0):
+                typ = ("int", "string", "bool", "List&lt; %s &gt;" % ref)[j % 4]
+                fil.write('    <memberdef kind="property" id="p%d_%d" prot="public" static="no">\n' % (i, j))
+                fil.write("      <type>%s</type><name>Prop%d</name>" % (typ, j))
+                fil.write("<briefdescription><para>Property %d.</para></briefdescription>\n    </memberdef>\n" % j)
+            if kind == "class":
+                fil.write('    <memberdef kind="variable" id="t%d" prot="public" static="yes">\n' % i)
+                fil.write("      <type>int</type><name>total</name><briefdescription/>\n    </memberdef>\n")
+            fil.write("  </sectiondef>\n")
+
+            if kind != "class":
+                fil.write("</compounddef>\n")
+                continue
+
+            fil.write('  <sectiondef kind="public-func">\n')
+            fil.write('    <memberdef kind="function" id="c%d" prot="public" static="no">\n' % i)
+            fil.write("      <type></type><name>%s</name><briefdescription/>\n" % name)
+            fil.write("      <param><type>string</type><declname>name</declname></param>\n")
+            fil.write("      <param><type>int</type><declname>count</declname></param>\n    </memberdef>\n")
+            fil.write('    <memberdef kind="function" id="f%d" prot="public" static="yes">\n' % i)
+            fil.write('      <type><ref refid="%s">%s</ref></type><name>Create</name><briefdescription/>\n' % (doc_id(namespace, name), name))
+            fil.write("      <param><type>string</type><declname>name</declname></param>\n    </memberdef>\n")
+            fil.write('    <memberdef kind="function" id="g%d" prot="public" static="yes">\n' % i)
+            fil.write("      <type>T</type><name>Convert&lt; T &gt;</name><briefdescription/>\n")
+            fil.write("      <param><type>params object[]</type><declname>value</declname></param>\n    </memberdef>\n")
+            for j in range(corpus.methods):
+                fil.write('    <memberdef kind="function" id="m%d_%d" prot="public" static="no">\n' % (i, j))
+                fil.write("      <type>%s</type><name>Method%d</name>" % (ref, j))
+                fil.write("<briefdescription><para>Method %d.</para></briefdescription>\n" % j)
+                fil.write("      <param><type>string</type><declname>a</declname></param>\n")
+                fil.write("      <param><type>double?</type><declname>b</declname></param>\n    </memberdef>\n")
+            fil.write("  </sectiondef>\n</compounddef>\n")
+
+        fil.write("</doxygen>\n")
+
+
+def write_corpus(
+    out_dir: str,
+    classes: int = 5000,
+    props: int = 4,
+    methods: int = 4,
+    body: int = 4,
+    per_namespace: int = 50,
+    interfaces: int = 20,
+    enums: int = 25,
+    generics: int = 30,
+    global_blocks: int = 10,
+) -> Tuple[str, str]:
+    """
+    Writes a synthetic javascript file and Doxygen file to the specified directory.
+
+    @param out_dir: The directory to write to (created if it doesn't already exist)
+    @param classes: The number of classes (including interfaces, enums and generic classes)
+    @param props: The number of properties per class
+    @param methods: The number of instance methods per class
+    @param body: The number of lines in the body of each instance method (not counting the return)
+    @param per_namespace: The number of classes per namespace
+    @param interfaces: Every Nth class is an interface (0 for none)
+    @param enums: Every Nth class is an enum (0 for none)
+    @param generics: Every Nth class is a generic class (0 for none)
+    @param global_blocks: The number of global functions
+    @return: The javascript filename followed by the Doxygen filename
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    corpus = Corpus(classes, props, methods, body, per_namespace, interfaces, enums, generics)
+    js_file = os.path.join(out_dir, "bench.js")
+    xml_file = os.path.join(out_dir, "all.xml")
+    write_js(js_file, corpus, global_blocks)
+    write_xml(xml_file, corpus)
+    return js_file, xml_file
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Adds the arguments which control the shape of the corpus to the specified parser (see L{corpus_args}).
+    """
+    parser.add_argument("--classes", type=int, default=5000, help="The number of classes (default 5000)")
+    parser.add_argument("--props", type=int, default=4, help="The number of properties per class (default 4)")
+    parser.add_argument("--methods", type=int, default=4, help="The number of instance methods per class (default 4)")
+    parser.add_argument("--body", type=int, default=4, help="The number of lines per method body (default 4)")
+    parser.add_argument("--interfaces", type=int, default=20, help="Every Nth class is an interface (default 20, 0 for none)")
+    parser.add_argument("--enums", type=int, default=25, help="Every Nth class is an enum (default 25, 0 for none)")
+    parser.add_argument("--generics", type=int, default=30, help="Every Nth class is a generic class (default 30, 0 for none)")
+    parser.add_argument("--global-blocks", type=int, default=10, help="The number of global functions (default 10)")
+
+
+def corpus_args(args: argparse.Namespace) -> dict:
+    """
+    Returns the keyword arguments for L{write_corpus} from the arguments parsed by a parser set up by L{add_arguments}.
+    """
+    return {
+        "classes": args.classes,
+        "props": args.props,
+        "methods": args.methods,
+        "body": args.body,
+        "interfaces": args.interfaces,
+        "enums": args.enums,
+        "generics": args.generics,
+        "global_blocks": args.global_blocks,
+    }
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser(description="Generates a synthetic salt2type benchmark corpus")
+    PARSER.add_argument("OUTDIR", help="The folder to write bench.js and all.xml to")
+    add_arguments(PARSER)
+    ARGS = PARSER.parse_args()
+
+    print("\n".join(write_corpus(ARGS.OUTDIR, **corpus_args(ARGS))))
@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+# -.- coding: utf-8 -.-
+# -.- dependencies: Python 3.8+ -.-
+
+"""
+Measures the memory used by the model built by C{read_js}, C{read_doc} and C{add_doc_info} for a synthetic corpus (see L{corpus}).
+
+Each checkout being measured is run in its own process, so this can compare the current checkout against a baseline checkout of an
+earlier revision (e.g. one created with C{git worktree add /tmp/baseline HEAD~1}).
+"""
+
+import argparse, json, os, subprocess, sys, tempfile, time, tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import add_arguments, corpus_args, write_corpus  # pylint: disable=wrong-import-position
+
+MB = 1024 * 1024
+
+
+def measure(src_dir: str, js_file: str, xml_file: str) -> dict:
+    """
+    Builds the model from the specified files using the C{src} package found in the specified checkout, and returns the memory used.
+    """
+    sys.path.insert(0, src_dir)
+    from src import read_js, read_doc, add_doc_info  # pylint: disable=import-outside-toplevel
+
+    results = {}
+    start = time.time()
+    tracemalloc.start()
+
+    _, classes, _ = read_js(js_file, None)
+    results["read_js"] = tracemalloc.get_traced_memory()[0] / MB
+
+    types = read_doc(xml_file)
+    results["read_doc"] = tracemalloc.get_traced_memory()[0] / MB - results["read_js"]
+
+    add_doc_info(classes, types)
+    del types
+    results["model"] = tracemalloc.get_traced_memory()[0] / MB
+    results["peak"] = tracemalloc.get_traced_memory()[1] / MB
+    results["seconds"] = time.time() - start
+
+    return results
+
+
+def run(src_dir: str, js_file: str, xml_file: str) -> dict:
+    """
+    Runs L{measure} in a new process.
+    """
+    output = subprocess.check_output([sys.executable, __file__, "--measure", src_dir, js_file, xml_file])
+    return json.loads(output)
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser(description="Measures the memory used by the salt2type model for a synthetic corpus")
+    add_arguments(PARSER)
+    PARSER.add_argument("--baseline", help="Another checkout (e.g. of an earlier revision) to compare against")
+    PARSER.add_argument("--measure", nargs=3, metavar=("SRCDIR", "JSFILE", "XMLFILE"), help=argparse.SUPPRESS)
+    ARGS = PARSER.parse_args()
+
+    if ARGS.measure:
+        print(json.dumps(measure(*ARGS.measure)))
+        sys.exit(0)
+
+    CHECKOUTS = [("current", os.path.dirname(os.path.dirname(os.path.abspath(__file__))))]
+    if ARGS.baseline:
+        CHECKOUTS.insert(0, ("baseline", os.path.abspath(ARGS.baseline)))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        JS_FILE, XML_FILE = write_corpus(tmp_dir, **corpus_args(ARGS))
+        print("%d classes (%.1f MB javascript, %.1f MB xml)" % (ARGS.classes, os.path.getsize(JS_FILE) / MB, os.path.getsize(XML_FILE) / MB))
+        print("%-10s %12s %12s %12s %12s %10s" % ("", "read_js MB", "read_doc MB", "model MB", "peak MB", "seconds"))
+        for label, checkout_dir in CHECKOUTS:
+            result = run(checkout_dir, JS_FILE, XML_FILE)
+            print(
+                "%-10s %12.1f %12.1f %12.1f %12.1f %10.2f"
+                % (label, result["read_js"], result["read_doc"], result["model"], result["peak"], result["seconds"])
+            )
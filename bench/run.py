@@ -0,0 +1,162 @@
+#!/usr/bin/python3
+# -.- coding: utf-8 -.-
+# -.- dependencies: Python 3.8+ -.-
+
+"""
+Times each stage of the salt2type pipeline (C{read_js}, C{read_doc}, C{add_doc_info}, C{copy_tpl}, C{gen_ts} and C{gen_index}) against
+a synthetic corpus (see L{corpus}), reporting the throughput, peak memory and output bytes of each stage.
+
+Each run is made in a new process (so that nothing is cached between runs) and the fastest of the runs is reported for each stage.
+The results can be saved as a baseline and later runs compared against it, failing if any stage has become slower than the tolerance.
+"""
+
+import argparse, json, os, resource, subprocess, sys, tempfile, time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import add_arguments, corpus_args, write_corpus  # pylint: disable=wrong-import-position
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MB = 1024 * 1024
+
+STAGES = ("read_js", "read_doc", "add_doc_info", "copy_tpl", "gen_ts", "gen_index")
+""" The stages of the pipeline, in order. """
+
+
+def dir_size(dir_name: str) -> int:
+    """
+    Returns the total size of the files in the specified directory (and its subdirectories).
+    """
+    return sum(os.path.getsize(os.path.join(root, fil)) for root, _, files in os.walk(dir_name) for fil in files)
+
+
+def measure(js_file: str, xml_file: str, out_dir: str, jobs: int) -> Dict[str, dict]:
+    """
+    Runs each stage of the pipeline against the specified files, and returns the statistics for each stage.
+    """
+    sys.path.insert(0, ROOT_DIR)
+    from src import read_js, read_doc, add_doc_info, copy_tpl, gen_ts, gen_index  # pylint: disable=import-outside-toplevel
+
+    results = {}
+    model = {}
+
+    def stage(name: str, func, in_bytes: int = 0) -> None:
+        out_bytes = dir_size(out_dir) if os.path.isdir(out_dir) else 0
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        model[name] = func()
+        results[name] = {
+            "seconds": time.perf_counter() - wall,
+            "cpu_seconds": time.process_time() - cpu,
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            "in_bytes": in_bytes,
+            "out_bytes": (dir_size(out_dir) if os.path.isdir(out_dir) else 0) - out_bytes,
+        }
+
+    stage("read_js", lambda: read_js(js_file, None), os.path.getsize(js_file))
+    asm_name, classes, globs = model["read_js"]
+    classes = list(classes)
+    stage("read_doc", lambda: read_doc(xml_file, jobs), os.path.getsize(xml_file))
+    stage("add_doc_info", lambda: add_doc_info(classes, model["read_doc"]))
+    stage("copy_tpl", lambda: copy_tpl(out_dir, asm_name, "Bench", tpl_dir=os.path.join(ROOT_DIR, "tpl"), exclude={"src/index.ts"}))
+    stage("gen_ts", lambda: gen_ts(out_dir, classes, None, False, jobs))
+    stage("gen_index", lambda: gen_index(out_dir, classes, globs))
+
+    for name in STAGES:
+        results[name]["classes"] = len(classes)
+
+    return results
+
+
+def run(js_file: str, xml_file: str, jobs: int) -> Dict[str, dict]:
+    """
+    Runs L{measure} in a new process (writing to a new temporary directory).
+    """
+    with tempfile.TemporaryDirectory() as out_dir:
+        output = subprocess.check_output([sys.executable, __file__, "--measure", js_file, xml_file, out_dir, str(jobs)])
+    return json.loads(output)
+
+
+def best(runs: List[Dict[str, dict]]) -> Dict[str, dict]:
+    """
+    Combines the results of several runs, taking the fastest time and the highest peak memory of each stage.
+    """
+    results = {}
+    for name in STAGES:
+        stats = [result[name] for result in runs]
+        fastest = min(stats, key=lambda stat: stat["seconds"])
+        results[name] = dict(fastest, peak_rss_mb=max(stat["peak_rss_mb"] for stat in stats))
+    return results
+
+
+def report(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """
+    Prints the results (compared against the baseline, if any) and returns the names of the stages which have regressed.
+    """
+    print("%-14s %9s %9s %11s %9s %9s %11s %9s" % ("stage", "seconds", "cpu", "classes/s", "in MB/s", "out MB/s", "peak RSS MB", "out MB"))
+    regressed = []
+    for name in STAGES:
+        stat = results[name]
+        seconds = max(stat["seconds"], 1e-9)
+        line = "%-14s %9.3f %9.3f %11.0f %9.1f %9.1f %11.1f %9.2f" % (
+            name,
+            stat["seconds"],
+            stat["cpu_seconds"],
+            stat["classes"] / seconds,
+            stat["in_bytes"] / MB / seconds,
+            stat["out_bytes"] / MB / seconds,
+            stat["peak_rss_mb"],
+            stat["out_bytes"] / MB,
+        )
+        if name in baseline:
+            change = stat["seconds"] / max(baseline[name]["seconds"], 1e-9) - 1
+            line += "  %+6.1f%%" % (change * 100)
+            if change > tolerance and stat["seconds"] - baseline[name]["seconds"] > 0.01:
+                line += "  REGRESSION"
+                regressed.append(name)
+        print(line)
+    return regressed
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser(description="Times each stage of the salt2type pipeline against a synthetic corpus")
+    add_arguments(PARSER)
+    PARSER.add_argument("--repeat", type=int, default=3, help="The number of runs (the fastest of which is reported, default 3)")
+    PARSER.add_argument("--jobs", type=int, default=1, help="The number of worker processes for read_doc and gen_ts (default 1)")
+    PARSER.add_argument("--save", metavar="BASELINE", help="Save the results as a baseline to the specified file")
+    PARSER.add_argument("--compare", metavar="BASELINE", help="Compare the results against the baseline saved in the specified file")
+    PARSER.add_argument("--tolerance", type=float, default=0.25, help="The slowdown (as a fraction) counted as a regression (default 0.25)")
+    PARSER.add_argument("--measure", nargs=4, metavar=("JSFILE", "XMLFILE", "OUTDIR", "JOBS"), help=argparse.SUPPRESS)
+    ARGS = PARSER.parse_args()
+
+    if ARGS.measure:
+        print(json.dumps(measure(*ARGS.measure[:3], int(ARGS.measure[3]))))
+        sys.exit(0)
+
+    CORPUS = corpus_args(ARGS)
+    BASELINE: Dict[str, dict] = {}
+    if ARGS.compare:
+        with open(ARGS.compare, "r") as fil:
+            SAVED = json.load(fil)
+        if SAVED["corpus"] != CORPUS:
+            raise Exception("The baseline was measured against a different corpus: %s" % SAVED["corpus"])
+        BASELINE = SAVED["stages"]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        JS_FILE, XML_FILE = write_corpus(tmp_dir, **CORPUS)
+        print(
+            "%d classes (%.1f MB javascript, %.1f MB xml), best of %d runs"
+            % (ARGS.classes, os.path.getsize(JS_FILE) / MB, os.path.getsize(XML_FILE) / MB, ARGS.repeat)
+        )
+        RESULTS = best([run(JS_FILE, XML_FILE, ARGS.jobs) for _ in range(ARGS.repeat)])
+
+    REGRESSED = report(RESULTS, BASELINE, ARGS.tolerance)
+
+    if ARGS.save:
+        with open(ARGS.save, "w") as fil:
+            json.dump({"corpus": CORPUS, "jobs": ARGS.jobs, "stages": RESULTS}, fil, indent=2, sort_keys=True)
+
+    if REGRESSED:
+        print("Regressed: %s" % ", ".join(REGRESSED), file=sys.stderr)
+        sys.exit(1)
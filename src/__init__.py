@@ -26,4 +26,11 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-from .helper import read_js, read_doc, add_doc_info, copy_tpl, gen_ts, gen_index
+from .model import BatchJob
+from .ignore import read_ignore_rules
+from .jsreader import read_js
+from .doxygen import read_doc, add_doc_info
+from .output import open_output, archive_ext, OutputSink, DirectorySink, ArchiveSink, MemorySink
+from .helper import shake_classes, read_model, save_model, load_model, copy_tpl, gen_ts, gen_index
+from .batch import read_manifest, run_batch, SymbolIndex, read_symbols, external_classes
+from .watch import Watcher
@@ -0,0 +1,250 @@
+#!/usr/bin/python3
+# -.- coding: utf-8 -.-
+# -.- dependencies: Python 3.8+ -.-
+
+"""
+Salt2Type
+
+A tool to assist in migrating an existing codebase from Script# to TypeScript.
+
+MIT License
+
+Copyright (c) 2023 Pangaea Information Technologies, Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import contextlib, functools, itertools, json, os, sys, tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, Tuple, Optional, Set
+from .typemap import TYPE_MAPPER, load_type_rules
+from .model import ClassDef, BatchJob, STATS, counted
+from .output import OutputSink, open_output, as_sink
+from .helper import read_model, save_model, load_model, copy_tpl, gen_ts, gen_index
+
+###############
+### Batches ###
+###############
+
+SYMBOLS_FILE = ".salt2type-symbols.json"
+""" The name of the symbol index kept in the output directory of each converted assembly (see L{SymbolIndex}). """
+
+SYMBOLS_VERSION = 1
+""" The version of the symbol index. """
+
+
+class SymbolIndex:
+    """
+    An index of the classes generated into the project of an assembly (the namespace, name, doc_id and var_id of each class).  The index
+    is saved in the output directory (see L{SYMBOLS_FILE}), so that the projects of other assemblies converted later can import its
+    classes (see L{external_classes}) without parsing the assembly again.
+    """
+
+    def __init__(self, out_dir: str, asm_name: str, classes: Iterable[Tuple[str, str, Optional[str], Optional[str]]]):
+        self.out_dir = out_dir
+        """ The output directory of the project. """
+
+        self.asm_name = asm_name
+        """ The name of the assembly. """
+
+        self.classes = [tuple(item) for item in classes]
+        """ The namespace, name, doc_id and var_id of each class (in order). """
+
+    @classmethod
+    def from_defs(cls, out_dir: str, asm_name: str, defs: Iterable[ClassDef]) -> "SymbolIndex":
+        """
+        Returns the symbol index of the specified classes.
+        """
+        return cls(out_dir, asm_name, [(item.namespace, item.name, item.doc_id, item.var_id) for item in defs])
+
+    def externals(self, out_dir: str, seen: Set[str]) -> List[ClassDef]:
+        """
+        Returns the classes of the index which may be imported by the project in the specified output directory (see L{ClassDef.root}).
+        Those classes whose namespace-qualified class name is already in C{seen} are left out (and the rest are added to it).
+        """
+        root = os.path.relpath(os.path.join(self.out_dir, "src"), os.path.join(out_dir, "src")).replace(os.sep, "/")
+        externals = []
+
+        for namespace, name, doc_id, var_id in self.classes:
+            if "%s.%s" % (namespace, name) not in seen:
+                seen.add("%s.%s" % (namespace, name))
+                externals.append(ClassDef(namespace, name, doc_id, [], [], [], var_id, None, [], root=root))
+
+        return externals
+
+    def write(self, out: Optional[OutputSink] = None) -> None:
+        """
+        Writes out the symbol index to its output directory (only if it has changed) or to the specified output sink.
+        """
+        content = json.dumps({"version": SYMBOLS_VERSION, "assembly": self.asm_name, "classes": self.classes}, separators=(",", ":"))
+        as_sink(out or self.out_dir).write(SYMBOLS_FILE, content, True)
+
+
+def read_symbols(out_dir: str) -> SymbolIndex:
+    """
+    Reads in the symbol index saved in the specified output directory (see L{SymbolIndex.write}).
+    """
+    try:
+        with open(os.path.join(out_dir, SYMBOLS_FILE), "r") as fil:
+            symbols = json.load(fil)
+    except (OSError, ValueError) as ex:
+        raise Exception("Unable to read the symbol index of: %s" % out_dir) from ex
+
+    if not isinstance(symbols, dict) or symbols.get("version") != SYMBOLS_VERSION:
+        raise Exception("Unsupported symbol index version: %s" % out_dir)
+
+    return SymbolIndex(out_dir, symbols["assembly"], symbols["classes"])
+
+
+def external_classes(local: SymbolIndex, others: Iterable[SymbolIndex]) -> List[ClassDef]:
+    """
+    Returns the classes of the other assemblies which may be imported by the project of the local assembly.  Those classes which have the
+    same namespace-qualified class name as a class of the local assembly (or of an earlier assembly) are left out.
+    """
+    seen = {"%s.%s" % (namespace, name) for namespace, name, _, _ in local.classes}
+    return [item for other in others for item in other.externals(local.out_dir, seen)]
+
+
+def read_manifest(filename: str) -> List[BatchJob]:
+    """
+    Reads in the batch manifest specified by the given filename.  Each line specifies one assembly as C{JSFILE XMLFILE OUTDIR NSNAME
+    [IGNFILE [IMPORTS]]} (separated by whitespace, with C{-} for no IGNFILE).  Relative paths are relative to the folder containing the
+    manifest.  Blank lines and lines starting with C{#} are ignored.
+
+    @param filename: The manifest file to read from
+    @return: The assemblies (in order)
+    """
+    base_dir = os.path.dirname(os.path.abspath(filename))
+
+    def to_path(path: Optional[str]) -> Optional[str]:
+        return None if path in (None, "-") else os.path.join(base_dir, path)
+
+    batch = []
+    with open(filename, "r") as fil:
+        for line in fil.read().splitlines():
+            line = line.strip()
+            if line and not line.startswith("#"):
+                parts = line.split()
+                if not 4 <= len(parts) <= 6:
+                    raise Exception("Unsupported manifest line: %s" % line)
+                parts += [None] * (6 - len(parts))
+                batch.append(BatchJob(to_path(parts[0]), to_path(parts[1]), to_path(parts[2]), parts[3], to_path(parts[4]), to_path(parts[5])))
+
+    out_dirs = [os.path.normpath(job.out_dir) for job in batch]
+    if len(set(out_dirs)) != len(out_dirs):
+        raise Exception("The same OUTDIR is used by more than one assembly: %s" % filename)
+
+    return batch
+
+
+def run_batch(
+    batch: List[BatchJob],
+    jobs: Optional[int] = None,
+    all_imports: bool = False,
+    incremental: bool = False,
+    link: bool = False,
+    tpl_dir: Optional[str] = None,
+    symbols: Optional[List[SymbolIndex]] = None,
+    atomic: bool = False,
+) -> int:
+    """
+    Converts each of the assemblies in the batch using a single pool of worker processes shared by every assembly, so that the caches in
+    each worker (e.g. the translated types and the templates) are reused from one assembly to the next.  Every assembly is read first (with
+    its model saved to a temporary file, see L{save_model}), and then the typescript project for each assembly is generated with the
+    classes of the other assemblies available to be imported from their own projects (see L{ClassDef.root}).  The symbol index of each
+    assembly is saved in its project (see L{SymbolIndex}).
+
+    @param batch: The assemblies to convert
+    @param jobs: The number of worker processes to use (None for the number of CPUs)
+    @param all_imports: If true, then every class is imported into every file (rather than only those which are referenced)
+    @param incremental: If true, then only the files whose inputs have changed are generated
+    @param link: If true, then the template files without any template keywords are hardlinked rather than copied
+    @param tpl_dir: The template directory (defaults to the C{tpl} folder alongside the script)
+    @param symbols: The symbol indexes of the assemblies converted earlier whose classes may also be imported (see L{read_symbols})
+    @param atomic: If true, then each project is generated in a staging directory which then replaces its output directory (see
+        L{DirectorySink})
+    @return: The number of import lines which were skipped because they were not referenced
+    """
+    tpl_dir = tpl_dir or os.path.join(os.path.dirname(sys.argv[0]), "tpl")
+    workers = min(jobs or os.cpu_count() or 1, len(batch))
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=load_type_rules, initargs=(dict(TYPE_MAPPER.rules),)) if workers > 1 else None
+
+    def run(func, *iterables) -> list:
+        if not executor:
+            return [func(*args) for args in zip(*iterables)]
+
+        results = []
+        for result, stats in executor.map(functools.partial(counted, func), *iterables):
+            results.append(result)
+            STATS.update(stats)
+        return results
+
+    with executor or contextlib.nullcontext():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            model_files = [os.path.join(tmp_dir, "%d.model" % pos) for pos in range(len(batch))]
+            indexes = run(read_batch_model, batch, model_files)
+
+            externals = [external_classes(index, [other for other in indexes if other is not index] + (symbols or [])) for index in indexes]
+            options = [itertools.repeat(option) for option in (all_imports, incremental, link, tpl_dir, atomic)]
+            skipped = run(gen_batch_project, batch, model_files, externals, *options)
+
+    return sum(skipped)
+
+
+def read_batch_model(job: BatchJob, model_file: str) -> SymbolIndex:
+    """
+    Reads in the model of a single assembly in a batch (see L{run_batch}) and saves it to the specified file.
+
+    @return: The symbol index of the classes in the assembly
+    """
+    asm_name, defs, globs = read_model(job.js_file, job.ignfile, job.xml_file, 1)
+    save_model(model_file, asm_name, defs, globs)
+
+    return SymbolIndex.from_defs(job.out_dir, asm_name, defs)
+
+
+def gen_batch_project(
+    job: BatchJob,
+    model_file: str,
+    externals: List[ClassDef],
+    all_imports: bool,
+    incremental: bool,
+    link: bool,
+    tpl_dir: str,
+    atomic: bool = False,
+) -> int:
+    """
+    Generates the typescript project for a single assembly in a batch from its saved model (see L{run_batch}).
+
+    @return: The number of import lines which were skipped because they were not referenced
+    """
+    asm_name, defs, globs, _ = load_model(model_file)
+
+    extra_imports = None
+    if job.imports:
+        with open(job.imports, "r") as fil:
+            extra_imports = fil.read().splitlines()
+
+    with open_output(job.out_dir, atomic) as out:
+        copy_tpl(out, asm_name, job.ns_name, link, tpl_dir, exclude={"src/index.ts"})
+        skipped = gen_ts(out, defs, extra_imports, all_imports, 1, incremental, externals)
+        skipped += gen_index(out, defs, globs, extra_imports, all_imports, incremental, externals)
+        SymbolIndex.from_defs(job.out_dir, asm_name, defs).write(out)
+
+    return skipped
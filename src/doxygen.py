@@ -0,0 +1,439 @@
+#!/usr/bin/python3
+# -.- coding: utf-8 -.-
+# -.- dependencies: Python 3.8+ -.-
+
+"""
+Salt2Type
+
+A tool to assist in migrating an existing codebase from Script# to TypeScript.
+
+MIT License
+
+Copyright (c) 2023 Pangaea Information Technologies, Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import functools, hashlib, os, re
+from concurrent.futures import ProcessPoolExecutor
+from xml.etree import ElementTree
+from typing import Dict, Iterator, List, Tuple, Optional
+from .typemap import TYPE_MAPPER, load_type_rules
+from .model import PropDef, MethodDef, ClassDef, STATS, counted, to_type
+
+######################
+### Doxygen Reader ###
+######################
+
+
+def to_text(node: Optional[ElementTree.Element]) -> str:
+    """
+    Extracts the text from the specified Element, discarding any tags.  Also removes leading and trailing whitespace.
+    """
+    if node is not None:
+        return "".join(node.itertext()).strip()
+
+    return ""
+
+
+def read_doc(filename: str, jobs: Optional[int] = None, cache: Optional[Dict[str, Tuple[str, List[ClassDef]]]] = None) -> List[ClassDef]:
+    """
+    Reads in the XML Doxygen file specified by the given filename and returns its parsed contents.  The file is parsed incrementally,
+    with each C{compounddef} being processed (and then discarded) as soon as it has been read so that the whole document is never held in
+    memory at once.
+
+    If the filename is a directory, then it is treated as the Doxygen C{xml} output directory: the compounds are enumerated from its
+    C{index.xml} and each class/interface file is parsed separately (in parallel if C{jobs} is not 1), so that the files do not first need
+    to be combined into a single C{all.xml}.  If a C{cache} is given, then only those files whose contents have changed since they were last
+    read into it are parsed again.
+
+    @param filename: The XML file (or Doxygen XML directory) to read from
+    @param jobs: The number of worker processes to use when reading a directory (defaults to the number of CPUs)
+    @param cache: The digest of each file and the classes read from it (keyed by filename), kept up to date when reading a directory
+    @return: All of the class definitions found in the file.
+    """
+    classes = {}  # key = `${namespace}.${name}`, value = ClassDef
+
+    if os.path.isdir(filename):
+        files = [os.path.join(filename, "%s.xml" % refid) for refid in read_doc_index(os.path.join(filename, "index.xml"))]
+        digests = {}
+
+        if cache is not None:
+            for fil in files:
+                digests[fil] = file_digest(fil)
+            for fil in set(cache) - set(files):
+                del cache[fil]
+
+        todo = files if cache is None else [fil for fil in files if fil not in cache or cache[fil][0] != digests[fil]]
+        workers = min(jobs or os.cpu_count() or 1, len(todo))
+
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=load_type_rules, initargs=(dict(TYPE_MAPPER.rules),)) as executor:
+                parsed = []
+                for result, stats in executor.map(functools.partial(counted, read_doc_file), todo, chunksize=max(1, len(todo) // (workers * 4))):
+                    parsed.append(result)
+                    STATS.update(stats)
+        else:
+            parsed = [read_doc_file(fil) for fil in todo]
+
+        if cache is not None:
+            cache.update((fil, (digests[fil], result)) for fil, result in zip(todo, parsed))
+            results = [cache[fil][1] for fil in files]
+        else:
+            results = parsed
+
+        for result in results:
+            for curr_class in result:
+                classes["%s.%s" % (curr_class.namespace, curr_class.name)] = curr_class
+
+        return list(classes.values())
+
+    root = None
+    for event, elem in ElementTree.iterparse(filename, events=("start", "end")):
+        if root is None:
+            root = elem
+
+        elif event == "end" and elem.tag == "compounddef":
+            if curr_class := read_compound(elem):
+                classes["%s.%s" % (curr_class.namespace, curr_class.name)] = curr_class
+            root.clear()
+
+    return list(classes.values())
+
+
+def read_doc_index(filename: str) -> List[str]:
+    """
+    Reads in the Doxygen C{index.xml} file specified by the given filename.
+
+    @param filename: The index file to read from
+    @return: The refids of all of the classes and interfaces (in order)
+    """
+    refids = []
+    for _, elem in ElementTree.iterparse(filename):
+        if elem.tag == "compound":
+            if elem.get("kind") in ("class", "interface"):
+                refids.append(elem.get("refid"))
+            elem.clear()
+
+    return refids
+
+
+def read_doc_file(filename: str) -> List[ClassDef]:
+    """
+    Reads in a single Doxygen XML file (i.e. one per-compound file from the Doxygen C{xml} directory).
+
+    @param filename: The XML file to read from
+    @return: All of the class definitions found in the file.
+    """
+    return list(read_doc(filename))
+
+
+def file_digest(filename: str) -> str:
+    """
+    Returns a digest of the contents of the specified file.
+    """
+    with open(filename, "rb") as fil:
+        return hashlib.md5(fil.read()).hexdigest()
+
+
+def read_compound(compound: ElementTree.Element) -> Optional[ClassDef]:
+    """
+    Reads in the specified Doxygen C{compounddef} element.
+
+    @param compound: The element to read from
+    @return: The class definition (or None if the compound is not a class or interface)
+    """
+    kind = compound.get("kind")
+
+    if kind in ("class", "interface"):
+        key = compound.find("compoundname").text.replace("::", ".")
+        [namespace, name] = key.rsplit(".", 1)
+        doc_id = compound.get("id")
+        is_abstract = compound.get("abstract") == "yes"
+        methods = []
+        props = []
+        links = []
+
+        accessors = []
+
+        curr_class = ClassDef(namespace, name, doc_id, methods, props, links, None, None, [], 0, None, is_abstract, accessors)
+
+        for member in compound.findall("./sectiondef/memberdef"):
+            kind = member.get("kind")
+            prot = member.get("prot")
+            is_static = member.get("static") == "yes"
+            mname = member.find("name").text
+            if "<" in mname:
+                mname = re.sub(r" *<.*>", "", mname)
+            desc = to_text(member.find("briefdescription"))
+            type_node = member.find("type")
+            for ref in type_node.findall("ref"):
+                links.append(ref.get("refid"))
+            typ = to_type(to_text(type_node))
+            if not typ and mname == name:
+                typ = name
+
+            if kind in ("property", "variable", "event"):
+                props.append(PropDef(mname, None, typ, desc, None, is_static))
+                accessors.append((len(methods), prot))
+
+            elif kind == "function":
+                params = []
+                for param in member.findall("param"):
+                    pname = param.find("declname").text
+                    ptype_node = param.find("type")
+                    for ref in ptype_node.findall("ref"):
+                        links.append(ref.get("refid"))
+                    ptyp = to_type(to_text(ptype_node))
+                    prest = to_text(ptype_node).startswith("params ")
+                    params.append(PropDef(pname, None, ptyp, None, prest))
+
+                methods.append(MethodDef(mname if mname != name else "", params, typ, None, desc, prot, is_static))
+
+        return curr_class
+
+    return None
+
+
+def doc_methods(typ: ClassDef) -> Iterator[MethodDef]:
+    """
+    Iterates over all of the methods of the specified class read from Doxygen, in order, including the accessor methods of each of its
+    properties (which are created as they are reached, see L{ClassDef.accessors}).
+    """
+    pos = 0
+    for prop, (method_pos, prot) in zip(typ.props, typ.accessors or ()):
+        yield from typ.methods[pos:method_pos]
+        pos = method_pos
+
+        yield MethodDef("get_%s" % prop.name, [], prop.typ, None, prop.desc, prot, prop.is_static)
+        yield MethodDef("get_$%s" % prop.name, [], prop.typ, None, prop.desc, prot, prop.is_static)
+        yield MethodDef("set_%s" % prop.name, [PropDef("value", None, prop.typ)], "void", None, prop.desc, prot, prop.is_static)
+        yield MethodDef("set_$%s" % prop.name, [PropDef("value", None, prop.typ)], "void", None, prop.desc, prot, prop.is_static)
+
+    yield from typ.methods[pos:]
+
+
+def find_prop(items: List[PropDef], name: str) -> Optional[PropDef]:
+    """
+    Finds the specified property by name (if it exists in the specified list.
+    """
+    lname = name.lower()
+    for item in items:
+        if item.name.lower() == lname:
+            return item
+        if item.is_rest and is_overload_name(item.name, lname, ""):
+            return item
+
+    return None
+
+
+def find_method(items: List[MethodDef], name: str, args: int) -> Optional[MethodDef]:
+    """
+    Finds the specified method by name and number of arguments (if it exists in the specified list.
+    """
+    lname = name.lower()
+    local = "$" + name[:1].lower() + name[1:]
+    matches = [
+        item
+        for item in items
+        if item.name.lower() == lname
+        or item.name == local
+        or item.name.startswith(local + "$")
+        or is_overload_name(item.name, lname, "$")
+        or (name == "" and item.name.startswith("$ctor"))
+    ]
+
+    for item in matches:
+        if len(item.params) == args:
+            return item
+
+    if matches:
+        return matches[0]
+
+    return None
+
+
+def is_overload_name(item_name: str, lname: str, sep: str) -> bool:
+    """
+    Returns whether the specified item name is the (lowercase) name followed by the separator and a single digit from 1 to 9 (ignoring
+    case).
+    """
+    return (
+        len(item_name) == len(lname) + len(sep) + 1
+        and item_name[-1] in "123456789"
+        and item_name.endswith(sep + item_name[-1])
+        and item_name[: len(lname)].lower() == lname
+    )
+
+
+class MemberIndex:
+    """
+    An index of the methods and properties of a class, keyed on every normalized form of their names that L{find_method} and
+    L{find_prop} would match: the lowercase name, the C{$}-prefixed local name (and its C{$}-separated prefixes), the lowercase name
+    without a C{$N} overload suffix and (for properties) without a rest-parameter digit suffix.  Each lookup then only needs to consider the
+    handful of members which share a key, rather than every member of the class, while returning exactly what a linear scan would.
+    """
+
+    def __init__(self, curr_class: ClassDef):
+        self.curr_class = curr_class
+        """ The class being indexed. """
+
+        self.methods: Dict[str, List[Tuple[int, MethodDef]]] = {}
+        """ The positions and methods for each key. """
+
+        self.props: Dict[str, List[Tuple[int, PropDef]]] = {}
+        """ The positions and properties for each key. """
+
+        for pos, method in enumerate(curr_class.methods):
+            for key in self.method_keys(method.name):
+                self.methods.setdefault(key, []).append((pos, method))
+
+        for pos, prop in enumerate(curr_class.props):
+            self.index_prop(pos, prop)
+
+    @staticmethod
+    def method_keys(name: str) -> List[str]:
+        """
+        Returns the keys under which a method with the specified name is indexed.
+        """
+        keys = ["=" + name.lower()]
+        if name[:1] == "$":
+            keys.append("!" + name)
+            keys.extend("^" + name[:i] for i, char in enumerate(name) if char == "$" and i > 0)
+        if name.startswith("$ctor"):
+            keys.append("ctor")
+        if name[-2:-1] == "$" and name[-1] in "123456789":
+            keys.append("#" + name[:-2].lower())
+        return keys
+
+    def index_prop(self, pos: int, prop: PropDef) -> None:
+        """
+        Adds the specified property (found at the specified position) to the index.
+        """
+        self.props.setdefault("=" + prop.name.lower(), []).append((pos, prop))
+        if prop.name[-1:] and prop.name[-1] in "123456789":
+            self.props.setdefault("#" + prop.name[:-1].lower(), []).append((pos, prop))
+
+    def add_prop(self, prop: PropDef) -> None:
+        """
+        Appends the specified property to the class and adds it to the index.
+        """
+        self.curr_class.props.append(prop)
+        self.index_prop(len(self.curr_class.props) - 1, prop)
+
+    def find_method(self, name: str, args: int) -> Optional[MethodDef]:
+        """
+        Finds the specified method by name and number of arguments (see L{find_method}).
+        """
+        local = "$" + name[:1].lower() + name[1:]
+        keys = ["=" + name.lower(), "!" + local, "^" + local, "#" + name.lower()]
+        if name == "":
+            keys.append("ctor")
+
+        found = {}
+        for key in keys:
+            for pos, method in self.methods.get(key, ()):
+                found[pos] = method
+        matches = [found[pos] for pos in sorted(found)]
+
+        for item in matches:
+            if len(item.params) == args:
+                return item
+
+        if matches:
+            return matches[0]
+
+        return None
+
+    def find_prop(self, name: str) -> Optional[PropDef]:
+        """
+        Finds the specified property by name (see L{find_prop}).
+        """
+        best = None
+        for pos, prop in self.props.get("=" + name.lower(), ()):
+            best = (pos, prop)
+            break
+        for pos, prop in self.props.get("#" + name.lower(), ()):
+            if prop.is_rest:
+                if best is None or pos < best[0]:
+                    best = (pos, prop)
+                break
+
+        return best[1] if best else None
+
+
+def add_doc_info(defs: List[ClassDef], types: List[ClassDef]) -> None:
+    """
+    Updates the class definitions found in C{defs} to specify all of the documentation details found in C{types}.
+
+    @param defs: The class definitions (from JS) to modify in-place to add type definitions.
+    @param types: The type definitions (from XML) to use for lookup.
+    """
+    classes = {}  # key = `${namespace}.${name}`, value = ClassDef
+    for curr_class in defs:
+        key = "%s.%s" % (curr_class.namespace, curr_class.name)
+        classes[key] = curr_class
+
+    for typ in types:
+        key = "%s.%s" % (typ.namespace, typ.name)
+        curr_class = classes.get(key)
+
+        if curr_class:
+            curr_class.doc_id = typ.doc_id
+            curr_class.is_abstract = typ.is_abstract
+            members = MemberIndex(curr_class)
+
+            for method in doc_methods(typ):
+                curr_method = members.find_method(method.name, len(method.params))
+
+                if curr_method:
+                    curr_method.typ = method.typ
+                    curr_method.desc = method.desc
+                    curr_method.protection = method.protection
+                    curr_method.is_static = curr_method.is_static or method.is_static
+
+                    for param in method.params:
+                        curr_param = find_prop(curr_method.params, param.name)
+
+                        if curr_param:
+                            curr_param.typ = param.typ
+                            curr_param.desc = param.desc
+                            curr_param.is_rest = param.is_rest
+
+            for prop in typ.props:
+                curr_prop = members.find_prop(prop.name)
+
+                if curr_prop:
+                    curr_prop.typ = prop.typ
+                    curr_prop.desc = prop.desc
+                    curr_prop.is_rest = prop.is_rest
+                elif not prop.name.startswith("this["):
+                    members.add_prop(PropDef(to_local_prop(prop.name), None, prop.typ, prop.desc, prop.is_rest, False))
+
+            curr_class.links.extend(typ.links)
+
+
+def to_local_prop(name: str) -> str:
+    """
+    Converts a C# local property to a S# name
+    """
+    if name[:1] == name[:1].lower():
+        return "$" + name
+
+    return name[:1].lower() + name[1:]
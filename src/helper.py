@@ -30,796 +30,729 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-import os, re, sys
-from xml.etree import ElementTree
-from dataclasses import dataclass
-from typing import List, Tuple, Optional, TextIO, Set
+import contextlib, functools, hashlib, io, json, os, pickle, re, struct, sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from typing import ContextManager, Dict, List, Tuple, Optional, TextIO, Set, Union
+from .typemap import TYPE_MAPPER, load_type_rules
+from .timings import Timings
+from .model import PropDef, ClassDef, STATS, counted, paused_gc
+from .ignore import IgnorePatterns
+from .jstokens import rewrite_lines
+from .jsreader import JS_LINE_RE, read_js, LazyBody
+from .doxygen import read_doc, add_doc_info
+from .output import OutputSink, DirectorySink, as_sink
+
+################
+### PATTERNS ###
+################
+
+IDENT_RE = re.compile(r"[A-Za-z_$][A-Za-z0-9_$]*")
+""" Matches a single javascript/typescript identifier. """
 
-#############
-### TYPES ###
-#############
 
+######################
+### Helper Methods ###
+######################
 
-@dataclass
-class PropDef:
-    """The definition of a property"""
-
-    name: str
-    """ the name of the property.  the name will be parameterized if it is generic. """
-
-    def_val: Optional[str] = None
-    """ The default value of the property (if known/applicable) """
-
-    typ: Optional[str] = None
-    """ The type of the property (if known). """
 
-    desc: Optional[str] = None
-    """ The brief description of the property (if known). """
+def read_model(
+    js_file: str, ignfile: Optional[str], xml_file: str, jobs: Optional[int] = None, timings: Optional[Timings] = None
+) -> Tuple[str, List[ClassDef], List[str]]:
+    """
+    Reads in the Script# file and the Doxygen file (see L{read_js} and L{read_doc}) and combines them (see L{add_doc_info}).  Since the
+    two files are independent, the Doxygen file is read in a worker process while the Script# file is read in the current process (using
+    its own pool of worker processes if it is large enough to be sharded), unless C{jobs} is 1, in which case they are read one after the
+    other.
 
-    is_rest: Optional[bool] = None
-    """ Whether or not this is a rest parameter (None if unknown). """
+    @param js_file: The JS file to read from
+    @param ignfile: The ignore file to read from (if applicable)
+    @param xml_file: The XML file (or Doxygen XML directory) to read from
+    @param jobs: The number of worker processes to use (defaults to the number of CPUs)
+    @param timings: The timings to record the C{read_js}, C{read_doc} and C{add_doc_info} stages in (if any).  When the files are read
+        concurrently, the C{read_doc} stage only covers waiting for (and unpickling) the Doxygen classes once the Script# file was read.
+    @return: The name to pass to "ss.initAssembly" followed by all of the class definitions, followed by all of the global statements
+    """
+    if (jobs or os.cpu_count() or 1) <= 1:
+        with timed(timings, "read_js"):
+            asm_name, defs, globs = read_js(js_file, ignfile)
+        with timed(timings, "read_doc"):
+            types = read_doc(xml_file, jobs)
+    else:
+        with ProcessPoolExecutor(max_workers=1, initializer=load_type_rules, initargs=(dict(TYPE_MAPPER.rules),)) as executor:
+            future = executor.submit(counted, read_doc_pickled, xml_file, jobs)
+            with timed(timings, "read_js"):
+                asm_name, defs, globs = read_js(js_file, ignfile, jobs)
+            with timed(timings, "read_doc"), paused_gc():
+                data, stats = future.result()
+                STATS.update(stats)
+                types = pickle.loads(data)
 
-    is_static: Optional[bool] = None
-    """ Whether or not this property is static (None if unknown). """
+    with timed(timings, "add_doc_info"):
+        add_doc_info(defs, types)
 
+    return asm_name, defs, globs
 
-@dataclass
-class MethodDef:
-    """The definition of a class method"""
 
-    name: str
+def timed(timings: Optional[Timings], name: str) -> ContextManager[None]:
     """
-    the name of the method (empty string if it is the constructor).
-    the name will be parameterized if it is generic.
-    the name will be prefixed by "operator " if it is implicit.
-    the name will be "this[...]" if it is an indexer.
+    Returns the context which records the code run within it as the specified stage of the timings (if any, see L{Timings.stage}).
     """
+    return timings.stage(name) if timings else contextlib.nullcontext()
 
-    params: List[PropDef]
-    """ The ordered parameters of the method """
 
-    typ: Optional[str] = None
-    """ The return type of the method (if known). """
+def read_doc_pickled(filename: str, jobs: Optional[int]) -> bytes:
+    """
+    Reads in the Doxygen file (see L{read_doc}) in a worker process and returns the pickled class definitions, so that they are pickled
+    while the parent process is still busy (see L{read_model}) and can be unpickled with the garbage collector paused.
+    """
+    return pickle.dumps(read_doc(filename, jobs), protocol=pickle.HIGHEST_PROTOCOL)
 
-    body: Optional[List[str]] = None
-    """ The lines making up the body of the method (if known). """
 
-    desc: Optional[str] = None
-    """ The brief description of the method (if known). """
+MODEL_MAGIC = b"salt2type-model"
+""" The header identifying a model file written by L{save_model}. """
 
-    protection: Optional[str] = None
-    """ The protection level for the method (None if unknown). """
+MODEL_VERSION = 5
+""" The version of the model file format (files with any other version are rejected by L{load_model}). """
 
-    is_static: Optional[bool] = None
-    """ Whether or not this method is static (None if unknown). """
 
-    type_params: Optional[List[str]] = None
-    """ If the method is generic, then this contains the type arguments (None if unknown). """
+def save_model(filename: str, asm_name: str, defs: List[ClassDef], globs: List[str]) -> None:
+    """
+    Saves the specified (merged) model to the specified file so that it can be loaded by L{load_model} rather than parsed again.  The
+    method bodies are stored as their unformatted source lines (so the model file does not depend upon the javascript file) and the
+    type mappings which were in use are stored alongside the model.
 
+    @param filename: The model file to write to
+    @param asm_name: The assembly name
+    @param defs: The classes
+    @param globs: The global method lines
+    """
+    defs = [
+        replace(
+            item, methods=[replace(method, body=method.body.detach()) if isinstance(method.body, LazyBody) else method for method in item.methods]
+        )
+        for item in defs
+    ]
 
-@dataclass
-class ClassDef:
-    """The definition of a class"""
+    with open(filename, "wb") as fil:
+        fil.write(MODEL_MAGIC)
+        fil.write(struct.pack("<I", MODEL_VERSION))
+        pickle.dump((asm_name, defs, globs, dict(TYPE_MAPPER.rules)), fil, protocol=pickle.HIGHEST_PROTOCOL)
 
-    namespace: str
-    """ The dot-separated namespace that contains the class. """
 
-    name: str
-    """ The name of the class. """
+def load_model(filename: str) -> Tuple[str, List[ClassDef], List[str], Dict[str, str]]:
+    """
+    Loads the model saved by L{save_model} from the specified file.
 
-    doc_id: Optional[str]
-    """ The ID used to refer to this class in documentation (if known). """
+    @param filename: The model file to read from
+    @return: The assembly name, the classes, the global method lines and the type mappings which were in use when the model was built
+    """
+    with open(filename, "rb") as fil:
+        header = fil.read(len(MODEL_MAGIC) + 4)
+        if len(header) != len(MODEL_MAGIC) + 4 or not header.startswith(MODEL_MAGIC):
+            raise Exception("Unsupported model file: %s" % filename)
+        [version] = struct.unpack("<I", header[len(MODEL_MAGIC) :])
+        if version != MODEL_VERSION:
+            raise Exception("Unsupported model version %d (expected %d): %s" % (version, MODEL_VERSION, filename))
 
-    methods: List[MethodDef]
-    """ All of the methods in the class. """
+        with paused_gc():
+            return pickle.load(fil)
 
-    props: List[PropDef]
-    """ All of the properties in the class. """
 
-    links: List[str]
-    """ The external classes which this class references. This can be specified as a namespace-qualified class name, or as a doc_id. """
+def copy_tpl(
+    out_dir: Union[str, "OutputSink"],
+    asm_name: str,
+    ns_name: str,
+    link: bool = False,
+    tpl_dir: Optional[str] = None,
+    exclude: Optional[Set[str]] = None,
+) -> None:
+    """
+    Copies the C{tpl} contents into the specified output directory (creating it first if it doesn't already exist) and replacing
+    template keywords with their correct values (see L{copy_file}).
 
-    var_id: Optional[str]
-    """ The variable name used to refer to this class in Script# (if known). """
+    @param out_dir: The output directory (or the sink to write the files to, see L{open_output})
+    @param asm_name: The name to pass to "ss.initAssembly"
+    @param ns_name: The namespace to export for external use
+    @param link: If true, then files without any template keywords are hardlinked (if possible) rather than copied
+    @param tpl_dir: The template directory (defaults to the C{tpl} folder alongside the script)
+    @param exclude: The paths (relative to the template directory) of any files which should not be copied (e.g. those generated later)
+    """
+    out = as_sink(out_dir)
+    tpl_dir = tpl_dir or os.path.join(os.path.dirname(sys.argv[0]), "tpl")
+    ignored_dirs = list(map(lambda f: os.path.join(tpl_dir, f), ("coverage", "dist", "node_modules")))
 
-    base_class: Optional[str]
-    """ The base class that this class extends (if known/applicable). """
+    def is_ignored(dir_name: str) -> bool:
+        for ignored_dir in ignored_dirs:
+            if dir_name.startswith(ignored_dir):
+                return True
+        return False
 
-    interfaces: List[str]
-    """ The interfaces that this class extends (if known/applicable). """
+    for src_dir, _, files in os.walk(tpl_dir):
+        if not is_ignored(src_dir):
+            for fil in files:
+                src_file = os.path.join(src_dir, fil)
+                path = os.path.relpath(src_file, tpl_dir).replace(os.sep, "/")
+                if exclude and path in exclude:
+                    continue
+                if isinstance(out, DirectorySink):
+                    out.copy(src_file, path, asm_name, ns_name, link)
+                else:
+                    out.copy(src_file, path, asm_name, ns_name)
 
-    is_generic: int = 0
-    """ If non-zero then the class is generic (0 if non-generic OR if unknown). """
 
-    is_enum: Optional[bool] = None
-    """ Whether or not this class should be treated as an enum (None if unknown). """
+def prop_to_string(prop: PropDef, always_def: Optional[bool] = False) -> str:
+    """
+    Generates a stringified version of the property for typescript
+    """
+    myval = prop.def_val
+    if always_def and not myval:
+        if not prop.typ:
+            myval = "undefined"
+        elif prop.typ == "boolean":
+            myval = "false"
+        elif prop.typ == "number":
+            myval = "0"
+        elif prop.typ == "Date":
+            myval = "new Date(0)"
+        elif prop.typ == "string":
+            myval = '""'
+        elif prop.typ.endswith("[]"):
+            myval = "[]"
+        elif prop.typ.startswith("Array<") and prop.typ.endswith(">"):
+            myval = "[]"
+        elif "undefined" not in prop.typ:
+            myval = "{} as " + prop.typ
+        else:
+            myval = "undefined"
 
-    is_abstract: Optional[bool] = None
-    """ Whether or not this class is abstract (None if unknown). """
+    if myval == "null":
+        myval = "undefined"
 
+    if myval == "undefined" and prop.typ == "string":
+        myval = '""'
 
-######################
-### Helper Methods ###
-######################
+    defval = " = %s" % myval if myval else ""
+    typstr = ": %s" % (prop.typ or "any") if not defval or prop.typ else ""
+    prefix = "..." if prop.is_rest else ("static " if prop.is_static else "")
+    return "%s%s%s%s" % (prefix, prop.name, typstr, defval)
 
 
-def read_js(filename: str, ignfile: Optional[str]) -> Tuple[str, List[ClassDef], List[str]]:
+def find_refs(item: ClassDef, lookup: Dict[str, ClassDef], bodies: Optional[List[List[str]]] = None) -> Set[str]:
     """
-    Reads in the Script# file specified by the given filename and returns its parsed contents.
+    Finds all of the identifiers which the generated typescript for the specified class may refer to.  This includes its base class,
+    interfaces, documentation links, member types/default values and every identifier found in its method bodies.
 
-    @param filename: The JS file to read from
-    @param ignfile: The ignore file to read from (if applicable)
-    @return: The name to pass to "ss.initAssembly" followed by all of the class definitions found in the file, followed by all of the global
-        statements to execute.
+    @param item: The class to analyze
+    @param lookup: The known classes keyed by namespace-qualified class name and doc_id (used to resolve C{links})
+    @param bodies: The rendered body of each method (see L{render_bodies}), if they have already been rendered
+    @return: The referenced identifiers
     """
-    if ignfile:
-        with open(ignfile, "r") as fil:
-            ignlist = {i.strip() for i in fil.read().splitlines()}
-    else:
-        ignlist = set()
-
-    with open(filename, "r") as fil:
-        lines = fil.read().splitlines()
-
-    asm_name = ""
-    classes = {}  # key = ssVarName, value = ClassDef
-    globs = []
-
-    curr_class: Optional[ClassDef] = None
-
-    i = 0
-    while i < len(lines):
-        line = lines[i]
-
-        if line in ("(function() {", "\ufeff(function() {", "\t'use strict';", "})();", "\tvar $asm = {};") or line.startswith("\tss.setMetadata("):
-            pass
-
-        elif match := re.match(r"^\tglobal\.(.*) = (.*);$", line):
-            # single-line global assignments
-            if match.group(1) not in ignlist and match.group(2) not in ignlist:
-                globs.append(clean_line(line))
-
-        elif re.match(r"^\tglobal\..*;$", line):
-            # single-line global directives
-            globs.append(clean_line(line))
-
-        elif re.match(r"^\t(.*)\.\$ctor1\.prototype = \1\.prototype;$", line) or re.match(
-            r"^\t(.*)\.\$ctor\d\.prototype = \1\.\$ctor\d\.prototype = .*\.prototype;$", line
-        ):
-            # ignore single-line constructor directives since we're doing inheritance using typescript now
-            pass
-
-        elif match := re.match(r"^\t(global|\$\.fn)\..*\{$", line):
-            # multi-line global directives
-            end_line = re_find_index(r"^\t\}", lines, i + 1)
-            for inner in lines[i : end_line + 1]:
-                globs.append(clean_line(inner))
-            i = end_line
-
-        elif match := re.match(r"^\tss\.initAssembly\(\$asm, '(.*)'\);$", line):
-            # initAssembly
-            asm_name = match.group(1)
-
-        elif match := re.match(r"^\t\/{80}$", line):
-            # Class separator
-            curr_class = None
-
-        elif match := re.match(r"^\t\/\/ (.*)$", line):
-            # Class name
-            [namespace, name] = match.group(1).rsplit(".", 1)
-            curr_class = ClassDef(namespace, name, None, [], [], [], None, None, [], 0)
-
-        elif curr_class and (match := re.match(r"^\tvar (.*) = function\((.*)\) \{$", line)):
-            # Class constructor
-            var_id = match.group(1)
-            curr_class.var_id = var_id
-            if "%s.%s" % (curr_class.namespace, curr_class.name) not in ignlist:
-                classes[var_id] = curr_class
-            else:
-                ignlist.add(var_id)
-
-            params = []
-            for prop in match.group(2).split(", "):
-                if prop:
-                    params.append(PropDef(prop))
-
-            end_line = re_find_index(r"^\t\};$", lines, i + 1)
-            curr_class.methods.append(MethodDef("", params, None, to_body(curr_class, lines[i + 1 : end_line])))
-            i = end_line
-
-        elif (
-            curr_class
-            and curr_class.var_id
-            and (match := re.match(r"^\t%s\.([A-Za-z0-9$_]+) = function\((.*)\) \{$" % re.escape(curr_class.var_id), line))
-        ):
-            end_line = re_find_index(r"^\t\};$", lines, i + 1)
-            # static class method
-
-            params = []
-            type_params = None
-            if (inner := re.match(r"^\t\treturn function\((.*)\) \{$", lines[i + 1])) and re.match(r"^\t\t\};$", lines[end_line - 1]):
-                # generic
-                body = lines[i + 2 : end_line - 1]
-                for prop in inner.group(1).split(", "):
-                    if prop:
-                        params.append(PropDef(prop))
-                type_params = match.group(2).split(", ")
+    refs = set()
 
-            else:
-                # non-generic
-                body = lines[i + 1 : end_line]
-                for prop in match.group(2).split(", "):
-                    if prop:
-                        params.append(PropDef(prop))
-
-            if "%s.%s:%s" % (curr_class.namespace, curr_class.name, match.group(1)) not in ignlist:
-                curr_class.methods.append(MethodDef(match.group(1), params, None, to_body(curr_class, body), None, None, True, type_params))
-
-            i = end_line
-
-        elif curr_class and curr_class.var_id and (match := re.match(r"^\t%s\.([A-Za-z0-9$_]+) = (.*);$" % re.escape(curr_class.var_id), line)):
-            # static class property
-            if "%s.%s:%s" % (curr_class.namespace, curr_class.name, match.group(1)) not in ignlist:
-                curr_class.props.append(PropDef(match.group(1), match.group(2), None, None, None, True))
-
-        elif match := re.match(r"^\tss\.initClass\((.*), \$asm, \{$", line):
-            # Class multi-line definition
-            tmp_class = classes.get(match.group(1))
-            end_line = re_find_index(r"^\t\}", lines, i + 1)
-
-            if tmp_class:
-                add_props(tmp_class, lines[i + 1 : end_line], r"\t\t", ignlist)
-
-                final = lines[end_line]
-                if final == "\t});":
-                    pass
-                elif inner := re.match(r"^\t\}, ([^, ]+)\);$", final):
-                    tmp_class.base_class = inner.group(1)
-                elif inner := re.match(r"^\t\}, null, \[(.*)\]\);$", final):
-                    tmp_class.interfaces.extend(inner.group(1).split(", "))
-                elif inner := re.match(r"^\t\}, ([^, ]+), \[(.*)\]\);$", final):
-                    tmp_class.base_class = inner.group(1)
-                    tmp_class.interfaces.extend(inner.group(2).split(", "))
-                else:
-                    raise Exception("Unsupported initClass multi-line ending: %s" % final)
-
-            i = end_line
-
-        elif match := re.match(r"^\tss\.initClass\((.*), \$asm, \{(.*)\}(.*)\);$", line):
-            # Class single-line definition
-            tmp_class = classes.get(match.group(1))
-
-            if tmp_class:
-                add_props(tmp_class, match.group(2).strip().split(", "), r"", ignlist)
-
-                final = match.group(3)
-                if final == "":
-                    pass
-                elif inner := re.match(r"^, ([^, ]+)$", final):
-                    tmp_class.base_class = inner.group(1)
-                elif inner := re.match(r"^, null, \[(.*)\]$", final):
-                    tmp_class.interfaces.extend(inner.group(1).split(", "))
-                elif inner := re.match(r"^, ([^, ]+), \[(.*)\]$", final):
-                    tmp_class.base_class = inner.group(1)
-                    tmp_class.interfaces.extend(inner.group(2).split(", "))
-                else:
-                    raise Exception("Unsupported initClass single-line ending: %s" % final)
-
-        elif match := re.match(r"^\tss\.initInterface\((.*), \$asm, \{(.*)\}(.*)\);$", line):
-            # Interface definition
-            tmp_class = classes.get(match.group(1))
+    def scan(text: Optional[str]) -> None:
+        if text:
+            refs.update(IDENT_RE.findall(text))
 
-            if tmp_class:
-                add_props(tmp_class, match.group(2).strip().split(", "), r"", ignlist)
+    scan(item.base_class)
+    for interface in item.interfaces:
+        scan(interface)
 
-                final = match.group(3)
-                if final == "":
-                    pass
-                elif inner := re.match(r"^, \[(.*)\]$", final):
-                    tmp_class.interfaces.extend(inner.group(1).split(", "))
-                else:
-                    raise Exception("Unsupported initInterface ending: %s" % final)
-
-        elif match := re.match(r"^\tss\.initGeneric(Class|Interface)\((.*), \$asm, ([1-9][0-9]*)\);$", line):
-            # Generic definition
-            tmp_class = classes.get(match.group(2))
-            if tmp_class:
-                tmp_class.is_generic = int(match.group(3))
-
-        elif match := re.match(r"^\tss\.initEnum\((.*), \$asm, \{(.*)\}(, true)?\);$", line):
-            # Enum definition
-            tmp_class = classes.get(match.group(1))
-            if tmp_class:
-                add_props(tmp_class, match.group(2).strip().split(", "), r"", ignlist)
-                tmp_class.is_enum = True
-
-        elif line == "\t(function() {":
-            # multi-line initialization functions
-            globs.append("")
-            end_line = re_find_index(r"^\t\}\)\(\);", lines, i + 1)
-            inits = lines[i + 1 : end_line]
-
-            for init in inits:
-                if match := re.match(r"^\t\t([A-Za-z0-9$_]+)\.([A-Za-z0-9$_]+) = (\[[^\[]*\]|\"[^\"]*\"|'[^']*'|\{[^\}]*\}|[0-9.-]+|null);$", init):
-                    tmp_class = classes.get(match.group(1))
-                    if tmp_class:
-                        tmp_class.props.append(PropDef(match.group(2), match.group(3), None, None, None, True))
-                    elif match.group(1) not in ignlist:
-                        globs.append(clean_line(init))
-                elif match := re.match(r"^\t\t([A-Za-z0-9$_]+)\.([A-Za-z0-9$_]+) = ", init):
-                    tmp_class = classes.get(match.group(1))
-                    if tmp_class:
-                        tmp_class.props.append(PropDef(match.group(2), None, None, None, None, True))
-
-                    if match.group(1) not in ignlist:
-                        globs.append(clean_line(init))
-                elif match := re.match(r"^\t\t([A-Za-z0-9$_]+)\.", init):
-                    if match.group(1) not in ignlist:
-                        globs.append(clean_line(init))
-                else:
-                    globs.append(clean_line(init))
+    for link in item.links:
+        if linked := lookup.get(link):
+            refs.add(linked.name)
 
-            i = end_line
+    for prop in item.props:
+        scan(prop.typ)
+        scan(prop.def_val)
 
-        else:
-            raise Exception("Unsupported line: %s" % line)
+    for pos, method in enumerate(item.methods):
+        scan(method.typ)
+        for param in method.params:
+            scan(param.typ)
+        for line in (method.body or []) if bodies is None else bodies[pos]:
+            scan(line)
 
-        i += 1
+    return refs
 
-    return asm_name, classes.values(), globs
 
-
-def clean_line(line: str) -> str:
+def index_classes(defs: List[ClassDef]) -> Dict[str, ClassDef]:
     """
-    Prepares the specified line for typescript.
+    Indexes the specified classes by namespace-qualified class name and doc_id (if known).
     """
-    # Handle generic static method calls
-    line = re.sub(r"\b([A-Za-z0-9$_]+)\(([^\(\)]+)\)\.call\(null,\s+", lambda m: f"{m.group(1)}<{to_type(m.group(2))}>(", line)
-
-    # Handle generic method calls
-    line = re.sub(r"\b([A-Za-z0-9$_]+)\(([^\(\)]+)\)\.call\(", lambda m: f"{m.group(1)}<{to_type(m.group(2))}>(", line)
+    lookup = {}
+    for item in defs:
+        lookup.setdefault("%s.%s" % (item.namespace, item.name), item)
+        if item.doc_id:
+            lookup.setdefault(item.doc_id, item)
 
-    return line
+    return lookup
 
 
-def to_body(curr_class: ClassDef, lines: List[str]) -> List[str]:
-    """
-    Returns the specified method body formatted for inclusion inside the class.
+def shake_classes(
+    defs: List[ClassDef], globs: List[str], keep: Optional[List[str]] = None, ns_name: Optional[str] = None
+) -> Tuple[List[ClassDef], List[str], List[ClassDef]]:
     """
-    return [clean_line(line.replace(curr_class.var_id, curr_class.name)) for line in lines]
+    Drops the classes which cannot be reached from the global method lines, the exported namespace or the specified classes (along with
+    the global assignments which register them outside of the exported namespace, which are not otherwise counted as references).  A class
+    is reached when it is referenced by a reached class through its base class, interfaces, documentation links, member types or method
+    bodies (see L{find_refs}).  Identifiers are matched by var_id and by name, so every class sharing a referenced name is kept.
 
+    @param defs: The classes
+    @param globs: The global method lines
+    @param keep: The namespace-qualified names (or globs, e.g. C{Acme.Api.*}) of any other classes to keep
+    @param ns_name: The exported namespace (the classes registered within it, e.g. by C{global.Acme.Shape = $Acme_Shape;}, are kept)
+    @return: The reachable classes, the remaining global method lines and the unreachable classes (all in their original order)
+    """
+    lookup = index_classes(defs)
+    idents: Dict[str, List[int]] = {}
+    for pos, item in enumerate(defs):
+        idents.setdefault(item.name, []).append(pos)
+        if item.var_id:
+            idents.setdefault(item.var_id, []).append(pos)
+
+    registered: Dict[int, int] = {}
+    for k, glob in enumerate(globs):
+        if (match := JS_LINE_RE["global_assign"].match(glob)) and len(positions := idents.get(match.group(2), [])) == 1:
+            if ns_name is None or (match.group(1) != ns_name and not match.group(1).startswith(ns_name + ".")):
+                registered[k] = positions[0]
+
+    patterns = IgnorePatterns((pattern, pattern) for pattern in keep or [])
+    refs = {ref for k, glob in enumerate(globs) if k not in registered for ref in IDENT_RE.findall(glob)}
+    todo = [pos for ref in refs for pos in idents.get(ref, [])]
+    todo += [pos for pos, item in enumerate(defs) if patterns.match("%s.%s" % (item.namespace, item.name)) is not None]
+    reached = set(todo)
+
+    while todo:
+        for ref in find_refs(defs[todo.pop()], lookup) - refs:
+            refs.add(ref)
+            for pos in idents.get(ref, []):
+                if pos not in reached:
+                    reached.add(pos)
+                    todo.append(pos)
+
+    STATS["tree_shake.reached"] += len(reached)
+    STATS["tree_shake.dropped"] += len(defs) - len(reached)
+
+    return (
+        [item for pos, item in enumerate(defs) if pos in reached],
+        [glob for k, glob in enumerate(globs) if k not in registered or registered[k] in reached],
+        [item for pos, item in enumerate(defs) if pos not in reached],
+    )
+
+
+def gen_ts(
+    out_dir: Union[str, "OutputSink"],
+    defs: List[ClassDef],
+    extra_imports: Optional[List[str]] = None,
+    all_imports: bool = False,
+    jobs: Optional[int] = 1,
+    incremental: bool = False,
+    externals: Optional[List[ClassDef]] = None,
+) -> int:
+    """
+    Generates the typescript files for each known class in the specified output directory.  Each file is rendered in memory and then
+    written with a single write.  If C{jobs} is not 1, then the files are rendered by a pool of worker processes (which also write them
+    unless the files are written to an archive or kept in memory, see L{OutputSink.shared}).
+
+    If C{incremental} is true, then a digest of the inputs of each file is kept in a cache manifest in the output directory (see
+    L{CACHE_FILE}) and only those files whose inputs have changed since the previous run are rendered and written (so the unchanged
+    files keep their modification times).  Any files generated by the previous run for classes which no longer exist are removed.  This
+    requires an output directory.
+
+    @param out_dir: The output directory (or the sink to write the files to, see L{open_output})
+    @param defs: The classes
+    @param extra_imports: Additional import lines to add to the header of every file
+    @param all_imports: If true, then every class is imported into every file (rather than only those which are referenced)
+    @param jobs: The number of worker processes to use (None for the number of CPUs)
+    @param incremental: If true, then only the files whose inputs have changed are generated
+    @param externals: The classes generated by other projects which may also be imported (see L{ClassDef.root})
+    @return: The number of import lines which were skipped because they were not referenced
+    """
+    out = as_sink(out_dir)
+    if incremental and not isinstance(out, DirectorySink):
+        raise Exception("Incremental generation requires an output directory")
+
+    defs = list(defs)
+    args = (out, defs, extra_imports, all_imports, dict(TYPE_MAPPER.rules), externals)
+    init_emit(*args)
+
+    skipped = 0
+    todo = list(range(len(defs)))
+    if incremental:
+        cached, files, todo, skipped = find_changed(out.path, defs, extra_imports, all_imports)
+
+    workers = min(jobs or os.cpu_count() or 1, len(todo))
+    if workers > 1:
+        results = emit_parallel(out, todo, workers, (out if out.shared else None,) + args[1:])
+    else:
+        results = [emit_ts(pos)[:2] for pos in todo]
 
-def re_find_index(pattern: str, lines: List[str], start: int) -> int:
-    """
-    Finds the index of the line that matches the regex pattern starting from the specified index.
-    """
-    i = start
-    while i < len(lines):
-        if re.match(pattern, lines[i]):
-            return i
+    skipped += sum(count for count, _ in results)
 
-        i += 1
+    if incremental:
+        save_changed(out.path, defs, todo, results, cached, files, all_imports)
 
-    raise Exception("Could not find match for '%s'" % pattern)
+    return skipped
 
 
-def to_text(node: Optional[ElementTree.Element]) -> str:
+def find_changed(
+    out_dir: str, defs: List[ClassDef], extra_imports: Optional[List[str]], all_imports: bool
+) -> Tuple[Dict[str, dict], Dict[str, dict], List[int], int]:
     """
-    Extracts the text from the specified Element, discarding any tags.  Also removes leading and trailing whitespace.
+    Finds the classes whose typescript files must be generated again in incremental mode (see L{gen_ts}).
+
+    @return: The entries of the cache manifest, the entries kept for the unchanged files (and started for the others), the positions of
+        the classes to generate and the number of import lines which were skipped by the unchanged files
     """
-    if node is not None:
-        return "".join(node.itertext()).strip()
+    lookup: Dict[str, ClassDef] = EMIT_STATE["lookup"]
+    imports: ImportIndex = EMIT_STATE["imports"]
+    cached = read_cache(out_dir)
+    context = repr((CACHE_VERSION, sorted(TYPE_MAPPER.rules.items()), extra_imports, all_imports))
+    all_digest = imports.digest() if all_imports else None
+    files: Dict[str, dict] = {}
+    todo = []
+    skipped = 0
 
-    return ""
+    for pos, item in enumerate(defs):
+        path = ts_path(item)
+        key = class_digest(item, lookup, context)
+        if (entry := cached.get(path)) and entry["class"] == key and is_unchanged(out_dir, path, entry):
+            refs = None if all_imports else set(entry["refs"])
+            if entry["imports"] == (all_digest or imports.digest(refs)):
+                files[path] = entry
+                skipped += 0 if refs is None else imports.count(item.var_id, item.name) - imports.count(item.var_id, item.name, refs)
+                continue
+
+        files[path] = {"class": key}
+        todo.append(pos)
 
+    return cached, files, todo, skipped
 
-def add_props(curr_class: ClassDef, lines: List[str], prefix: str, ignlist: Set) -> None:
+
+def save_changed(
+    out_dir: str,
+    defs: List[ClassDef],
+    todo: List[int],
+    results: List[Tuple[int, Optional[Set[str]]]],
+    cached: Dict[str, dict],
+    files: Dict[str, dict],
+    all_imports: bool,
+) -> None:
     """
-    Adds the properties and methods specified in the given source to the
-    specified class.  Uses the prefix to determine the current indentation
-    level.
+    Records the generated typescript files in the cache manifest in incremental mode and removes the files generated by the previous run
+    for classes which no longer exist (see L{gen_ts} and L{find_changed}).
     """
-    if len(lines) == 1 and lines[0] == "":
-        return
+    imports: ImportIndex = EMIT_STATE["imports"]
+    all_digest = imports.digest() if all_imports else None
 
-    i = 0
-    while i < len(lines):
-        line = lines[i]
+    for pos, (_, refs) in zip(todo, results):
+        path = ts_path(defs[pos])
+        stat = os.stat(os.path.join(out_dir, "src", path))
+        files[path].update(
+            refs=None if refs is None else sorted(refs),
+            imports=all_digest or imports.digest(refs),
+            size=stat.st_size,
+            mtime=stat.st_mtime_ns,
+        )
 
-        if match := re.match(r"^%s(.*): function\((.*)\) \{$" % prefix, line):
-            end_line = re_find_index(r"^%s},?$" % prefix, lines, i + 1)
-            # Method
+    for path in cached:
+        if path not in files and os.path.isfile(os.path.join(out_dir, "src", path)):
+            os.remove(os.path.join(out_dir, "src", path))
 
-            params = []
-            type_params = None
-            if (inner := re.match(r"^%s\treturn function\((.*)\) \{$" % prefix, lines[i + 1])) and re.match(
-                r"^%s\t\};$" % prefix, lines[end_line - 1]
-            ):
-                # generic
-                body = lines[i + 2 : end_line - 1]
-                for prop in inner.group(1).split(", "):
-                    if prop:
-                        params.append(PropDef(prop))
-                type_params = match.group(2).split(", ")
+    write_cache(out_dir, files)
 
-            else:
-                # non-generic
-                body = lines[i + 1 : end_line]
-                for prop in match.group(2).split(", "):
-                    if prop:
-                        params.append(PropDef(prop))
-
-            if "%s.%s:%s" % (curr_class.namespace, curr_class.name, match.group(1)) not in ignlist:
-                curr_class.methods.append(MethodDef(match.group(1), params, None, to_body(curr_class, body), None, None, None, type_params))
-            i = end_line
-        elif match := re.match(r"^%s(.*): (.*[^,]),?$" % prefix, line):
-            # Property
-            if "%s.%s:%s" % (curr_class.namespace, curr_class.name, match.group(1)) not in ignlist:
-                curr_class.props.append(PropDef(match.group(1), match.group(2)))
-        else:
-            raise Exception("Unsupported inner class line: %s" % line)
-
-        i += 1
-
-
-def to_type(raw_type: str) -> str:
-    """
-    Converts the raw Doxygen type into a valid typescript type.
-    """
-    optional = "?" in raw_type
-    raw_type = raw_type.replace("?", "").replace("@", "").strip()
 
-    raw_type = re.sub(r"\bbool\b", "boolean", raw_type)
-    raw_type = re.sub(r"\b(int|float|double|long|short|byte|uint)\b", "number", raw_type)
-    raw_type = re.sub(r"\b(ss\.)?(IList|List|IEnumerable|ICollection)\b", "Array", raw_type)
-    raw_type = re.sub(r"\b(ss\.)?JsDate\b", "Date", raw_type)
-    raw_type = re.sub(r"\bDateTime\b", "Date", raw_type)
-    raw_type = re.sub(r"\bObject\b", "object", raw_type)
-    raw_type = re.sub(r"\bjQueryObject\b", "JQuery", raw_type)
-    raw_type = re.sub(r"\bjQueryEvent\b", "JQuery.Event", raw_type)
-    raw_type = re.sub(r"\bjQueryEventHandler\b", "JQuery.EventHandler", raw_type)
-    raw_type = re.sub(r"\bdynamic\b", "any", raw_type)
-    raw_type = re.sub(r"\bDelegate\b", "Action<void>", raw_type)
-    raw_type = re.sub(r"^delegate (.*)$", r"Action<\1>", raw_type)
-    raw_type = re.sub(r"(ss\.)?(Js)?Dictionary\<", r"Record<", raw_type)
-    raw_type = re.sub(r"(ss\.)?(Js)?Dictionary$", r"Record<string,unknown>", raw_type)
-    raw_type = re.sub(r"(ss\.)?(Js)?Dictionary([^<])", r"Record<string,unknown>\1", raw_type)
-    raw_type = re.sub(r"^(sealed override|override|params|readonly|new|this|abstract|const) ", "", raw_type)
+def emit_parallel(out: "OutputSink", todo: List[int], workers: int, initargs: tuple) -> List[Tuple[int, Optional[Set[str]]]]:
+    """
+    Generates the typescript files for the classes at the specified positions with a pool of worker processes (see L{gen_ts}), writing
+    the files which the workers return to the specified sink.
 
-    if raw_type in ("any", "unknown", "boolean", "string", "void"):
-        return raw_type
+    @return: The number of import lines which were skipped and the identifiers referenced by each class (see L{emit_ts})
+    """
+    defs: List[ClassDef] = EMIT_STATE["defs"]
+    results = []
 
-    if raw_type.endswith("[])") or raw_type.startswith("Array<"):
-        return raw_type
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_emit, initargs=initargs) as executor:
+        chunksize = max(1, len(todo) // (workers * 4))
+        for pos, (result, stats) in zip(todo, executor.map(functools.partial(counted, emit_ts), todo, chunksize=chunksize)):
+            count, refs, content = result
+            if content is not None:
+                out.write("src/%s" % ts_path(defs[pos]), content)
+            results.append((count, refs))
+            STATS.update(stats)
 
-    if raw_type.startswith("Record<") or raw_type.startswith("TypeOption<"):
-        return raw_type
+    return results
 
-    if raw_type in ("number", "Date") and not optional:
-        return raw_type
 
-    return "%s | undefined" % raw_type
+EMIT_STATE: Dict[str, object] = {}
+""" The state shared by every file generated by L{emit_ts} in the current process (see L{init_emit}). """
 
 
-def read_doc(filename: str) -> List[ClassDef]:
+def init_emit(
+    out: Optional["OutputSink"],
+    defs: List[ClassDef],
+    extra_imports: Optional[List[str]],
+    all_imports: bool,
+    type_rules: Dict[str, str],
+    externals: Optional[List[ClassDef]] = None,
+) -> None:
     """
-    Reads in the XML Doxygen file specified by the given filename and returns its parsed contents.
-
-    @param filename: The XML file to read from
-    @return: All of the class definitions found in the file.
+    Prepares the current process to generate typescript files (see L{gen_ts}).  If C{out} is None, then the rendered files are returned
+    rather than written (see L{emit_ts}).
     """
-    classes = {}  # key = `${namespace}.${name}`, value = ClassDef
-
-    root = ElementTree.parse(filename).getroot()
-    for compound in root.findall("compounddef"):
-        kind = compound.get("kind")
+    load_type_rules(type_rules)
+    EMIT_STATE.update(
+        out=out,
+        defs=defs,
+        lookup=index_classes(defs + (externals or [])),
+        imports=ImportIndex(defs + (externals or [])),
+        extra_imports=extra_imports,
+        all_imports=all_imports,
+    )
 
-        if kind in ("class", "interface"):
-            key = compound.find("compoundname").text.replace("::", ".")
-            [namespace, name] = key.rsplit(".", 1)
-            doc_id = compound.get("id")
-            is_abstract = compound.get("abstract") == "yes"
-            methods = []
-            props = []
-            links = []
 
-            classes[key] = ClassDef(namespace, name, doc_id, methods, props, links, None, None, [], 0, None, is_abstract)
+def emit_ts(pos: int) -> Tuple[int, Optional[Set[str]], Optional[str]]:
+    """
+    Generates the typescript file for the class at the specified position (see L{gen_ts}).
 
-            for member in compound.findall("./sectiondef/memberdef"):
-                kind = member.get("kind")
-                prot = member.get("prot")
-                is_static = member.get("static") == "yes"
-                mname = member.find("name").text
-                if "<" in mname:
-                    mname = re.sub(r" *<.*>", "", mname)
-                desc = to_text(member.find("briefdescription"))
-                type_node = member.find("type")
-                for ref in type_node.findall("ref"):
-                    links.append(ref.get("refid"))
-                typ = to_type(to_text(type_node))
-                if not typ and mname == name:
-                    typ = name
+    @return: The number of import lines which were skipped because they were not referenced, the identifiers referenced by the class (or
+        None if every class is imported) and the rendered file (or None if it was written)
+    """
+    item = EMIT_STATE["defs"][pos]
+    bodies = render_bodies(item)
+    refs = None if EMIT_STATE["all_imports"] else find_refs(item, EMIT_STATE["lookup"], bodies)
+    content, skipped = render_ts(item, EMIT_STATE["imports"].defs, EMIT_STATE["imports"], EMIT_STATE["extra_imports"], refs, bodies)
 
-                if kind in ("property", "variable", "event"):
-                    props.append(PropDef(mname, None, typ, desc))
-                    methods.append(MethodDef("get_%s" % mname, [], typ, None, desc, prot, is_static))
-                    methods.append(MethodDef("get_$%s" % mname, [], typ, None, desc, prot, is_static))
-                    methods.append(MethodDef("set_%s" % mname, [PropDef("value", None, typ)], "void", None, desc, prot, is_static))
-                    methods.append(MethodDef("set_$%s" % mname, [PropDef("value", None, typ)], "void", None, desc, prot, is_static))
+    if EMIT_STATE["out"] is None:
+        return skipped, refs, content
 
-                elif kind == "function":
-                    params = []
-                    for param in member.findall("param"):
-                        pname = param.find("declname").text
-                        ptype_node = param.find("type")
-                        for ref in ptype_node.findall("ref"):
-                            links.append(ref.get("refid"))
-                        ptyp = to_type(to_text(ptype_node))
-                        prest = to_text(ptype_node).startswith("params ")
-                        params.append(PropDef(pname, None, ptyp, None, prest))
+    EMIT_STATE["out"].write("src/%s" % ts_path(item), content)
 
-                    methods.append(MethodDef(mname if mname != name else "", params, typ, None, desc, prot, is_static))
+    return skipped, refs, None
 
-    return classes.values()
 
-
-def find_prop(items: List[PropDef], name: str) -> Optional[PropDef]:
-    """
-    Finds the specified property by name (if it exists in the specified list.
-    """
-    for item in items:
-        if item.name.lower() == name.lower():
-            return item
-        if item.is_rest and re.match(r"^%s[1-9]$" % re.escape(name), item.name, re.IGNORECASE):
-            return item
-
-    return None
-
-
-def find_method(items: List[MethodDef], name: str, args: int) -> Optional[MethodDef]:
+def ts_path(item: ClassDef) -> str:
     """
-    Finds the specified method by name and number of arguments (if it exists in the specified list.
+    Returns the path of the typescript file for the specified class (relative to the C{src} folder of the output directory).
     """
-    matches = [
-        item
-        for item in items
-        if item.name.lower() == name.lower()
-        or item.name == "$" + name[:1].lower() + name[1:]
-        or item.name.startswith("$" + name[:1].lower() + name[1:] + "$")
-        or re.match(r"^%s\$[1-9]$" % re.escape(name), item.name, re.IGNORECASE)
-        or (name == "" and item.name.startswith("$ctor"))
-    ]
-
-    for item in matches:
-        if len(item.params) == args:
-            return item
-
-    if matches:
-        return matches[0]
+    return "%s/%s.ts" % (item.namespace.replace(".", "/"), item.name)
 
-    return None
 
-
-def add_doc_info(defs: List[ClassDef], types: List[ClassDef]) -> None:
+def render_ts(
+    item: ClassDef,
+    defs: List[ClassDef],
+    imports: "ImportIndex",
+    extra_imports: Optional[List[str]] = None,
+    refs: Optional[Set[str]] = None,
+    bodies: Optional[List[List[str]]] = None,
+) -> Tuple[str, int]:
     """
-    Updates the class definitions found in C{defs} to specify all of the documentation details found in C{types}.
+    Renders the typescript file for the specified class.
 
-    @param defs: The class definitions (from JS) to modify in-place to add type definitions.
-    @param types: The type definitions (from XML) to use for lookup.
+    @param item: The class to render
+    @param defs: All of the classes (which may be imported)
+    @param imports: All of the classes indexed by L{ImportIndex}
+    @param extra_imports: Additional import lines to add to the header of the file
+    @param refs: The identifiers referenced by the class (see L{find_refs}).  If None, then every class is imported.
+    @param bodies: The rendered body of each method (see L{render_bodies}), if they have already been rendered
+    @return: The contents of the file followed by the number of import lines which were skipped because they were not referenced
     """
-    classes = {}  # key = `${namespace}.${name}`, value = ClassDef
-    for curr_class in defs:
-        key = "%s.%s" % (curr_class.namespace, curr_class.name)
-        classes[key] = curr_class
+    fil = io.StringIO()
+    curr_dir = item.namespace.replace(".", "/")
 
-    for typ in types:
-        key = "%s.%s" % (typ.namespace, typ.name)
-        curr_class = classes.get(key)
+    if refs is None:
+        skipped = write_imports(defs, fil, curr_dir, item.var_id, item.name, extra_imports)
+    else:
+        write_imports(imports.select(refs), fil, curr_dir, item.var_id, item.name, extra_imports, refs)
+        skipped = imports.count(item.var_id, item.name) - imports.count(item.var_id, item.name, refs)
+    fil.write("\n")
+
+    if item.is_enum:
+        fil.write("enum %s {\n" % item.name)
+        for prop in item.props:
+            if not prop.name.startswith("__"):
+                fil.write("\n")
+                if prop.desc:
+                    fil.write("\t/** %s **/\n" % prop.desc)
+                fil.write("\t%s%s,\n" % (prop.name, " = %s" % prop.def_val if prop.def_val else ""))
 
-        if curr_class:
-            curr_class.doc_id = typ.doc_id
-            curr_class.is_abstract = typ.is_abstract
+        fil.write("}\n")
+        fil.write("\n")
+        fil.write("export default %s\n" % item.name)
+        return fil.getvalue(), skipped
 
-            for method in typ.methods:
-                curr_method = find_method(curr_class.methods, method.name, len(method.params))
+    if item.is_generic:
+        fil.write("/** [Generic] **/\n")
 
-                if curr_method:
-                    curr_method.typ = method.typ
-                    curr_method.desc = method.desc
-                    curr_method.protection = method.protection
-                    curr_method.is_static = curr_method.is_static or method.is_static
+    interfaces = "implements %s " % ", ".join(item.interfaces) if item.interfaces else ""
+    baseclass = "extends %s " % item.base_class if item.base_class else ""
+    fil.write("%sclass %s %s%s{\n" % ("abstract " if item.is_abstract else "", item.name, baseclass, interfaces))
 
-                    for param in method.params:
-                        curr_param = find_prop(curr_method.params, param.name)
+    for prop in item.props:
+        fil.write("\n")
+        if prop.desc:
+            fil.write("\t/** %s **/\n" % prop.desc)
+        fil.write("\t%s;\n" % prop_to_string(prop, True))
 
-                        if curr_param:
-                            curr_param.typ = param.typ
-                            curr_param.desc = param.desc
-                            curr_param.is_rest = param.is_rest
+    for method, body in zip(item.methods, bodies or render_bodies(item)):
+        fil.write("\n")
+        if method.desc:
+            fil.write("\t/** %s **/\n" % method.desc)
+        props = ", ".join(map(prop_to_string, method.params))
+        prot = method.protection if method.protection in ("public", "private", "protected") else ""
+        gen = ("<%s>" % ",".join(method.type_params)) if method.type_params else ""
+        if method.name:
+            fil.write("\t%s %s%s%s(%s): %s {\n" % (prot, "static " if method.is_static else "", method.name, gen, props, method.typ or "any"))
+        else:
+            fil.write("\tconstructor%s(%s) {\n" % (gen, props))
+        for line in body:
+            fil.write("\t%s\n" % line)
+        fil.write("\t}\n")
 
-            for prop in typ.props:
-                curr_prop = find_prop(curr_class.props, prop.name)
+    fil.write("}\n")
 
-                if curr_prop:
-                    curr_prop.typ = prop.typ
-                    curr_prop.desc = prop.desc
-                    curr_prop.is_rest = prop.is_rest
-                elif not prop.name.startswith("this["):
-                    curr_class.props.append(PropDef(to_local_prop(prop.name), None, prop.typ, prop.desc, prop.is_rest, False))
+    fil.write("\n")
+    fil.write("export default %s;" % item.name)
 
-            curr_class.links.extend(typ.links)
+    return fil.getvalue(), skipped
 
 
-def copy_file(in_file: str, out_file: str, asm_name: str, ns_name: str) -> None:
+def render_bodies(item: ClassDef) -> List[List[str]]:
     """
-    Copies the specified source file to the specified destination file and replacing template keyword with their correct values.
+    Returns the body of each method of the specified class as it is rendered (see L{rewrite_lines}), so that each body is only rewritten
+    once even though both L{find_refs} and L{render_ts} read it.
+    """
+    return [list(method.body if isinstance(method.body, LazyBody) else rewrite_lines(method.body or [])) for method in item.methods]
 
-    @param in_file: The template file to read in
-    @param out_file: The output file to create
-    @param asm_name: The name to pass to "ss.initAssembly"
-    @param ns_name: The namespace to export for external use
+
+class ImportIndex:
+    """
+    An index of the classes by var_id and name, so that the classes referenced by a file can be found without checking every class.
     """
-    lines = []
-    with open(in_file, "r") as fil:
-        for line in fil:
-            line = line.replace("{{FILENAME}}", "%s.js" % asm_name)
-            line = line.replace("{{LIBNAME}}", ns_name)
-            lines.append(line)
 
-    with open(out_file, "w") as fil:
-        for line in lines:
-            fil.write(line)
+    def __init__(self, defs: List[ClassDef]):
+        self.defs = list(defs)
+        """ The classes (in order). """
 
+        self.positions: Dict[str, List[int]] = {}
+        """ The positions of the classes with each var_id or name. """
 
-def copy_tpl(out_dir: str, asm_name: str, ns_name: str) -> None:
-    """
-    Copies the C{tpl} contents into the specified output directory (creating it first if it doesn't already exist) and replacing
-    template keywords with their correct values.
+        self.var_ids: Dict[str, int] = {}
+        """ The number of classes with each var_id. """
 
-    @param out_dir: The output directory
-    @param asm_name: The name to pass to "ss.initAssembly"
-    @param ns_name: The namespace to export for external use
-    """
-    tpl_dir = os.path.join(os.path.dirname(sys.argv[0]), "tpl")
-    ignored_dirs = list(map(lambda f: os.path.join(tpl_dir, f), ("coverage", "dist", "node_modules")))
+        for pos, item in enumerate(self.defs):
+            if item.var_id:
+                self.positions.setdefault(item.var_id, []).append(pos)
+                self.var_ids[item.var_id] = self.var_ids.get(item.var_id, 0) + 1
+            if item.name != item.var_id:
+                self.positions.setdefault(item.name, []).append(pos)
 
-    def is_ignored(dir_name: str) -> bool:
-        for ignored_dir in ignored_dirs:
-            if dir_name.startswith(ignored_dir):
-                return True
-        return False
+        self.names = {item.name for item in self.defs}
+        """ The distinct class names. """
 
-    for src_dir, _, files in os.walk(tpl_dir):
-        if not is_ignored(src_dir):
-            dst_dir = src_dir.replace(tpl_dir, out_dir, 1)
-            if not os.path.exists(dst_dir):
-                os.makedirs(dst_dir)
-            for fil in files:
-                src_file = os.path.join(src_dir, fil)
-                dst_file = os.path.join(dst_dir, fil)
-                copy_file(src_file, dst_file, asm_name, ns_name)
+        self.keys = [
+            ("%s %s %s%s\n" % (item.namespace, item.name, item.var_id, " %s" % item.root if item.root else "")).encode("utf-8") for item in self.defs
+        ]
+        """ The details of each class which appear in its import lines (see L{digest}). """
 
+    def find(self, refs: Set[str]) -> List[int]:
+        """
+        Returns the positions (in order) of the classes whose var_id or name is found in C{refs}.
+        """
+        return sorted({pos for ref in refs for pos in self.positions.get(ref, ())})
 
-def to_local_prop(name: str) -> str:
-    """
-    Converts a C# local property to a S# name
-    """
-    if name[:1] == name[:1].lower():
-        return "$" + name
+    def select(self, refs: Set[str]) -> List[ClassDef]:
+        """
+        Returns the classes (in order) whose var_id or name is found in C{refs}.
+        """
+        return [self.defs[pos] for pos in self.find(refs)]
 
-    return name[:1].lower() + name[1:]
+    def digest(self, refs: Optional[Set[str]] = None) -> str:
+        """
+        Returns a digest of the classes (as they appear in their import lines) whose var_id or name is found in C{refs} (or of every
+        class if C{refs} is None).
+        """
+        positions = range(len(self.defs)) if refs is None else self.find(refs)
+        return hashlib.md5(b"".join([self.keys[pos] for pos in positions])).hexdigest()
 
+    def count(self, ignore_var_id: Optional[str], ignore_name: Optional[str], refs: Optional[Set[str]] = None) -> int:
+        """
+        Returns the number of class import lines that L{write_imports} would write for all of the classes.
 
-def prop_to_string(prop: PropDef, always_def: Optional[bool] = False) -> str:
-    """
-    Generates a stringified version of the property for typescript
-    """
-    myval = prop.def_val
-    if always_def and not myval:
-        if not prop.typ:
-            myval = "undefined"
-        elif prop.typ == "boolean":
-            myval = "false"
-        elif prop.typ == "number":
-            myval = "0"
-        elif prop.typ == "Date":
-            myval = "new Date(0)"
-        elif prop.typ == "string":
-            myval = '""'
-        elif prop.typ.endswith("[]"):
-            myval = "[]"
-        elif prop.typ.startswith("Array<") and prop.typ.endswith(">"):
-            myval = "[]"
-        elif "undefined" not in prop.typ:
-            myval = "{} as " + prop.typ
-        else:
-            myval = "undefined"
+        @param ignore_var_id: The var_id which is not imported
+        @param ignore_name: The name which is not imported
+        @param refs: If specified, then only the import lines for the classes whose var_id or name is found in C{refs} are counted
+        """
+        var_ids = self.var_ids if refs is None else {ref: self.var_ids[ref] for ref in refs if ref in self.var_ids}
+        names = self.names if refs is None else self.names & refs
+        return sum(var_ids.values()) - var_ids.get(ignore_var_id, 0) + len(names) - (1 if ignore_name in names else 0)
 
-    if myval == "null":
-        myval = "undefined"
 
-    if myval == "undefined" and prop.typ == "string":
-        myval = '""'
+CACHE_FILE = ".salt2type-cache.json"
+""" The name of the cache manifest kept in the output directory by L{gen_ts} (in incremental mode). """
 
-    defval = " = %s" % myval if myval else ""
-    typstr = ": %s" % (prop.typ or "any") if not defval or prop.typ else ""
-    prefix = "..." if prop.is_rest else ("static " if prop.is_static else "")
-    return "%s%s%s%s" % (prefix, prop.name, typstr, defval)
+CACHE_VERSION = 2
+""" The version of the cache manifest (and of the digests stored in it). """
 
 
-def find_class(link: str, defs: List[ClassDef]) -> Optional[ClassDef]:
+def read_cache(out_dir: str) -> Dict[str, dict]:
     """
-    Finds the specified class by namespace-qualified class name, var_id or doc_id.
+    Reads in the cache manifest from the specified output directory.
+
+    @return: The cache entries keyed by the path of each generated file (empty if the manifest is missing, unreadable or outdated)
     """
-    for item in defs:
-        if link in (item.doc_id, item.var_id, "%s.%s" % (item.namespace, item.name)):
-            return item
+    try:
+        with open(os.path.join(out_dir, CACHE_FILE), "r") as fil:
+            cache = json.load(fil)
+    except (OSError, ValueError):
+        return {}
 
-    return None
+    return cache.get("files", {}) if isinstance(cache, dict) and cache.get("version") == CACHE_VERSION else {}
 
 
-def gen_ts(out_dir: str, defs: List[ClassDef], extra_imports: Optional[List[str]] = None) -> None:
+def write_cache(out_dir: str, files: Dict[str, dict]) -> None:
     """
-    Generates the typescript files for each known class in the specified output directory.
-
-    @param out_dir: The output directory
-    @param defs: The classes
+    Writes out the cache manifest to the specified output directory.  The manifest is replaced rather than overwritten (since it may be
+    hardlinked, see L{DirectorySink}).
     """
-    for item in defs:
-        dst_dir = os.path.join(out_dir, "src", item.namespace.replace(".", "/"))
-        if not os.path.exists(dst_dir):
-            os.makedirs(dst_dir)
-
-        with open(os.path.join(dst_dir, "%s.ts" % item.name), "w") as fil:
-            write_imports(defs, fil, item.namespace.replace(".", "/"), item.var_id, item.name, extra_imports)
-            fil.write("\n")
-
-            if item.is_enum:
-                fil.write("enum %s {\n" % item.name)
-                for prop in item.props:
-                    if not prop.name.startswith("__"):
-                        fil.write("\n")
-                        if prop.desc:
-                            fil.write("\t/** %s **/\n" % prop.desc)
-                        fil.write("\t%s%s,\n" % (prop.name, " = %s" % prop.def_val if prop.def_val else ""))
-
-                fil.write("}\n")
-                fil.write("\n")
-                fil.write("export default %s\n" % item.name)
-                continue
+    filename = os.path.join(out_dir, CACHE_FILE)
+    with open(filename + ".tmp", "w") as fil:
+        fil.write(json.dumps({"version": CACHE_VERSION, "files": files}, sort_keys=True))
+    os.replace(filename + ".tmp", filename)
 
-            if item.is_generic:
-                fil.write("/** [Generic] **/\n")
 
-            interfaces = "implements %s " % ", ".join(item.interfaces) if item.interfaces else ""
-            baseclass = "extends %s " % item.base_class if item.base_class else ""
-            fil.write("%sclass %s %s%s{\n" % ("abstract " if item.is_abstract else "", item.name, baseclass, interfaces))
+def is_unchanged(out_dir: str, path: str, entry: dict) -> bool:
+    """
+    Determines whether or not the specified generated file still exists, unmodified since it was recorded in the cache manifest.
+    """
+    try:
+        stat = os.stat(os.path.join(out_dir, "src", path))
+    except OSError:
+        return False
 
-            for prop in item.props:
-                fil.write("\n")
-                if prop.desc:
-                    fil.write("\t/** %s **/\n" % prop.desc)
-                fil.write("\t%s;\n" % prop_to_string(prop, True))
+    return stat.st_size == entry.get("size") and stat.st_mtime_ns == entry.get("mtime")
 
-            for method in item.methods:
-                fil.write("\n")
-                if method.desc:
-                    fil.write("\t/** %s **/\n" % method.desc)
-                props = ", ".join(map(prop_to_string, method.params))
-                prot = method.protection if method.protection in ("public", "private", "protected") else ""
-                gen = ("<%s>" % ",".join(method.type_params)) if method.type_params else ""
-                if method.name:
-                    fil.write("\t%s %s%s%s(%s): %s {\n" % (prot, "static " if method.is_static else "", method.name, gen, props, method.typ or "any"))
-                else:
-                    fil.write("\tconstructor%s(%s) {\n" % (gen, props))
-                for line in method.body:
-                    fil.write("\t%s\n" % fix_body_line(line))
-                fil.write("\t}\n")
 
-            fil.write("}\n")
+def class_digest(item: ClassDef, lookup: Dict[str, ClassDef], context: str) -> str:
+    """
+    Returns a digest of everything which the generated typescript for the specified class depends on (other than the classes which it
+    imports).  This covers the class as merged from its javascript block and its Doxygen compounddef (less any ignored members), the
+    names its documentation links resolve to and the specified context (the type mappings, extra imports, etc).  Method bodies are
+    hashed from their raw source rather than being formatted.
+    """
+    hasher = hashlib.md5(context.encode("utf-8"))
+    links = [lookup[link].name if link in lookup else None for link in item.links]
+    hasher.update(repr(replace(item, methods=[], links=links)).encode("utf-8"))
+
+    for method in item.methods:
+        hasher.update(repr(replace(method, body=None)).encode("utf-8"))
+        if isinstance(method.body, LazyBody):
+            hasher.update(method.body.raw())
+        elif method.body is not None:
+            hasher.update(repr(list(method.body)).encode("utf-8"))
 
-            fil.write("\n")
-            fil.write("export default %s;" % item.name)
+    return hasher.hexdigest()
 
 
 def write_imports(
@@ -829,19 +762,33 @@ def write_imports(
     ignore_var_id: Optional[str] = None,
     ignore_name: Optional[str] = None,
     extra_imports: Optional[List[str]] = None,
-) -> None:
-    """Writes all imports to the specified output stream except the specified ignore item"""
+    refs: Optional[Set[str]] = None,
+) -> int:
+    """
+    Writes all imports to the specified output stream except the specified ignore item.  If C{refs} is specified, then only those
+    classes whose var_id or name is found in C{refs} are imported.
+
+    @return: The number of import lines which were skipped because they were not found in C{refs}
+    """
     out_file.write("import Enumerable from 'linq';\n")
 
     go_up = re.sub(r"[^\/]+", "..", curr_dir) or "."
-    donelist = []
+    donelist = set()
+    skipped = 0
 
     for item in defs:
+        root = "%s/%s" % (go_up, item.root) if item.root else go_up
         if item.var_id and item.var_id != ignore_var_id:
-            out_file.write("import %s from '%s/%s/%s';\n" % (item.var_id, go_up, item.namespace.replace(".", "/"), item.name))
+            if refs is None or item.var_id in refs:
+                out_file.write("import %s from '%s/%s/%s';\n" % (item.var_id, root, item.namespace.replace(".", "/"), item.name))
+            else:
+                skipped += 1
         if item.name not in donelist and item.name != ignore_name:
-            out_file.write("import %s from '%s/%s/%s';\n" % (item.name, go_up, item.namespace.replace(".", "/"), item.name))
-            donelist.append(item.name)
+            if refs is None or item.name in refs:
+                out_file.write("import %s from '%s/%s/%s';\n" % (item.name, root, item.namespace.replace(".", "/"), item.name))
+            else:
+                skipped += 1
+            donelist.add(item.name)
 
     out_file.write("import * as ss from '%s/ss';\n" % go_up)
     out_file.write("import { Action, Delegate, Func, TypeOption } from '%s/ss/delegates';\n" % go_up)
@@ -850,28 +797,39 @@ def write_imports(
         for extra in extra_imports:
             out_file.write("%s\n" % extra.replace("{MAINDIR}", go_up))
 
-
-def fix_body_line(line: str) -> str:
-    """
-    Applies fixes to a body line of typescript code.
-    """
-    line = re.sub(r"\bnull\b", "undefined", line)
-    line = re.sub(r"^(\s*var [A-Za-z0-9$_]+) = \[\];\s*$", lambda m: f"{m.group(1)}: any[] = [];", line)
-
-    return line
+    return skipped
 
 
-def gen_index(out_dir: str, defs: List[ClassDef], globs: List[str], extra_imports: Optional[List[str]] = None) -> None:
+def gen_index(
+    out_dir: Union[str, OutputSink],
+    defs: List[ClassDef],
+    globs: List[str],
+    extra_imports: Optional[List[str]] = None,
+    all_imports: bool = False,
+    incremental: bool = False,
+    externals: Optional[List[ClassDef]] = None,
+) -> int:
     """
     Generates the index.ts file exporting each known class in the specified output directory.
 
-    @param out_dir: The output directory
+    @param out_dir: The output directory (or the sink to write the file to, see L{open_output})
     @param defs: The classes
     @param globs: The global method lines
+    @param extra_imports: Additional import lines to add to the header of the file
+    @param all_imports: If true, then every class is imported (rather than only those which are referenced by C{globs})
+    @param incremental: If true, then the file is only written if its contents have changed
+    @param externals: The classes generated by other projects which may also be imported (see L{ClassDef.root})
+    @return: The number of import lines which were skipped because they were not referenced
     """
-    with open(os.path.join(out_dir, "src", "index.ts"), "w") as fil:
-        write_imports(defs, fil, "", "", "", extra_imports)
+    refs = None if all_imports else {ref for glob in globs for ref in IDENT_RE.findall(glob)}
 
-        fil.write("\n")
-        for glob in globs:
-            fil.write("%s\n" % fix_body_line(glob))
+    fil = io.StringIO()
+    skipped = write_imports(list(defs) + (externals or []), fil, "", "", "", extra_imports, refs)
+
+    fil.write("\n")
+    for glob in globs:
+        fil.write("%s\n" % glob)
+
+    as_sink(out_dir).write("src/index.ts", fil.getvalue(), incremental)
+
+    return skipped
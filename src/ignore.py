@@ -0,0 +1,249 @@
+#!/usr/bin/python3
+# -.- coding: utf-8 -.-
+# -.- dependencies: Python 3.8+ -.-
+
+"""
+Salt2Type
+
+A tool to assist in migrating an existing codebase from Script# to TypeScript.
+
+MIT License
+
+Copyright (c) 2023 Pangaea Information Technologies, Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import copy, fnmatch, re
+from typing import Dict, Iterable, List, Pattern, Tuple, Optional, Set
+from .model import STATS
+
+####################
+### Ignore Rules ###
+####################
+
+
+class IgnoreRules:
+    """
+    The rules of an ignore file, compiled so that each class and each member can be checked against every rule at once.  Each rule is
+    either a class (e.g. C{package.ClassName}) or a member of a class (e.g. C{package.ClassName:MethodName}), and either part may be a
+    glob (e.g. C{package.legacy.*} or C{*:get_$*}, see L{fnmatch}).  Exact rules are looked up directly, rules which only end in a C{*}
+    are looked up by prefix and the other globs are combined into a single regular expression.  The number of classes and members which
+    each rule caused to be ignored is counted in L{STATS} (see L{report}).
+
+    The var_ids of the classes which have been ignored are added as they are found (see L{add}), so that the global statements which
+    refer to them can be ignored too.
+    """
+
+    def __init__(self, rules: Iterable[str] = ()):
+        self.rules: List[str] = []
+        """ The rules (in order, without duplicates). """
+
+        self.var_ids: Set[str] = set()
+        """ The var_ids of the classes which have been ignored. """
+
+        members: Dict[str, List[Tuple[str, str]]] = {}
+        class_rules = []
+        for rule in dict.fromkeys(rule.strip() for rule in rules):
+            if not rule or rule.startswith("#"):
+                continue
+            self.rules.append(rule)
+
+            class_part, sep, member = rule.partition(":")
+            if not sep:
+                class_rules.append((class_part, rule))
+            else:
+                members.setdefault(class_part, []).append((member, rule))
+
+        self.classes = IgnorePatterns(class_rules)
+        """ The class rules. """
+
+        self.members = {class_part: IgnorePatterns(patterns) for class_part, patterns in members.items() if not is_glob(class_part)}
+        """ The member rules whose class part is exact (keyed by the class part). """
+
+        self.member_globs = {class_part: patterns for class_part, patterns in members.items() if is_glob(class_part)}
+        """ The member patterns (along with their rules) of the member rules whose class part is a glob (keyed by the class part). """
+
+        self.member_classes = IgnorePatterns([(class_part, class_part) for class_part in self.member_globs])
+        """ The class parts of the member rules which are globs. """
+
+        self.filters: Dict[Tuple[str, str], Tuple[Optional[IgnorePatterns], Optional[IgnorePatterns]]] = {}
+        """ The member rules which apply to each class (see L{member_filters}). """
+
+        self.compiled: Dict[Tuple[str, ...], Optional[IgnorePatterns]] = {}
+        """ The member rules whose class part is a glob compiled for each combination of class parts (see L{member_filters}). """
+
+    def copy(self, var_ids: Iterable[str] = ()) -> "IgnoreRules":
+        """
+        Returns a copy of the rules (sharing the compiled rules) with the specified var_ids added.
+        """
+        rules = copy.copy(self)
+        rules.var_ids = self.var_ids | set(var_ids)
+        return rules
+
+    def add(self, var_id: str) -> None:
+        """
+        Records the var_id of a class which has been ignored.
+        """
+        self.var_ids.add(var_id)
+
+    def __contains__(self, name: str) -> bool:
+        """
+        Determines whether or not the specified name is the var_id or the namespace-qualified name of an ignored class (without counting
+        the match).
+        """
+        return name in self.var_ids or self.classes.match(name) is not None
+
+    def ignores_class(self, namespace: str, name: str) -> bool:
+        """
+        Determines whether or not the specified class is ignored (counting the rule which matched).
+        """
+        return counted_rule(self.classes.match("%s.%s" % (namespace, name)))
+
+    def ignores_member(self, namespace: str, name: str, member: str) -> bool:
+        """
+        Determines whether or not the specified member of the specified class is ignored (counting the rule which matched).
+        """
+        if (namespace, name) not in self.filters:
+            self.filters[(namespace, name)] = self.member_filters("%s.%s" % (namespace, name))
+
+        for filt in self.filters[(namespace, name)]:
+            if filt is not None and (rule := filt.match(member)) is not None:
+                return counted_rule(rule)
+
+        return False
+
+    def member_filters(self, class_name: str) -> Tuple[Optional["IgnorePatterns"], Optional["IgnorePatterns"]]:
+        """
+        Returns the member rules which apply to the specified class: those whose class part is the class itself, followed by those whose
+        class part is a glob which matches the class (either may be None).  The latter are only compiled once for each combination of
+        class parts which match a class (so every class in a namespace matched by the same globs shares them).
+        """
+        key = tuple(self.member_classes.match_all(class_name))
+
+        if key not in self.compiled:
+            patterns = [pattern for class_part in key for pattern in self.member_globs[class_part]]
+            self.compiled[key] = IgnorePatterns(patterns) if patterns else None
+
+        return self.members.get(class_name), self.compiled[key]
+
+    def report(self) -> List[Tuple[str, int]]:
+        """
+        Returns each rule along with the number of classes and members which it caused to be ignored (so far, see L{STATS}).
+        """
+        return [(rule, STATS.get("ignore:%s" % rule, 0)) for rule in self.rules]
+
+
+class IgnorePatterns:
+    """
+    A set of patterns (with the rule each belongs to) which are matched against a name all at once.  Exact patterns are found in a dict,
+    patterns which only end in a C{*} are found by looking up each prefix length in a dict, and the rest are combined into a single
+    regular expression (with a named group for each pattern).
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[str, str]] = ()):
+        self.exact: Dict[str, str] = {}
+        """ The rule of each exact pattern. """
+
+        self.prefixes: Dict[str, str] = {}
+        """ The rule of each prefix pattern (without its C{*}). """
+
+        self.globs: List[Tuple[Pattern, str]] = []
+        """ The other patterns (compiled) along with their rules. """
+
+        for pattern, rule in patterns:
+            if not is_glob(pattern):
+                self.exact.setdefault(pattern, rule)
+            elif pattern.endswith("*") and not is_glob(pattern[:-1]):
+                self.prefixes.setdefault(pattern[:-1], rule)
+            else:
+                self.globs.append((re.compile(fnmatch.translate(pattern)), rule))
+
+        self.lengths = sorted({len(prefix) for prefix in self.prefixes}, reverse=True)
+        """ The distinct lengths of the prefixes (longest first). """
+
+        self.regex = re.compile("|".join("(?P<g%d>%s)" % (pos, glob.pattern) for pos, (glob, _) in enumerate(self.globs))) if self.globs else None
+        """ The combined regular expression of the other patterns. """
+
+    def match(self, name: str) -> Optional[str]:
+        """
+        Returns the rule of the first pattern (exact, then longest prefix, then glob) which matches the whole of the specified name.
+        """
+        rule = self.exact.get(name)
+        if rule is not None:
+            return rule
+
+        for length in self.lengths:
+            if length <= len(name) and (rule := self.prefixes.get(name[:length])) is not None:
+                return rule
+
+        if self.regex and (match := self.regex.match(name)):
+            return self.globs[int(match.lastgroup[1:])][1]
+
+        return None
+
+    def match_all(self, name: str) -> List[str]:
+        """
+        Returns the rules of every pattern which matches the whole of the specified name.
+        """
+        rules = [self.exact[name]] if name in self.exact else []
+        rules.extend(self.prefixes[name[:length]] for length in self.lengths if length <= len(name) and name[:length] in self.prefixes)
+        rules.extend(rule for glob, rule in self.globs if glob.match(name))
+
+        return rules
+
+
+def is_glob(pattern: str) -> bool:
+    """
+    Determines whether or not the specified ignore pattern contains any wildcards (see L{fnmatch}).
+    """
+    return "*" in pattern or "?" in pattern or "[" in pattern
+
+
+def counted_rule(rule: Optional[str]) -> bool:
+    """
+    Counts a match of the specified ignore rule in L{STATS} (if any).
+
+    @return: True if a rule matched
+    """
+    if rule is None:
+        return False
+
+    STATS["ignore:%s" % rule] += 1
+    return True
+
+
+def clear_ignore_stats() -> None:
+    """
+    Resets the counts of the ignore rules which matched (see L{counted_rule}), so that L{IgnoreRules.report} only reports the next read.
+    """
+    for key in [key for key in STATS if key.startswith("ignore:")]:
+        del STATS[key]
+
+
+def read_ignore_rules(filename: Optional[str]) -> IgnoreRules:
+    """
+    Reads in the ignore file specified by the given filename (one rule per line, see L{IgnoreRules}).  Blank lines and lines starting
+    with C{#} are ignored.
+    """
+    if not filename:
+        return IgnoreRules()
+
+    with open(filename, "r") as fil:
+        return IgnoreRules(fil.read().splitlines())
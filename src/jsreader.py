@@ -0,0 +1,917 @@
+#!/usr/bin/python3
+# -.- coding: utf-8 -.-
+# -.- dependencies: Python 3.8+ -.-
+
+"""
+Salt2Type
+
+A tool to assist in migrating an existing codebase from Script# to TypeScript.
+
+MIT License
+
+Copyright (c) 2023 Pangaea Information Technologies, Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import bisect, collections, functools, itertools, mmap, os, re
+from concurrent.futures import ProcessPoolExecutor
+from array import array
+from typing import Dict, Iterable, Iterator, List, Match, Pattern, Sequence, Tuple, Optional, Set, Union
+from .typemap import TYPE_MAPPER, load_type_rules
+from .model import PropDef, MethodDef, ClassDef, STATS, counted, paused_gc
+from .ignore import IgnoreRules, read_ignore_rules
+from .jstokens import rewrite_lines, rewrite_line
+
+################
+### PATTERNS ###
+################
+
+JS_SKIP_LINES = {"(function() {", "\ufeff(function() {", "\t'use strict';", "})();", "\tvar $asm = {};"}
+""" Top-level lines which carry no information and are skipped. """
+
+JS_LINE_RE: Dict[str, Pattern] = {
+    "global_assign": re.compile(r"^\tglobal\.(.*) = (.*);$"),
+    "global_directive": re.compile(r"^\tglobal\..*;$"),
+    "ctor_proto": re.compile(
+        r"^\t(.*)\.\$ctor1\.prototype = \1\.prototype;$|^\t(.*)\.\$ctor\d\.prototype = \2\.\$ctor\d\.prototype = .*\.prototype;$"
+    ),
+    "global_block": re.compile(r"^\t(global|\$\.fn)\..*\{$"),
+    "init_assembly": re.compile(r"^\tss\.initAssembly\(\$asm, '(.*)'\);$"),
+    "separator": re.compile(r"^\t\/{80}$"),
+    "class_name": re.compile(r"^\t\/\/ (.*)$"),
+    "ctor": re.compile(r"^\tvar (.*) = function\((.*)\) \{$"),
+    "init_class_block": re.compile(r"^\tss\.initClass\((.*), \$asm, \{$"),
+    "init_class": re.compile(r"^\tss\.initClass\((.*), \$asm, \{(.*)\}(.*)\);$"),
+    "init_interface": re.compile(r"^\tss\.initInterface\((.*), \$asm, \{(.*)\}(.*)\);$"),
+    "init_generic": re.compile(r"^\tss\.initGeneric(Class|Interface)\((.*), \$asm, ([1-9][0-9]*)\);$"),
+    "init_enum": re.compile(r"^\tss\.initEnum\((.*), \$asm, \{(.*)\}(, true)?\);$"),
+    "init_block": re.compile(r"^\t\(function\(\) \{$"),
+}
+""" The patterns for each kind of top-level line, keyed by kind. """
+
+JS_MEMBER_RE: Dict[str, Pattern] = {
+    "static_method": re.compile(r"([A-Za-z0-9$_]+) = function\((.*)\) \{$"),
+    "static_prop": re.compile(r"([A-Za-z0-9$_]+) = (.*);$"),
+}
+""" The patterns for each kind of class member line, matched immediately after the C{"\\t%s." % var_id} prefix. """
+
+JS_ALL_KINDS = (
+    "global_assign",
+    "global_directive",
+    "ctor_proto",
+    "global_block",
+    "init_assembly",
+    "separator",
+    "class_name",
+    "ctor",
+    "static_method",
+    "static_prop",
+    "init_class_block",
+    "init_class",
+    "init_interface",
+    "init_generic",
+    "init_enum",
+    "init_block",
+)
+""" Every kind of top-level line (of L{JS_LINE_RE} and L{JS_MEMBER_RE}), in the order in which they are tried. """
+
+JS_PREFIX_KINDS = (
+    ("\tglobal.", ("global_assign", "global_directive", "global_block")),
+    ("\t$.fn.", ("ctor_proto", "global_block")),
+    ("\tss.init", ("ctor_proto", "init_assembly", "init_class_block", "init_class", "init_interface", "init_generic", "init_enum")),
+    ("\t//", ("separator", "class_name")),
+    ("\tvar ", ("ctor",)),
+    ("\t(function() {", ("init_block",)),
+)
+""" The kinds of line which are possible for each prefix (in the order in which they are tried). """
+
+JS_MEMBER_KINDS = ("ctor_proto", "static_method", "static_prop")
+""" The kinds of line which are possible when the line starts with the current class's var_id. """
+
+JS_INIT_RE = (
+    re.compile(r"^\t\t([A-Za-z0-9$_]+)\.([A-Za-z0-9$_]+) = (\[[^\[]*\]|\"[^\"]*\"|'[^']*'|\{[^\}]*\}|[0-9.-]+|null);$"),
+    re.compile(r"^\t\t([A-Za-z0-9$_]+)\.([A-Za-z0-9$_]+) = "),
+    re.compile(r"^\t\t([A-Za-z0-9$_]+)\."),
+)
+""" The patterns for lines inside of an initialization function (literal assignment, other assignment, other statement). """
+
+JS_GENERIC_RE = re.compile(r"^\t\treturn function\((.*)\) \{$")
+
+JS_GENERIC_END_RE = re.compile(r"^\t\t\};$")
+
+JS_END_RE = re.compile(r"^\t\};$")
+
+JS_BLOCK_END_RE = re.compile(r"^\t\}")
+
+JS_INIT_END_RE = re.compile(r"^\t\}\)\(\);")
+
+JS_CLASS_ENDINGS = (
+    (re.compile(r"^, ([^, ]+)$"), re.compile(r"^\t\}, ([^, ]+)\);$"), True, False),
+    (re.compile(r"^, null, \[(.*)\]$"), re.compile(r"^\t\}, null, \[(.*)\]\);$"), False, True),
+    (re.compile(r"^, ([^, ]+), \[(.*)\]$"), re.compile(r"^\t\}, ([^, ]+), \[(.*)\]\);$"), True, True),
+)
+""" The single-line and multi-line initClass endings, followed by whether they specify a base class and/or interfaces. """
+
+JS_INTERFACE_ENDING_RE = re.compile(r"^, \[(.*)\]$")
+
+
+######################
+### Script# Reader ###
+######################
+
+
+def classify_js_line(line: str, curr_class: Optional[ClassDef]) -> Tuple[Optional[str], Optional[Match]]:
+    """
+    Classifies the specified top-level line of a Script# file.  The line prefix is used to select the few patterns which could
+    possibly match before falling back to trying every pattern in order.
+
+    @param line: The line to classify
+    @param curr_class: The class currently being read (if any)
+    @return: The kind of line (None if unsupported) followed by the match (if applicable)
+    """
+    if line in JS_SKIP_LINES or line.startswith("\tss.setMetadata("):
+        return "skip", None
+
+    # the position just past the "\t%s." % var_id prefix (or zero if the line does not start with it)
+    member_pos = 0
+    if curr_class and curr_class.var_id and line.startswith("\t%s." % curr_class.var_id):
+        member_pos = len(curr_class.var_id) + 2
+
+    kinds = JS_MEMBER_KINDS if member_pos else None
+    if not kinds:
+        for prefix, prefix_kinds in JS_PREFIX_KINDS:
+            if line.startswith(prefix):
+                kinds = prefix_kinds
+                break
+
+    if kinds:
+        kind, match = match_js_kinds(line, kinds, curr_class is not None, member_pos)
+        if kind:
+            return kind, match
+
+    return match_js_kinds(line, JS_ALL_KINDS, curr_class is not None, member_pos)
+
+
+def match_js_kinds(line: str, kinds: Tuple[str, ...], in_class: bool, member_pos: int) -> Tuple[Optional[str], Optional[Match]]:
+    """
+    Tries each of the specified kinds of top-level line in order and returns the first which matches (if any).
+    """
+    for tried, kind in enumerate(kinds, 1):
+        if kind in JS_MEMBER_RE:
+            match = JS_MEMBER_RE[kind].match(line, member_pos) if member_pos else None
+        elif kind == "ctor" and not in_class:
+            match = None
+        else:
+            match = JS_LINE_RE[kind].match(line)
+
+        if match:
+            STATS["regex.read_js"] += tried
+            return kind, match
+
+    STATS["regex.read_js"] += len(kinds)
+    return None, None
+
+
+def read_js(filename: str, ignfile: Optional[str], jobs: Optional[int] = 1) -> Tuple[str, List[ClassDef], List[str]]:
+    """
+    Reads in the Script# file specified by the given filename and returns its parsed contents.  If C{jobs} is not 1, then large files are
+    split into shards which are parsed by a pool of worker processes (see L{read_js_sharded}).
+
+    @param filename: The JS file to read from
+    @param ignfile: The ignore file to read from (if applicable)
+    @param jobs: The number of worker processes to use (None for the number of CPUs)
+    @return: The name to pass to "ss.initAssembly" followed by all of the class definitions found in the file, followed by all of the global
+        statements to execute.
+    """
+    ignlist = read_ignore_rules(ignfile)
+    lines = JsSource(filename)
+    blocks = BlockIndex(lines)
+
+    if jobs != 1 and (result := read_js_sharded(lines, blocks, ignlist, jobs)):
+        return result
+
+    classes: Dict[str, ClassDef] = {}
+    _, asm_name, globs, _, _, _ = read_js_lines(lines, blocks, ignlist, classes, 0, len(lines))
+
+    return asm_name or "", list(classes.values()), globs
+
+
+def read_js_lines(
+    lines: "JsSource",
+    blocks: "BlockIndex",
+    ignlist: IgnoreRules,
+    classes: Dict[str, ClassDef],
+    start: int,
+    stop: int,
+    curr_class: Optional[ClassDef] = None,
+) -> Tuple[int, Optional[str], List[str], Dict[int, Tuple[str, str]], Optional[ClassDef], Dict[str, int]]:
+    """
+    Reads the top-level lines of a Script# file from C{start} up to C{stop} (see L{read_js}).
+
+    @param lines: The lines of the file
+    @param blocks: The block index of the lines
+    @param ignlist: The names of the classes and members to ignore (the var_ids of the ignored classes are added to it)
+    @param classes: The classes defined so far keyed by var_id (the classes which are read are added to it)
+    @param start: The first line to read
+    @param stop: The line to stop reading at
+    @param curr_class: The class being read at C{start} (if any)
+    @return: The index just past the last line read (which is past C{stop} if the last line started a block which ends after C{stop}), the
+        name passed to "ss.initAssembly" (if found), the global statements, the names checked against the ignore list by each global
+        assignment (keyed by its position in the global statements), the class being read at the end and the number of lines of each kind
+    """
+    globs: List[str] = []
+    glob_refs: Dict[int, Tuple[str, str]] = {}
+    asm_name: Optional[str] = None
+    kinds: Dict[str, int] = collections.Counter()
+
+    i = start
+    while i < stop:
+        line = lines[i]
+        kind, match = classify_js_line(line, curr_class)
+        kinds[kind] += 1
+
+        if kind in ("skip", "ctor_proto"):
+            # ignore single-line constructor directives since we're doing inheritance using typescript now
+            pass
+
+        elif kind == "global_assign":
+            # single-line global assignments
+            if match.group(1) not in ignlist and match.group(2) not in ignlist:
+                glob_refs[len(globs)] = (match.group(1), match.group(2))
+                globs.append(rewrite_line(line))
+
+        elif kind == "global_directive":
+            # single-line global directives
+            globs.append(rewrite_line(line))
+
+        elif kind == "global_block":
+            # multi-line global directives
+            end_line = blocks.find(JS_BLOCK_END_RE, i + 1)
+            globs.extend(rewrite_lines(lines[i : end_line + 1]))
+            i = end_line
+
+        elif kind == "init_assembly":
+            asm_name = match.group(1)
+
+        elif kind == "separator":
+            curr_class = None
+
+        elif kind == "class_name":
+            [namespace, name] = match.group(1).rsplit(".", 1)
+            curr_class = ClassDef(namespace, name, None, [], [], [], None, None, [], 0)
+
+        elif kind == "ctor":
+            # Class constructor
+            var_id = match.group(1)
+            curr_class.var_id = var_id
+            if not ignlist.ignores_class(curr_class.namespace, curr_class.name):
+                classes[var_id] = curr_class
+            else:
+                ignlist.add(var_id)
+
+            params = []
+            for prop in match.group(2).split(", "):
+                if prop:
+                    params.append(PropDef(prop))
+
+            end_line = blocks.find(JS_END_RE, i + 1)
+            curr_class.methods.append(MethodDef("", params, None, to_body(curr_class, lines, i + 1, end_line)))
+            i = end_line
+
+        elif kind == "static_method":
+            end_line = blocks.find(JS_END_RE, i + 1)
+
+            params = []
+            type_params = None
+            if (inner := JS_GENERIC_RE.match(lines[i + 1])) and JS_GENERIC_END_RE.match(lines[end_line - 1]):
+                # generic
+                body = (i + 2, end_line - 1)
+                for prop in inner.group(1).split(", "):
+                    if prop:
+                        params.append(PropDef(prop))
+                type_params = match.group(2).split(", ")
+
+            else:
+                # non-generic
+                body = (i + 1, end_line)
+                for prop in match.group(2).split(", "):
+                    if prop:
+                        params.append(PropDef(prop))
+
+            if not ignlist.ignores_member(curr_class.namespace, curr_class.name, match.group(1)):
+                curr_class.methods.append(MethodDef(match.group(1), params, None, to_body(curr_class, lines, *body), None, None, True, type_params))
+
+            i = end_line
+
+        elif kind == "static_prop":
+            if not ignlist.ignores_member(curr_class.namespace, curr_class.name, match.group(1)):
+                curr_class.props.append(PropDef(match.group(1), match.group(2), None, None, None, True))
+
+        elif kind == "init_class_block":
+            # Class multi-line definition
+            tmp_class = classes.get(match.group(1))
+            end_line = blocks.find(JS_BLOCK_END_RE, i + 1)
+
+            if tmp_class:
+                add_props(tmp_class, lines, r"\t\t", ignlist, blocks, i + 1, end_line)
+
+                final = lines[end_line]
+                if final != "\t});" and not add_class_ending(tmp_class, final, True):
+                    raise Exception("Unsupported initClass multi-line ending: %s" % final)
+
+            i = end_line
+
+        elif kind == "init_class":
+            # Class single-line definition
+            tmp_class = classes.get(match.group(1))
+
+            if tmp_class:
+                add_props(tmp_class, match.group(2).strip().split(", "), r"", ignlist)
+
+                final = match.group(3)
+                if final != "" and not add_class_ending(tmp_class, final, False):
+                    raise Exception("Unsupported initClass single-line ending: %s" % final)
+
+        elif kind == "init_interface":
+            tmp_class = classes.get(match.group(1))
+
+            if tmp_class:
+                add_props(tmp_class, match.group(2).strip().split(", "), r"", ignlist)
+
+                final = match.group(3)
+                if final == "":
+                    pass
+                elif inner := JS_INTERFACE_ENDING_RE.match(final):
+                    tmp_class.interfaces.extend(inner.group(1).split(", "))
+                else:
+                    raise Exception("Unsupported initInterface ending: %s" % final)
+
+        elif kind == "init_generic":
+            tmp_class = classes.get(match.group(2))
+            if tmp_class:
+                tmp_class.is_generic = int(match.group(3))
+
+        elif kind == "init_enum":
+            tmp_class = classes.get(match.group(1))
+            if tmp_class:
+                add_props(tmp_class, match.group(2).strip().split(", "), r"", ignlist)
+                tmp_class.is_enum = True
+
+        elif kind == "init_block":
+            # multi-line initialization functions
+            globs.append("")
+            end_line = blocks.find(JS_INIT_END_RE, i + 1)
+            read_init_block(lines[i + 1 : end_line], classes, globs, ignlist)
+            i = end_line
+
+        else:
+            raise Exception("Unsupported line: %s" % line)
+
+        i += 1
+
+    # NOTE: the lines within blocks (e.g. method bodies) are skipped over rather than classified
+    STATS["read_js.lines"] += stop - start
+    STATS.update({"read_js.%s" % kind: total for kind, total in kinds.items()})
+
+    return i, asm_name, globs, glob_refs, curr_class, kinds
+
+
+JS_SHARD_RE = rb"^\t(?://|ss\.init|\$\.fn\.|\(function\(\) \{)"
+""" The top-level lines at which a file may be split into shards (see L{plan_js_shards}). """
+
+JS_SHARD_LINES = 20000
+""" The minimum number of lines in each shard of a file read by L{read_js_sharded}. """
+
+JS_STATE: Dict[str, object] = {}
+""" The state shared by every shard read by L{read_js_shard} in the current process (see L{init_read_js}). """
+
+
+def plan_js_shards(lines: "JsSource", size: int) -> List[Tuple[int, int, bool]]:
+    """
+    Splits the lines of a Script# file into shards of (at least) roughly the specified number of lines, at the lines matching
+    L{JS_SHARD_RE}.  Each shard is either made up of class sections (starting with a separator or class name comment, both of which
+    reset the current class, and including the global assignments which follow each class) or of everything else (the initialization
+    statements, which refer to the classes).
+
+    @return: The start and stop of each shard (in order), followed by whether it is made up of class sections
+    """
+    shards = []
+    start, sections = 0, False
+    for i in lines.find_lines(JS_SHARD_RE) + [len(lines)]:
+        is_section = i < len(lines) and lines.raw(i, i + 1).startswith(b"\t//")
+        if i == len(lines) or is_section != sections or i - start >= size:
+            if i > start:
+                shards.append((start, i, sections))
+            start, sections = i, is_section
+
+    return shards
+
+
+def read_js_sharded(
+    lines: "JsSource", blocks: "BlockIndex", ignlist: IgnoreRules, jobs: Optional[int]
+) -> Optional[Tuple[str, List[ClassDef], List[str]]]:
+    """
+    Reads in the Script# file (see L{read_js}) by splitting it into shards (see L{plan_js_shards}) which are read by a pool of worker
+    processes and then merged in order.  The class sections are read first, and then the remaining shards are read against empty copies
+    of the classes defined before them, which collect the members (and base classes, etc) to add to the classes.
+
+    The result is identical to reading the file in one pass.  If the file is too small to be worth splitting, or if it could not be split
+    (e.g. a block spans two shards), then None is returned (so that the file is read in one pass instead).
+    """
+    cpus = jobs or os.cpu_count() or 1
+    shards = plan_js_shards(lines, max(JS_SHARD_LINES, len(lines) // (cpus * 4)))
+    workers = min(cpus, len(shards))
+    if workers <= 1 or len(shards) > cpus * 16:
+        return None
+
+    results: Dict[int, tuple] = {}
+    shard_stats = []
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=init_read_js, initargs=(lines, blocks, ignlist, dict(TYPE_MAPPER.rules)))
+    with pool as executor, paused_gc():
+        sections = [(start, stop) for start, stop, is_section in shards if is_section]
+        for (start, _), (result, stats) in zip(sections, executor.map(functools.partial(counted, read_js_shard), *zip(*sections))):
+            results[start] = result
+            shard_stats.append(stats)
+        if None in results.values():
+            return None
+
+        # the classes (and ignored classes) known at the start of each of the remaining shards
+        others = []
+        names: Dict[str, Tuple[str, str]] = {}
+        ignored: Set[str] = set()
+        curr_class: Optional[ClassDef] = None
+        for start, stop, is_section in shards:
+            if is_section:
+                _, _, _, classes, shard_ignored, curr_class = results[start]
+                names = dict(names, **{var_id: (item.namespace, item.name) for var_id, item in classes.items()})
+                ignored = ignored | set(shard_ignored)
+            else:
+                curr = None if curr_class is None else (curr_class.namespace, curr_class.name, curr_class.var_id, curr_class.var_id in names)
+                others.append((start, stop, names, ignored, curr))
+
+        if others:
+            for (start, *_), (result, stats) in zip(others, executor.map(functools.partial(counted, read_js_shard), *zip(*others))):
+                results[start] = result
+                shard_stats.append(stats)
+            if None in results.values():
+                return None
+
+    # NOTE: the counters are only merged once every shard has been read (since the file is read again in one pass otherwise)
+    for stats in shard_stats:
+        STATS.update(stats)
+
+    asm_name, classes, globs = merge_js_shards(shards, results)
+    bind_bodies(classes, lines)
+
+    return asm_name, classes, globs
+
+
+def merge_js_shards(shards: List[Tuple[int, int, bool]], results: Dict[int, tuple]) -> Tuple[str, List[ClassDef], List[str]]:
+    """
+    Merges the shards of a Script# file (see L{read_js_sharded}) in order.
+
+    @param shards: The first line, the line after the last and whether or not it is made up of class sections of each shard
+    @param results: The result of reading each shard keyed by its first line (see L{read_js_shard})
+    @return: The name to pass to "ss.initAssembly", the classes and the global statements
+    """
+    asm_name = ""
+    globs: List[str] = []
+    classes = {}
+    ignored = set()
+    for start, _, is_section in shards:
+        shard_asm_name, shard_globs, glob_refs, shard_classes, shard_ignored, _ = results[start]
+        if shard_asm_name is not None:
+            asm_name = shard_asm_name
+
+        # NOTE: the global assignments must also be checked against the classes ignored by the earlier shards
+        globs.extend(glob for k, glob in enumerate(shard_globs) if k not in glob_refs or ignored.isdisjoint(glob_refs[k]))
+        ignored.update(shard_ignored)
+
+        if is_section:
+            classes.update(shard_classes)
+        else:
+            for var_id, patch in shard_classes.items():
+                if tmp_class := classes.get(var_id):
+                    merge_class(tmp_class, patch)
+
+    return asm_name, list(classes.values()), globs
+
+
+def init_read_js(lines: "JsSource", blocks: "BlockIndex", ignlist: IgnoreRules, type_rules: Dict[str, str]) -> None:
+    """
+    Prepares the current process to read shards of a Script# file (see L{read_js_sharded}).
+    """
+    load_type_rules(type_rules)
+    JS_STATE.update(lines=lines, blocks=blocks, ignlist=ignlist)
+
+
+def read_js_shard(
+    start: int,
+    stop: int,
+    names: Optional[Dict[str, Tuple[str, str]]] = None,
+    ignored: Set[str] = frozenset(),
+    curr: Optional[Tuple[str, str, Optional[str], bool]] = None,
+) -> Optional[tuple]:
+    """
+    Reads a single shard of a Script# file (see L{read_js_sharded}).  If C{names} is specified, then the shard is read against empty
+    copies of the specified classes (see L{ClassStubs}) and the class being read at the start of the shard (if any) is as specified by
+    C{curr} (namespace, name, var_id and whether it is one of the specified classes).
+
+    @return: The name to pass to "ss.initAssembly" (if found), the global statements (and the names checked by the global assignments),
+        the classes defined (or the empty copies which were added to), the var_ids of the ignored classes and the class being read at the
+        end of the shard, or None if the shard could not be read on its own (i.e. it did not end at C{stop}, or it defined a class outside
+        of the class sections)
+    """
+    ignlist = JS_STATE["ignlist"].copy(ignored)
+    classes = {} if names is None else ClassStubs(names)
+    curr_class = None
+
+    if curr:
+        [namespace, name, var_id, known] = curr
+        curr_class = classes.get(var_id) if known else ClassDef(namespace, name, None, [], [], [], var_id, None, [], 0)
+
+    end, asm_name, globs, glob_refs, curr_class, kinds = read_js_lines(
+        JS_STATE["lines"], JS_STATE["blocks"], ignlist, classes, start, stop, curr_class
+    )
+    if end != stop or (names is not None and kinds["ctor"]):
+        return None
+
+    bind_bodies(classes.values(), None)
+    if curr_class:
+        bind_bodies([curr_class], None)
+
+    shard_ignored = sorted(ignlist.var_ids - JS_STATE["ignlist"].var_ids - ignored)
+    return asm_name, globs, glob_refs, dict(classes), shard_ignored, None if names is not None else curr_class
+
+
+class ClassStubs(Dict[str, ClassDef]):
+    """
+    The classes known to a shard of a Script# file (see L{read_js_shard}), keyed by var_id.  Each class is only created (as an empty copy
+    which collects whatever the shard adds to the class) when it is first looked up.
+    """
+
+    def __init__(self, names: Dict[str, Tuple[str, str]]):
+        super().__init__()
+        self.names = names
+        """ The namespace and name of each known class (keyed by var_id). """
+
+    def get(self, var_id, default=None):
+        if var_id not in self and var_id in self.names:
+            [namespace, name] = self.names[var_id]
+            self[var_id] = ClassDef(namespace, name, None, [], [], [], var_id, None, [], 0)
+        return super().get(var_id, default)
+
+
+def merge_class(curr_class: ClassDef, patch: ClassDef) -> None:
+    """
+    Adds whatever was collected by an empty copy of the class (see L{ClassStubs}) to the class.
+    """
+    curr_class.methods.extend(patch.methods)
+    curr_class.props.extend(patch.props)
+    curr_class.interfaces.extend(patch.interfaces)
+    if patch.base_class is not None:
+        curr_class.base_class = patch.base_class
+    if patch.is_generic:
+        curr_class.is_generic = patch.is_generic
+    if patch.is_enum is not None:
+        curr_class.is_enum = patch.is_enum
+
+
+def bind_bodies(defs: Iterable[ClassDef], source: Optional[Sequence[str]]) -> None:
+    """
+    Sets the source of the (unbound) lazy method bodies of the specified classes.  The bodies are unbound (i.e. their source is set to
+    None) before being sent between processes, since the source is the same memory-mapped file in every process.
+    """
+    for item in defs:
+        for method in item.methods:
+            if isinstance(method.body, LazyBody) and (source is None or method.body.source is None):
+                method.body.source = source
+
+
+def add_class_ending(curr_class: ClassDef, final: str, multi_line: bool) -> bool:
+    """
+    Adds the base class and interfaces specified by the ending of an initClass definition to the specified class.
+
+    @return: Whether or not the ending was recognized
+    """
+    for single_re, multi_re, has_base, has_interfaces in JS_CLASS_ENDINGS:
+        if inner := (multi_re if multi_line else single_re).match(final):
+            if has_base:
+                curr_class.base_class = inner.group(1)
+            if has_interfaces:
+                curr_class.interfaces.extend(inner.group(inner.lastindex).split(", "))
+            return True
+
+    return False
+
+
+def read_init_block(inits: List[str], classes: Dict[str, ClassDef], globs: List[str], ignlist: IgnoreRules) -> None:
+    """
+    Reads the lines of a multi-line initialization function, adding static properties to the known classes and everything else to
+    the global statements.
+    """
+    for init in inits:
+        if match := JS_INIT_RE[0].match(init):
+            tmp_class = classes.get(match.group(1))
+            if tmp_class:
+                tmp_class.props.append(PropDef(match.group(2), match.group(3), None, None, None, True))
+            elif match.group(1) not in ignlist:
+                globs.append(rewrite_line(init))
+        elif match := JS_INIT_RE[1].match(init):
+            tmp_class = classes.get(match.group(1))
+            if tmp_class:
+                tmp_class.props.append(PropDef(match.group(2), None, None, None, None, True))
+
+            if match.group(1) not in ignlist:
+                globs.append(rewrite_line(init))
+        elif match := JS_INIT_RE[2].match(init):
+            if match.group(1) not in ignlist:
+                globs.append(rewrite_line(init))
+        else:
+            globs.append(rewrite_line(init))
+
+
+def to_body(curr_class: ClassDef, lines: Sequence[str], start: int = 0, stop: Optional[int] = None) -> Sequence[str]:
+    """
+    Returns the specified method body (i.e. the lines from C{start} up to C{stop}) formatted for inclusion inside the class.  The lines
+    are only read and formatted when the body is iterated.
+    """
+    return LazyBody(lines, start, len(lines) if stop is None else stop, curr_class.var_id, curr_class.name)
+
+
+class LazyBody(Sequence[str]):
+    """
+    The body of a method, stored as a range of lines within its source and formatted for inclusion inside its class only when read.
+    """
+
+    __slots__ = ("source", "start", "stop", "var_id", "name")
+
+    def __init__(self, source: Sequence[str], start: int, stop: int, var_id: str, name: str):
+        self.source = source
+        self.start = start
+        self.stop = stop
+        self.var_id = var_id
+        self.name = name
+
+    def __len__(self) -> int:
+        return max(self.stop - self.start, 0)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(index, slice):
+            return list(self)[index]
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+
+        # NOTE: the preceding lines are rewritten too, since they may open a block comment which the line is inside of
+        return next(itertools.islice(iter(self), index, None))
+
+    def __iter__(self) -> Iterator[str]:
+        return rewrite_lines((self.source[i] for i in range(self.start, self.stop)), self.var_id, self.name)
+
+    def __reduce__(self):
+        return (LazyBody, (self.source, self.start, self.stop, self.var_id, self.name))
+
+    def detach(self) -> "LazyBody":
+        """
+        Returns a copy of the body which holds its own (unformatted) lines rather than referring to its source.
+        """
+        return LazyBody(list(self.source[self.start : self.stop]), 0, len(self), self.var_id, self.name)
+
+    def raw(self) -> bytes:
+        """
+        Returns the (unformatted) lines of the body as they appear in the source.
+        """
+        if isinstance(self.source, JsSource):
+            return self.source.raw(self.start, self.stop)
+        return "".join("%s\n" % line for line in self.source[self.start : self.stop]).encode("utf-8")
+
+
+class JsSource(Sequence[str]):
+    """
+    The lines of a javascript file.  The file is memory-mapped rather than read into memory and only the offset of each line is kept,
+    so each line is decoded only when it is accessed.  Lines are split on C{\\n} (with any trailing C{\\r} removed).
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        """ The file being read. """
+
+        with open(filename, "rb") as fil:
+            self.data = mmap.mmap(fil.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(fil.fileno()).st_size else b""
+            """ The (memory-mapped) contents of the file. """
+
+        self.offsets = array("q", [0])
+        """ The offset of the start of each line, followed by the offset of the end of the file. """
+
+        self.offsets.extend(match.end() for match in re.finditer(b"\n", self.data))
+
+        if self.offsets[-1] != len(self.data):
+            self.offsets.append(len(self.data))
+
+        self.count = len(self.offsets) - 1
+        """ The number of lines. """
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.count))]
+
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+
+        line = self.data[self.offsets[index] : self.offsets[index + 1]]
+        return line.rstrip(b"\n").rstrip(b"\r").decode("utf-8")
+
+    def __reduce__(self):
+        return (JsSource, (self.filename,))
+
+    def raw(self, start: int, stop: int) -> bytes:
+        """
+        Returns the (undecoded) contents of the lines from C{start} up to C{stop}.
+        """
+        start = min(max(start, 0), self.count)
+        stop = min(max(stop, start), self.count)
+        return bytes(self.data[self.offsets[start] : self.offsets[stop]])
+
+    def find_lines(self, pattern: bytes) -> List[int]:
+        """
+        Finds the indexes of the lines whose start matches the specified (binary) pattern (without decoding every line).
+        """
+        return [bisect.bisect_right(self.offsets, match.start()) - 1 for match in re.finditer(pattern, self.data, re.MULTILINE)]
+
+    def find_closers(self) -> List[int]:
+        """
+        Finds the indexes of the lines whose first non-tab character is a closing brace (without decoding every line).
+        """
+        return self.find_lines(rb"^\t*\}")
+
+
+class BlockIndex:
+    """
+    An index of the block endings within a list of lines.  The lines which close a block (i.e. whose first non-tab character is a
+    closing brace) are found once up front, and the first matching closing line at or after every closing line is then precomputed
+    (once per closing pattern) so that every block end is found in constant time rather than by re-scanning the lines.
+    """
+
+    def __init__(self, lines: Sequence[str]):
+        self.lines = lines
+        """ The lines being indexed. """
+
+        # the indexes of the lines which may close a block
+        if isinstance(lines, JsSource):
+            self.closers = lines.find_closers()
+        else:
+            self.closers = [i for i, line in enumerate(lines) if line.lstrip("\t").startswith("}")]
+
+        self.closer_lines = [lines[i] for i in self.closers]
+        """ The contents of the lines which may close a block. """
+
+        marks = bytearray(len(lines) + 1)
+        for i in self.closers:
+            marks[i] = 1
+        self.rank = array("l", itertools.accumulate(marks, initial=0))
+        """ For every line, the number of closing lines before it (i.e. the position in C{closers} of the next closing line). """
+
+        self.next_match: Dict[Pattern, array] = {}
+        """ For each closing pattern and each position in C{closers}, the index of the next matching line (len(lines) if none). """
+
+        self.scanned = len(lines)
+        """ The total number of lines examined while building the index. """
+
+    def find(self, pattern: Pattern, start: int, stop: Optional[int] = None) -> int:
+        """
+        Finds the index of the first line at or after C{start} (and before C{stop}) which matches the specified closing pattern.
+
+        @param pattern: The closing pattern (which must only match lines whose first non-tab character is a closing brace)
+        @param start: The index to start from
+        @param stop: The index to stop before (the end of the lines if not specified)
+        @return: The index of the matching line
+        """
+        next_match = self.next_match.get(pattern)
+        if next_match is None:
+            next_match = self.next_match[pattern] = self.build(pattern)
+
+        count = len(self.lines)
+        found = next_match[self.rank[min(start, count)]]
+        if found >= (count if stop is None else stop):
+            raise Exception("Could not find match for '%s'" % pattern.pattern)
+
+        return found
+
+    def build(self, pattern: Pattern) -> array:
+        """
+        Builds the next-match table for the specified closing pattern.
+        """
+        found = len(self.lines)
+        next_match = array("l", [found]) * (len(self.closers) + 1)
+
+        for k in range(len(self.closers) - 1, -1, -1):
+            if pattern.match(self.closer_lines[k]):
+                found = self.closers[k]
+            next_match[k] = found
+
+        self.scanned += len(self.closers)
+        return next_match
+
+
+@functools.lru_cache(maxsize=None)
+def prop_patterns(prefix: str) -> Tuple[Pattern, Pattern, Pattern, Pattern, Pattern]:
+    """
+    Returns the compiled method, method end, generic method, generic method end and property patterns for the specified indentation
+    prefix.
+    """
+    return (
+        re.compile(r"^%s(.*): function\((.*)\) \{$" % prefix),
+        re.compile(r"^%s},?$" % prefix),
+        re.compile(r"^%s\treturn function\((.*)\) \{$" % prefix),
+        re.compile(r"^%s\t\};$" % prefix),
+        re.compile(r"^%s(.*): (.*[^,]),?$" % prefix),
+    )
+
+
+def add_props(
+    curr_class: ClassDef,
+    lines: Sequence[str],
+    prefix: str,
+    ignlist: IgnoreRules,
+    blocks: Optional[BlockIndex] = None,
+    start: int = 0,
+    stop: Optional[int] = None,
+) -> None:
+    """
+    Adds the properties and methods specified in the given source (i.e. the
+    lines from C{start} up to C{stop}) to the specified class.  Uses the
+    prefix to determine the current indentation level.  If specified, the
+    block index of C{lines} is used to find the end of each method.
+    """
+    if stop is None:
+        stop = len(lines)
+
+    if stop - start == 1 and lines[start] == "":
+        return
+
+    if blocks is None:
+        blocks = BlockIndex(lines)
+
+    method_re, end_re, generic_re, generic_end_re, prop_re = prop_patterns(prefix)
+
+    i = start
+    while i < stop:
+        line = lines[i]
+
+        if match := method_re.match(line):
+            end_line = blocks.find(end_re, i + 1, stop)
+            # Method
+
+            params = []
+            type_params = None
+            if (inner := generic_re.match(lines[i + 1])) and generic_end_re.match(lines[end_line - 1]):
+                # generic
+                body = (i + 2, end_line - 1)
+                for prop in inner.group(1).split(", "):
+                    if prop:
+                        params.append(PropDef(prop))
+                type_params = match.group(2).split(", ")
+
+            else:
+                # non-generic
+                body = (i + 1, end_line)
+                for prop in match.group(2).split(", "):
+                    if prop:
+                        params.append(PropDef(prop))
+
+            if not ignlist.ignores_member(curr_class.namespace, curr_class.name, match.group(1)):
+                curr_class.methods.append(MethodDef(match.group(1), params, None, to_body(curr_class, lines, *body), None, None, None, type_params))
+            i = end_line
+        elif match := prop_re.match(line):
+            # Property
+            if not ignlist.ignores_member(curr_class.namespace, curr_class.name, match.group(1)):
+                curr_class.props.append(PropDef(match.group(1), match.group(2)))
+        else:
+            raise Exception("Unsupported inner class line: %s" % line)
+
+        i += 1
@@ -0,0 +1,231 @@
+#!/usr/bin/python3
+# -.- coding: utf-8 -.-
+# -.- dependencies: Python 3.8+ -.-
+
+"""
+Salt2Type
+
+A tool to assist in migrating an existing codebase from Script# to TypeScript.
+
+MIT License
+
+Copyright (c) 2023 Pangaea Information Technologies, Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import re
+from typing import Iterable, Iterator, List, Tuple, Optional
+from .model import STATS, to_type
+
+################
+### PATTERNS ###
+################
+
+JS_TOKEN_RE = re.compile(
+    r"(?P<space>\s+)"
+    r"|(?P<comment>//.*|/\*.*?(?:\*/|$))"
+    r"|(?P<string>'(?:[^'\\]|\\.)*(?:'|\\?$)|\"(?:[^\"\\]|\\.)*(?:\"|\\?$))"
+    r"|(?P<ident>[A-Za-z_$][A-Za-z0-9_$]*)"
+    r"|(?P<number>\.?[0-9][A-Za-z0-9_.]*)"
+    r"|(?P<regex>/(?:[^/\\\[]|\\.|\[(?:[^\]\\]|\\.)*\])+/[A-Za-z]*)"
+    r"|(?P<punct>.)"
+)
+""" The tokens of a line of javascript (see L{js_tokens}). """
+
+JS_REGEX_KEYWORDS = {"return", "typeof", "instanceof", "in", "of", "new", "delete", "void", "throw", "case", "do", "else"}
+""" The keywords after which a C{/} starts a regular expression literal (rather than being a division). """
+
+
+#################
+### Tokenizer ###
+#################
+
+
+def js_tokens(line: str, in_comment: bool = False) -> Tuple[List[Tuple[str, str]], bool]:
+    """
+    Splits the specified line of javascript into its tokens (see L{JS_TOKEN_RE}).  A C{/} is only treated as the start of a regular
+    expression literal where a division could not appear.
+
+    @param line: The line to split
+    @param in_comment: Whether or not the line starts inside of a block comment (which began on an earlier line)
+    @return: The kind and text of each token, followed by whether or not the line ends inside of a block comment
+    """
+    tokens = []
+    pos = 0
+
+    if in_comment:
+        end = line.find("*/")
+        if end < 0:
+            return [("comment", line)], True
+        tokens.append(("comment", line[: end + 2]))
+        pos = end + 2
+
+    prev = ("", "")
+    while pos < len(line):
+        match = JS_TOKEN_RE.match(line, pos)
+        kind, text = match.lastgroup, match.group()
+        if kind == "regex" and (prev[1] in (")", "]") or prev[0] in ("ident", "number") and prev[1] not in JS_REGEX_KEYWORDS):
+            kind, text = "punct", "/"
+        tokens.append((kind, text))
+        pos += len(text)
+        if kind not in ("space", "comment"):
+            prev = (kind, text)
+
+    kind, text = tokens[-1] if tokens else ("", "")
+    return tokens, kind == "comment" and text.startswith("/*") and (len(text) < 4 or not text.endswith("*/"))
+
+
+def rewrite_lines(lines: Iterable[str], var_id: Optional[str] = None, name: Optional[str] = None) -> Iterator[str]:
+    """
+    Prepares the specified lines of javascript for typescript in a single pass over the tokens of each line (see L{js_tokens}), so that
+    nothing inside of a string literal, regular expression literal or comment is rewritten:
+        - the var_id of the class is replaced by its name
+        - generic method calls (e.g. C{fn(T).call(null, x)}) become typescript generic calls (e.g. C{fn<T>(x)}), including those whose
+          type arguments are themselves generic (see L{type_args})
+        - C{null} becomes C{undefined}
+        - an empty array assigned to a new variable is typed as C{any[]}
+
+    Lines which could not need any of these rewrites are passed through without being split into tokens.
+
+    @param lines: The lines to rewrite (in order, so that block comments spanning several lines are recognised)
+    @param var_id: The var_id to replace (if any)
+    @param name: The name to replace the var_id with
+    """
+    in_comment = False
+
+    for line in lines:
+        STATS["rewrite.lines"] += 1
+        if not in_comment and "/*" not in line and "null" not in line and ".call(" not in line and "[]" not in line:
+            if not var_id or var_id not in line:
+                yield line
+                continue
+
+        tokens, in_comment = js_tokens(line, in_comment)
+        yield rewrite_tokens(tokens, var_id, name)
+
+
+def rewrite_line(line: str, var_id: Optional[str] = None, name: Optional[str] = None) -> str:
+    """
+    Prepares the specified line of javascript for typescript (see L{rewrite_lines}).
+    """
+    return next(rewrite_lines((line,), var_id, name))
+
+
+def rewrite_tokens(tokens: List[Tuple[str, str]], var_id: Optional[str], name: Optional[str]) -> str:
+    """
+    Applies the rewrites of L{rewrite_lines} to the specified tokens of a single line.
+    """
+    STATS["rewrite.tokens"] += len(tokens)
+
+    code = [token for token in tokens if token[0] != "space"]
+    if len(code) == 6 and code[1][0] == "ident" and [text for _, text in code[:1] + code[2:]] == ["var", "=", "[", "]", ";"]:
+        indent = tokens[0][1] if tokens[0][0] == "space" else ""
+        ident = name if code[1][1] == var_id else code[1][1]
+        return "%svar %s: any[] = [];" % (indent, ident)
+
+    out = []
+    i = 0
+    while i < len(tokens):
+        kind, text = tokens[i]
+
+        if kind == "ident":
+            close = find_close(tokens, i + 1)
+            if close is not None and close > i + 2 and [tok[1] for tok in tokens[close + 1 : close + 4]] == [".", "call", "("]:
+                # generic method call
+                out.append("%s<%s>(" % (name if text == var_id else text, to_type(type_args(tokens[i + 2 : close], var_id, name))))
+                i = close + 4
+                if [tok[1] for tok in tokens[i : i + 2]] == ["null", ","] and i + 2 < len(tokens) and tokens[i + 2][0] == "space":
+                    i += 3
+                continue
+
+            if text == var_id:
+                text = name
+            elif text == "null":
+                text = "undefined"
+
+        out.append(text)
+        i += 1
+
+    return "".join(out)
+
+
+def find_close(tokens: List[Tuple[str, str]], pos: int) -> Optional[int]:
+    """
+    Returns the position of the closing parenthesis matching the opening parenthesis at the specified position (or None if there is no
+    opening parenthesis there, or it is not closed on the same line).
+    """
+    if pos >= len(tokens) or tokens[pos][1] != "(":
+        return None
+
+    depth = 0
+    for i in range(pos, len(tokens)):
+        kind, text = tokens[i]
+        if kind == "punct":
+            if text == "(":
+                depth += 1
+            elif text == ")":
+                depth -= 1
+                if not depth:
+                    return i
+
+    return None
+
+
+def strip_tokens(tokens: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """
+    Returns the specified tokens without any leading or trailing whitespace.
+    """
+    start, stop = 0, len(tokens)
+    while start < stop and tokens[start][0] == "space":
+        start += 1
+    while stop > start and tokens[stop - 1][0] == "space":
+        stop -= 1
+
+    return tokens[start:stop]
+
+
+def type_args(tokens: List[Tuple[str, str]], var_id: Optional[str], name: Optional[str]) -> str:
+    """
+    Returns the type arguments of a generic method call (see L{rewrite_tokens}) in typescript syntax.  Generic type arguments, which
+    Saltarelle passes as calls (e.g. C{$Acme_Box(T)} or C{ss.makeGenericType($Acme_Box, [T])}), become typescript generic types (e.g.
+    C{Box<T>}).
+    """
+    out: List[str] = []
+    i = 0
+    while i < len(tokens):
+        kind, text = tokens[i]
+        if kind == "ident" and (close := find_close(tokens, i + 1)) is not None:
+            inner = tokens[i + 2 : close]
+            if text == "makeGenericType" and out[-2:] == ["ss", "."]:
+                split = next((k for k, tok in enumerate(inner) if tok[1] == ","), len(inner))
+                args = strip_tokens(inner[split + 1 :])
+                if args[:1] == [("punct", "[")] and args[-1:] == [("punct", "]")]:
+                    args = args[1:-1]
+                del out[-2:]
+                out.append("%s<%s>" % (type_args(strip_tokens(inner[:split]), var_id, name), type_args(args, var_id, name)))
+            else:
+                out.append("%s<%s>" % (name if text == var_id else text, type_args(inner, var_id, name)))
+            i = close + 1
+            continue
+
+        out.append(name if kind == "ident" and text == var_id else text)
+        i += 1
+
+    return "".join(out)
@@ -0,0 +1,249 @@
+#!/usr/bin/python3
+# -.- coding: utf-8 -.-
+# -.- dependencies: Python 3.8+ -.-
+
+"""
+Salt2Type
+
+A tool to assist in migrating an existing codebase from Script# to TypeScript.
+
+MIT License
+
+Copyright (c) 2023 Pangaea Information Technologies, Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import collections, contextlib, gc, operator
+from dataclasses import dataclass, fields
+from typing import Counter, Dict, Iterator, List, Sequence, Tuple, Optional
+from .typemap import TYPE_MAPPER
+
+#############
+### TYPES ###
+#############
+
+
+def slotted(cls: type) -> type:
+    """
+    Recreates the specified dataclass with C{__slots__} for its fields (rather than a per-instance C{__dict__}), since the model is made
+    up of a very large number of small objects.  Instances are pickled as their field values (in order), which is much quicker than the
+    default pickling of slotted objects.
+    """
+    names = tuple(field.name for field in fields(cls))
+    getter = operator.attrgetter(*names)
+
+    def __reduce__(self):
+        return (type(self), getter(self))
+
+    namespace = {key: value for key, value in cls.__dict__.items() if key not in names + ("__dict__", "__weakref__")}
+    namespace["__slots__"] = names
+    namespace["__reduce__"] = __reduce__
+    return type(cls)(cls.__name__, cls.__bases__, namespace)
+
+
+@slotted
+@dataclass
+class PropDef:
+    """The definition of a property"""
+
+    name: str
+    """ the name of the property.  the name will be parameterized if it is generic. """
+
+    def_val: Optional[str] = None
+    """ The default value of the property (if known/applicable) """
+
+    typ: Optional[str] = None
+    """ The type of the property (if known). """
+
+    desc: Optional[str] = None
+    """ The brief description of the property (if known). """
+
+    is_rest: Optional[bool] = None
+    """ Whether or not this is a rest parameter (None if unknown). """
+
+    is_static: Optional[bool] = None
+    """ Whether or not this property is static (None if unknown). """
+
+
+@slotted
+@dataclass
+class MethodDef:
+    """The definition of a class method"""
+
+    name: str
+    """
+    the name of the method (empty string if it is the constructor).
+    the name will be parameterized if it is generic.
+    the name will be prefixed by "operator " if it is implicit.
+    the name will be "this[...]" if it is an indexer.
+    """
+
+    params: List[PropDef]
+    """ The ordered parameters of the method """
+
+    typ: Optional[str] = None
+    """ The return type of the method (if known). """
+
+    body: Optional[Sequence[str]] = None
+    """ The lines making up the body of the method (if known).  Bodies parsed by L{read_js} are only read from the source when iterated. """
+
+    desc: Optional[str] = None
+    """ The brief description of the method (if known). """
+
+    protection: Optional[str] = None
+    """ The protection level for the method (None if unknown). """
+
+    is_static: Optional[bool] = None
+    """ Whether or not this method is static (None if unknown). """
+
+    type_params: Optional[List[str]] = None
+    """ If the method is generic, then this contains the type arguments (None if unknown). """
+
+
+@slotted
+@dataclass
+class ClassDef:
+    """The definition of a class"""
+
+    namespace: str
+    """ The dot-separated namespace that contains the class. """
+
+    name: str
+    """ The name of the class. """
+
+    doc_id: Optional[str]
+    """ The ID used to refer to this class in documentation (if known). """
+
+    methods: List[MethodDef]
+    """ All of the methods in the class. """
+
+    props: List[PropDef]
+    """ All of the properties in the class. """
+
+    links: List[str]
+    """ The external classes which this class references. This can be specified as a namespace-qualified class name, or as a doc_id. """
+
+    var_id: Optional[str]
+    """ The variable name used to refer to this class in Script# (if known). """
+
+    base_class: Optional[str]
+    """ The base class that this class extends (if known/applicable). """
+
+    interfaces: List[str]
+    """ The interfaces that this class extends (if known/applicable). """
+
+    is_generic: int = 0
+    """ If non-zero then the class is generic (0 if non-generic OR if unknown). """
+
+    is_enum: Optional[bool] = None
+    """ Whether or not this class should be treated as an enum (None if unknown). """
+
+    is_abstract: Optional[bool] = None
+    """ Whether or not this class is abstract (None if unknown). """
+
+    accessors: Optional[List[Tuple[int, Optional[str]]]] = None
+    """
+    For classes read from Doxygen, the accessor methods (C{get_X}, C{get_$X}, C{set_X} and C{set_$X}) of each property are not stored
+    in C{methods}, but are only created when they are needed (see L{doc_methods}).  This contains, for each property, the position within
+    C{methods} where its accessors belong along with their protection level.
+    """
+
+    root: Optional[str] = None
+    """
+    For classes generated by another project (see L{run_batch}), the path of that project's C{src} folder relative to the C{src} folder
+    of the current project (None for the classes generated by the current project).
+    """
+
+
+@dataclass
+class BatchJob:
+    """A single assembly to convert as part of a batch (see L{run_batch})"""
+
+    js_file: str
+    """ The (unminified) javascript file generated by Saltarelle. """
+
+    xml_file: str
+    """ The all.xml file (or the xml directory) generated by Doxygen. """
+
+    out_dir: str
+    """ The folder to populate with the new typescript project. """
+
+    ns_name: str
+    """ The namespace to export for external use. """
+
+    ignfile: Optional[str] = None
+    """ The file listing those classes, methods/properties to ignore (if any). """
+
+    imports: Optional[str] = None
+    """ The file containing additional import lines to be added to every generated file (if any). """
+
+
+#############
+### STATS ###
+#############
+
+STATS: Counter[str] = collections.Counter()
+""" Counters of the work done in the current process (lines classified, regular expressions applied, files written, etc). """
+
+
+def take_stats() -> Dict[str, int]:
+    """
+    Returns (and then resets) the counters of the work done in the current process (see L{STATS}).
+    """
+    stats = dict(STATS)
+    STATS.clear()
+    return stats
+
+
+def counted(func, *args):
+    """
+    Calls the specified function in a worker process and returns its result followed by the counters of the work which it did (so that
+    they can be added to the counters of the parent process).
+    """
+    take_stats()
+    return func(*args), take_stats()
+
+
+######################
+### Helper Methods ###
+######################
+
+
+@contextlib.contextmanager
+def paused_gc() -> Iterator[None]:
+    """
+    Disables the garbage collector within the context.  The model is made up of a very large number of small objects, so collecting
+    garbage while unpickling them is wasted effort.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def to_type(raw_type: str) -> str:
+    """
+    Converts the raw Doxygen type into a valid typescript type (see L{TypeMapper}).
+    """
+    STATS["to_type"] += 1
+    return TYPE_MAPPER.to_type(raw_type)
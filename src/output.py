@@ -0,0 +1,400 @@
+#!/usr/bin/python3
+# -.- coding: utf-8 -.-
+# -.- dependencies: Python 3.8+ -.-
+
+"""
+Salt2Type
+
+A tool to assist in migrating an existing codebase from Script# to TypeScript.
+
+MIT License
+
+Copyright (c) 2023 Pangaea Information Technologies, Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import abc, contextlib, filecmp, io, os, shutil, tarfile, time, zipfile
+from typing import BinaryIO, Dict, Tuple, Optional, Union
+from .model import STATS
+
+#################
+### Templates ###
+#################
+
+TPL_PLACEHOLDERS = (b"{{FILENAME}}", b"{{LIBNAME}}")
+""" The template keywords which are replaced when copying the C{tpl} contents. """
+
+TPL_CACHE: Dict[Tuple[str, int, int], Optional[bytes]] = {}
+""" The templates read by L{read_tpl} keyed by the name, modification time and size of each file. """
+
+
+def read_tpl(in_file: str, stat: os.stat_result) -> Optional[bytes]:
+    """
+    Reads in the specified template file, which is only read again once it changes (i.e. once the specified C{os.stat} result of the file
+    differs in modification time or size, see L{TPL_CACHE}).
+
+    @return: None if the file can be copied as is, otherwise its contents (with its line endings normalized) to replace keywords in
+    """
+    key = (in_file, stat.st_mtime_ns, stat.st_size)
+    if key not in TPL_CACHE:
+        TPL_CACHE[key] = load_tpl(in_file)
+
+    return TPL_CACHE[key]
+
+
+def load_tpl(in_file: str) -> Optional[bytes]:
+    """
+    Reads in the specified template file (see L{read_tpl}).
+    """
+    with open(in_file, "rb") as fil:
+        data = fil.read()
+
+    if b"\r" not in data and not any(placeholder in data for placeholder in TPL_PLACEHOLDERS):
+        return None
+
+    return data.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+
+
+def fill_tpl(template: bytes, asm_name: str, ns_name: str) -> bytes:
+    """
+    Replaces the template keywords in the specified template contents with their correct values (see L{read_tpl}).
+    """
+    return template.replace(b"{{FILENAME}}", ("%s.js" % asm_name).encode("utf-8")).replace(b"{{LIBNAME}}", ns_name.encode("utf-8"))
+
+
+def copy_file(in_file: str, out_file: str, asm_name: str, ns_name: str, link: bool = False) -> None:
+    """
+    Copies the specified source file to the specified destination file and replacing template keyword with their correct values.  Files
+    without any template keywords are copied as is (or hardlinked) and the destination file is left untouched if it is already identical.
+
+    @param in_file: The template file to read in
+    @param out_file: The output file to create
+    @param asm_name: The name to pass to "ss.initAssembly"
+    @param ns_name: The namespace to export for external use
+    @param link: If true, then files without any template keywords are hardlinked (if possible) rather than copied
+    """
+    stat = os.stat(in_file)
+    template = read_tpl(in_file, stat)
+
+    if template is not None:
+        write_file(out_file, fill_tpl(template, asm_name, ns_name), True)
+        return
+
+    if os.path.exists(out_file):
+        if os.path.samefile(in_file, out_file) or filecmp.cmp(in_file, out_file, shallow=False):
+            STATS["files_unchanged"] += 1
+            return
+        os.remove(out_file)
+
+    if link:
+        try:
+            os.link(in_file, out_file)
+            STATS["files_linked"] += 1
+            return
+        except OSError:
+            pass
+
+    shutil.copyfile(in_file, out_file)
+    STATS["files_written"] += 1
+    STATS["bytes_written"] += stat.st_size
+
+
+def write_file(filename: str, content: Union[str, bytes], incremental: bool = False) -> None:
+    """
+    Writes the specified contents (text or binary) to the specified file.  If C{incremental} is true, then the file is left untouched
+    (keeping its modification time) if it already has the same contents.  If the file is hardlinked, then it is replaced rather than
+    overwritten.
+    """
+    mode = "b" if isinstance(content, bytes) else ""
+    if incremental and os.path.isfile(filename):
+        with open(filename, "r" + mode) as fil:
+            if fil.read() == content:
+                STATS["files_unchanged"] += 1
+                return
+
+    if os.path.isfile(filename) and os.stat(filename).st_nlink > 1:
+        # NOTE: never write through a hardlink (e.g. to a template file copied by copy_tpl)
+        os.remove(filename)
+
+    with open(filename, "w" + mode) as fil:
+        fil.write(content)
+        STATS["files_written"] += 1
+        STATS["bytes_written"] += fil.tell()
+
+
+####################
+### Output Sinks ###
+####################
+
+
+class OutputSink(abc.ABC):
+    """
+    The destination of the files of a generated typescript project (see L{open_output}).  Each file is identified by its path relative to
+    the project (with C{/} separators).  A sink is used as a context manager: it is committed once the project has been generated (see
+    L{close}) and discarded if the generation fails (see L{abort}).
+    """
+
+    shared = False
+    """ Whether or not worker processes can write to the sink themselves (otherwise they return the rendered files to be written). """
+
+    @abc.abstractmethod
+    def write(self, path: str, content: Union[str, bytes], incremental: bool = False) -> None:
+        """
+        Writes the specified contents (text or binary) to the specified file (see L{write_file}).
+        """
+
+    def copy(self, in_file: str, path: str, asm_name: str, ns_name: str) -> None:
+        """
+        Copies the specified template file to the specified file, replacing the template keywords (see L{copy_file}).
+        """
+        stat = os.stat(in_file)
+        template = read_tpl(in_file, stat)
+
+        if template is None:
+            with open(in_file, "rb") as fil:
+                self.write(path, fil.read())
+        else:
+            self.write(path, fill_tpl(template, asm_name, ns_name))
+
+    def close(self) -> None:
+        """
+        Commits the files written to the sink.
+        """
+
+    def abort(self) -> None:
+        """
+        Discards the files written to the sink.
+        """
+
+    def __enter__(self) -> "OutputSink":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+STAGING_SUFFIX = ".salt2type-staging"
+""" The suffix of the staging directory alongside the output directory (see L{DirectorySink}). """
+
+BACKUP_SUFFIX = ".salt2type-backup"
+""" The suffix of the previous output directory while it is being replaced by the staging directory (see L{DirectorySink}). """
+
+
+class DirectorySink(OutputSink):
+    """
+    Writes the files into an output directory.  If C{atomic} is true, then the files are written into a staging directory alongside the
+    output directory instead, which then replaces the output directory once the project has been generated, so an interrupted run leaves
+    the previous project untouched.  The staging directory starts out as a copy of the output directory made of hardlinks (so it is cheap
+    to make, and the unchanged files keep their modification times in incremental mode) and files are never written through a hardlink
+    (see L{write_file}).
+    """
+
+    shared = True
+
+    def __init__(self, out_dir: str, atomic: bool = False):
+        self.out_dir = out_dir
+        """ The output directory. """
+
+        self.atomic = atomic
+        """ Whether or not the files are written to a staging directory which then replaces the output directory. """
+
+        self.path = out_dir
+        """ The directory which the files are written to. """
+
+        if atomic:
+            out_dir = os.path.normpath(out_dir)
+            self.path = out_dir + STAGING_SUFFIX
+            if not os.path.exists(out_dir) and os.path.isdir(out_dir + BACKUP_SUFFIX):
+                # NOTE: a previous run was interrupted while swapping the directories
+                os.rename(out_dir + BACKUP_SUFFIX, out_dir)
+            if os.path.exists(self.path):
+                shutil.rmtree(self.path)
+            if os.path.isdir(out_dir):
+                shutil.copytree(out_dir, self.path, symlinks=True, copy_function=link_file)
+            else:
+                os.makedirs(self.path)
+
+    def write(self, path: str, content: Union[str, bytes], incremental: bool = False) -> None:
+        filename = os.path.join(self.path, path)
+        try:
+            write_file(filename, content, incremental)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            write_file(filename, content, incremental)
+
+    def copy(self, in_file: str, path: str, asm_name: str, ns_name: str, link: bool = False) -> None:
+        """
+        Copies the specified template file to the specified file (see L{copy_file}).  If C{link} is true, then files without any template
+        keywords are hardlinked (if possible) rather than copied.
+        """
+        out_file = os.path.join(self.path, path)
+        try:
+            copy_file(in_file, out_file, asm_name, ns_name, link)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(out_file), exist_ok=True)
+            copy_file(in_file, out_file, asm_name, ns_name, link)
+
+    def close(self) -> None:
+        if self.atomic and os.path.isdir(self.path):
+            out_dir = os.path.normpath(self.out_dir)
+            if os.path.exists(out_dir + BACKUP_SUFFIX):
+                shutil.rmtree(out_dir + BACKUP_SUFFIX)
+            if os.path.exists(out_dir):
+                os.rename(out_dir, out_dir + BACKUP_SUFFIX)
+            os.rename(self.path, out_dir)
+            shutil.rmtree(out_dir + BACKUP_SUFFIX, ignore_errors=True)
+
+    def abort(self) -> None:
+        if self.atomic:
+            shutil.rmtree(self.path, ignore_errors=True)
+
+
+def link_file(in_file: str, out_file: str) -> None:
+    """
+    Hardlinks the specified file (or copies it if it cannot be hardlinked).
+    """
+    try:
+        os.link(in_file, out_file)
+    except OSError:
+        shutil.copy2(in_file, out_file)
+
+
+ARCHIVE_MODES = {".tar": "w", ".tar.gz": "w:gz", ".tgz": "w:gz", ".zip": None}
+""" The archive formats supported by L{ArchiveSink} by extension (with the C{tarfile} mode of each or None for a zip file). """
+
+ARCHIVE_BUFFER_SIZE = 1 << 20
+""" The size of the buffer through which an archive is written (see L{ArchiveSink}). """
+
+
+class ArchiveSink(OutputSink):
+    """
+    Writes the files into a single C{.tar}, C{.tar.gz}, C{.tgz} or C{.zip} archive (see L{ARCHIVE_MODES}).  The archive is written to a
+    temporary file alongside it (sequentially, through a large buffer) which then replaces the archive once the project has been generated.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        """ The archive file. """
+
+        self.mode = ARCHIVE_MODES[archive_ext(filename)]
+        """ The C{tarfile} mode to write the archive with (or None for a zip file). """
+
+        self.mtime = time.time()
+        """ The modification time of every file in the archive. """
+
+        if os.path.dirname(filename):
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+
+        self.stack = contextlib.ExitStack()
+        """ Closes the archive and then the temporary file which it is written to. """
+
+        fil = self.stack.enter_context(open(filename + ".tmp", "wb", buffering=ARCHIVE_BUFFER_SIZE))
+        self.archive = self.stack.enter_context(open_archive(fil, self.mode))
+        """ The archive being written. """
+
+    def write(self, path: str, content: Union[str, bytes], incremental: bool = False) -> None:
+        data = content.encode("utf-8") if isinstance(content, str) else content
+
+        if self.mode:
+            info = tarfile.TarInfo(path)
+            info.size = len(data)
+            info.mtime = int(self.mtime)
+            info.mode = 0o644
+            self.archive.addfile(info, io.BytesIO(data))
+        else:
+            info = zipfile.ZipInfo(path, time.localtime(self.mtime)[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0o644 << 16
+            self.archive.writestr(info, data)
+
+        STATS["files_written"] += 1
+        STATS["bytes_written"] += len(data)
+
+    def close(self) -> None:
+        self.stack.close()
+        os.replace(self.filename + ".tmp", self.filename)
+
+    def abort(self) -> None:
+        self.stack.close()
+        os.remove(self.filename + ".tmp")
+
+
+def open_archive(fil: BinaryIO, mode: Optional[str]) -> Union[tarfile.TarFile, zipfile.ZipFile]:
+    """
+    Opens a new archive to write to the specified file with the specified C{tarfile} mode (or as a zip file if C{mode} is None).
+    """
+    if mode:
+        return tarfile.open(fileobj=fil, mode=mode)
+
+    return zipfile.ZipFile(fil, "w", zipfile.ZIP_DEFLATED)
+
+
+class MemorySink(OutputSink):
+    """
+    Keeps the files in memory (e.g. for tests).
+    """
+
+    def __init__(self):
+        self.files: Dict[str, bytes] = {}
+        """ The contents of each file by path. """
+
+    def write(self, path: str, content: Union[str, bytes], incremental: bool = False) -> None:
+        data = content.encode("utf-8") if isinstance(content, str) else content
+
+        if incremental and self.files.get(path) == data:
+            STATS["files_unchanged"] += 1
+            return
+
+        self.files[path] = data
+        STATS["files_written"] += 1
+        STATS["bytes_written"] += len(data)
+
+
+def archive_ext(filename: str) -> Optional[str]:
+    """
+    Returns the archive extension of the specified filename (or None if it is not an archive, see L{ARCHIVE_MODES}).
+    """
+    for ext in ARCHIVE_MODES:
+        if filename.lower().endswith(ext):
+            return ext
+
+    return None
+
+
+def open_output(out_dir: str, atomic: bool = False) -> OutputSink:
+    """
+    Opens the specified output directory (or C{.tar}, C{.tar.gz}, C{.tgz} or C{.zip} archive) to write a typescript project to.
+
+    @param out_dir: The output directory (or archive file)
+    @param atomic: If true, then the files are written to a staging directory which replaces the output directory once the project has
+        been generated (see L{DirectorySink})
+    @return: The output sink
+    """
+    return ArchiveSink(out_dir) if archive_ext(out_dir) else DirectorySink(out_dir, atomic)
+
+
+def as_sink(out_dir: Union[str, OutputSink]) -> OutputSink:
+    """
+    Returns the specified output sink (or a sink writing directly into the specified output directory).
+    """
+    return out_dir if isinstance(out_dir, OutputSink) else DirectorySink(out_dir)
@@ -0,0 +1,157 @@
+#!/usr/bin/python3
+# -.- coding: utf-8 -.-
+# -.- dependencies: Python 3.8+ -.-
+
+"""
+Salt2Type
+
+A tool to assist in migrating an existing codebase from Script# to TypeScript.
+
+MIT License
+
+Copyright (c) 2023 Pangaea Information Technologies, Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import contextlib, cProfile, io, json, os, pstats, resource, sys, time
+from typing import Dict, Iterator, List, Optional
+from .model import STATS
+from .typemap import TYPE_MAPPER
+
+TIMINGS_VERSION = 2
+""" The version of the timings report (incremented whenever its layout changes). """
+
+###############
+### Timings ###
+###############
+
+
+def peak_rss_mb(who: int) -> float:
+    """
+    Returns the peak resident set size (in MB) of the current process (C{RUSAGE_SELF}) or of its largest waited-for child process
+    (C{RUSAGE_CHILDREN}).
+    """
+    peak = resource.getrusage(who).ru_maxrss
+    # NOTE: macOS reports bytes whereas Linux reports kilobytes
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+class Timings:
+    """
+    Records the wall time, CPU time and memory of each stage of a conversion (along with the counters in L{STATS}), and optionally
+    profiles the stages with C{cProfile}.  Since only the peak resident set size of the whole process is known (which never decreases),
+    the memory of each stage is recorded as how much it raised the peak, along with the peak of the process so far.
+    """
+
+    def __init__(self, profile: bool = False):
+        self.stages: Dict[str, dict] = {}
+        """ The statistics of each stage (in the order they were run). """
+
+        self.profiler: Optional[cProfile.Profile] = cProfile.Profile() if profile else None
+        """ The profiler enabled while each stage is run (if profiling). """
+
+        self.started = time.perf_counter()
+        """ When the timings started. """
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Records the statistics of the code run within the context as the specified stage.  The CPU time includes that of any worker
+        processes which finished during the stage.
+        """
+        wall = time.perf_counter()
+        cpu = os.times()
+        stats = dict(STATS)
+        peak = peak_rss_mb(resource.RUSAGE_SELF)
+        child_peak = peak_rss_mb(resource.RUSAGE_CHILDREN)
+
+        if self.profiler:
+            self.profiler.enable()
+        try:
+            yield
+        finally:
+            if self.profiler:
+                self.profiler.disable()
+
+            after = os.times()
+            after_peak = peak_rss_mb(resource.RUSAGE_SELF)
+            after_child_peak = peak_rss_mb(resource.RUSAGE_CHILDREN)
+            self.stages[name] = {
+                "wall_seconds": round(time.perf_counter() - wall, 6),
+                "cpu_seconds": round(after.user + after.system - cpu.user - cpu.system, 6),
+                "child_cpu_seconds": round(after.children_user + after.children_system - cpu.children_user - cpu.children_system, 6),
+                "peak_rss_growth_mb": round(after_peak - peak, 1),
+                "peak_child_rss_growth_mb": round(after_child_peak - child_peak, 1),
+                "process_peak_rss_mb": round(after_peak, 1),
+                "process_peak_child_rss_mb": round(after_child_peak, 1),
+                "counters": {key: value - stats.get(key, 0) for key, value in sorted(STATS.items()) if value != stats.get(key, 0)},
+            }
+
+    def hot_functions(self, limit: int = 25) -> List[dict]:
+        """
+        Returns the functions with the highest internal time (if profiling).
+        """
+        if not self.profiler:
+            return []
+
+        stats = pstats.Stats(self.profiler, stream=io.StringIO())
+        hot = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:limit]  # type: ignore[attr-defined]
+        return [
+            {
+                "function": "%s:%d(%s)" % func,
+                "calls": calls,
+                "internal_seconds": round(tottime, 6),
+                "cumulative_seconds": round(cumtime, 6),
+            }
+            for func, (_, calls, tottime, cumtime, _) in hot
+        ]
+
+    def report(self) -> dict:
+        """
+        Returns the machine-readable report of the timings.
+        """
+        return {
+            "version": TIMINGS_VERSION,
+            "wall_seconds": round(time.perf_counter() - self.started, 6),
+            "stages": self.stages,
+            "counters": dict(sorted(STATS.items())),
+            "type_cache": TYPE_MAPPER.stats(),
+            "hot_functions": self.hot_functions(),
+        }
+
+    def write(self, filename: str) -> None:
+        """
+        Writes the report (as JSON) to the specified file (or to stdout if the filename is C{-}).
+        """
+        content = json.dumps(self.report(), indent=2)
+        if filename == "-":
+            print(content)
+        else:
+            with open(filename, "w") as fil:
+                fil.write("%s\n" % content)
+
+    def dump_profile(self, filename: str) -> None:
+        """
+        Writes the profile (in the C{pstats} format, e.g. for C{python3 -m pstats FILE} or C{snakeviz}) to the specified file.
+        """
+        if not self.profiler:
+            raise Exception("Profiling was not enabled")
+        self.profiler.dump_stats(filename)
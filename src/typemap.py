@@ -0,0 +1,216 @@
+#!/usr/bin/python3
+# -.- coding: utf-8 -.-
+# -.- dependencies: Python 3.8+ -.-
+
+"""
+Salt2Type
+
+A tool to assist in migrating an existing codebase from Script# to TypeScript.
+
+MIT License
+
+Copyright (c) 2023 Pangaea Information Technologies, Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import functools, re
+from typing import Dict, Match, Optional, Pattern
+
+#############
+### RULES ###
+#############
+
+TYPE_RULES: Dict[str, str] = {
+    "bool": "boolean",
+    "int": "number",
+    "float": "number",
+    "double": "number",
+    "long": "number",
+    "short": "number",
+    "byte": "number",
+    "uint": "number",
+    "IList": "Array",
+    "List": "Array",
+    "IEnumerable": "Array",
+    "ICollection": "Array",
+    "ss.IList": "Array",
+    "ss.List": "Array",
+    "ss.IEnumerable": "Array",
+    "ss.ICollection": "Array",
+    "JsDate": "Date",
+    "ss.JsDate": "Date",
+    "DateTime": "Date",
+    "Object": "object",
+    "jQueryObject": "JQuery",
+    "jQueryEvent": "JQuery.Event",
+    "jQueryEventHandler": "JQuery.EventHandler",
+    "dynamic": "any",
+    "Delegate": "Action<void>",
+}
+""" The built-in mappings from a whole-word C# type name to its typescript equivalent (see also L{read_type_map}). """
+
+DELEGATE_RE = re.compile(r"^delegate (.*)$")
+MODIFIER_RE = re.compile(r"^(sealed override|override|params|readonly|new|this|abstract|const) ")
+
+####################
+### Type Mapping ###
+####################
+
+
+class TypeMapper:
+    """
+    Translates raw Doxygen types into typescript types.  Every whole-word mapping (along with the C{Dictionary} rewrites) is compiled
+    into a single alternation which is applied in one pass, and the translated types are memoized in a bounded cache since the same
+    few hundred type strings are translated over and over again.
+    """
+
+    def __init__(self, rules: Optional[Dict[str, str]] = None, cache_size: int = 4096):
+        self.rules: Dict[str, str] = dict(TYPE_RULES if rules is None else rules)
+        """ The mappings from a whole-word C# type name to its typescript equivalent. """
+
+        self.cache_size = cache_size
+        """ The maximum number of translated types to remember. """
+
+        self.pattern = self.compile()
+        """ The combined pattern matching every rule. """
+
+        self.to_type = functools.lru_cache(maxsize=cache_size)(self.translate)
+        """ Converts the raw Doxygen type into a valid typescript type (memoized). """
+
+    def compile(self) -> Pattern:
+        """
+        Compiles the rules into a single pattern.  The names are arranged into a trie so that the cost of matching at each position depends
+        on the length of the names rather than on the number of rules.
+        """
+        trie: Dict[str, dict] = {}
+        for word in self.rules:
+            node = trie
+            for char in word:
+                node = node.setdefault(char, {})
+            node[""] = {}
+
+        words = trie_pattern(trie) if trie else "(?!)"
+        return re.compile(r"\b(?P<word>%s)\b|(?P<ss>ss\.)?(?:Js)?Dictionary(?:(?P<generic><)|(?P<end>$)|[^<])" % words)
+
+    def update(self, rules: Dict[str, str]) -> None:
+        """
+        Adds (or replaces) the specified mappings and recompiles the pattern.  Any memoized translations are discarded (unless none of the
+        mappings actually changed).
+        """
+        if all(self.rules.get(name) == typ for name, typ in rules.items()):
+            return
+
+        self.rules.update(rules)
+        self.pattern = self.compile()
+        self.to_type.cache_clear()
+
+    def replace(self, match: Match) -> str:
+        """
+        Returns the replacement for a single match of the combined pattern.
+        """
+        if word := match.group("word"):
+            return self.rules[word]
+        if match.group("generic"):
+            return "Record<"
+        if match.group("end") is not None:
+            return "Record<string,unknown>"
+
+        # NOTE: this preserves the original behaviour of replacing the character after "Dictionary" with the "ss." prefix (if any)
+        return "Record<string,unknown>%s" % (match.group("ss") or "")
+
+    def translate(self, raw_type: str) -> str:
+        """
+        Converts the raw Doxygen type into a valid typescript type (without memoization).
+        """
+        optional = "?" in raw_type
+        raw_type = raw_type.replace("?", "").replace("@", "").strip()
+
+        raw_type = DELEGATE_RE.sub(r"Action<\1>", raw_type)
+        raw_type = self.pattern.sub(self.replace, raw_type)
+        raw_type = MODIFIER_RE.sub("", raw_type)
+
+        if raw_type in ("any", "unknown", "boolean", "string", "void"):
+            return raw_type
+
+        if raw_type.endswith("[])") or raw_type.startswith("Array<"):
+            return raw_type
+
+        if raw_type.startswith("Record<") or raw_type.startswith("TypeOption<"):
+            return raw_type
+
+        if raw_type in ("number", "Date") and not optional:
+            return raw_type
+
+        return "%s | undefined" % raw_type
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the cache statistics (hits, misses, size and maxsize).
+        """
+        info = self.to_type.cache_info()
+        return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "maxsize": info.maxsize}
+
+
+def trie_pattern(node: Dict[str, dict]) -> str:
+    """
+    Converts the specified trie (a dict of characters to child nodes, where the empty string marks the end of a word) into a regular
+    expression which matches any of its words (preferring the longest).
+    """
+    alts = [re.escape(char) + trie_pattern(child) for char, child in sorted(node.items()) if char]
+    if not alts:
+        return ""
+
+    pattern = alts[0] if len(alts) == 1 else "(?:%s)" % "|".join(alts)
+    if "" in node:
+        pattern = "(?:%s)?" % pattern
+
+    return pattern
+
+
+def read_type_map(filename: str) -> Dict[str, str]:
+    """
+    Reads in the type mapping file specified by the given filename.  Each line maps a whole-word C# type name to its typescript equivalent
+    (e.g. C{ss.JsArray=Array}).  Blank lines and lines starting with C{#} are ignored.
+
+    @param filename: The type mapping file to read from
+    @return: The mappings
+    """
+    rules = {}
+    with open(filename, "r") as fil:
+        for line in fil.read().splitlines():
+            line = line.strip()
+            if line and not line.startswith("#"):
+                if "=" not in line:
+                    raise Exception("Unsupported type mapping: %s" % line)
+                [name, typ] = line.split("=", 1)
+                rules[name.strip()] = typ.strip()
+
+    return rules
+
+
+def load_type_rules(rules: Dict[str, str]) -> None:
+    """
+    Adds the specified mappings to the type mapper used by L{to_type} (e.g. when initializing a worker process).
+    """
+    TYPE_MAPPER.update(rules)
+
+
+TYPE_MAPPER = TypeMapper()
+""" The type mapper used by L{to_type}. """
@@ -0,0 +1,223 @@
+#!/usr/bin/python3
+# -.- coding: utf-8 -.-
+# -.- dependencies: Python 3.8+ -.-
+
+"""
+Salt2Type
+
+A tool to assist in migrating an existing codebase from Script# to TypeScript.
+
+MIT License
+
+Copyright (c) 2023 Pangaea Information Technologies, Ltd.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os, pickle, sys, time
+from typing import Dict, List, Tuple, Optional, Set
+from .model import ClassDef, BatchJob, paused_gc
+from .ignore import clear_ignore_stats
+from .jsreader import read_js
+from .doxygen import read_doc, add_doc_info
+from .output import open_output
+from .helper import copy_tpl, shake_classes, gen_ts, gen_index
+from .batch import SymbolIndex, external_classes
+
+#############
+### Watch ###
+#############
+
+
+class Watcher:
+    """
+    Keeps the model of an assembly in memory and regenerates its typescript project whenever its input files change (see L{poll}).  Only
+    the changed inputs are read again: the parsed javascript is kept (pickled, since L{add_doc_info} modifies it) for when only the
+    Doxygen xml changes, the Doxygen classes are kept for when only the javascript changes (and, for a Doxygen xml directory, only the
+    files whose contents changed are parsed again), and the type conversions stay cached in L{TYPE_MAPPER}.  The project is always
+    generated incrementally, so only the files whose inputs changed are rewritten.
+    """
+
+    def __init__(
+        self,
+        job: BatchJob,
+        jobs: Optional[int] = None,
+        all_imports: bool = False,
+        link: bool = False,
+        tpl_dir: Optional[str] = None,
+        symbols: Optional[List[SymbolIndex]] = None,
+        atomic: bool = False,
+        keep: Optional[List[str]] = None,
+    ):
+        self.job = job
+        """ The assembly to convert. """
+
+        self.jobs = jobs
+        """ The number of worker processes to use (None for the number of CPUs). """
+
+        self.options = (all_imports, link, tpl_dir, atomic)
+        """ The other options to generate the project with (see L{run_batch}). """
+
+        self.symbols = symbols or []
+        """ The symbol indexes of the assemblies converted earlier whose classes may also be imported. """
+
+        self.keep = keep
+        """ The classes to keep besides those reachable from the globals (or None to keep every class, see L{shake_classes}). """
+
+        self.stamps: Dict[str, object] = {}
+        """ The fingerprint of each input when the project was last generated successfully. """
+
+        self.failed: Optional[Dict[str, object]] = None
+        """ The fingerprints of the inputs which the project last failed to be generated from (if any). """
+
+        self.pending: Optional[Dict[str, object]] = None
+        """ The fingerprints of the inputs which have changed (but may still be changing). """
+
+        self.js_model: Optional[bytes] = None
+        """ The pickled result of L{read_js}. """
+
+        self.types: Optional[List[ClassDef]] = None
+        """ The classes read by L{read_doc}. """
+
+        self.doc_cache: Dict[str, Tuple[str, List[ClassDef]]] = {}
+        """ The classes read from each file of a Doxygen xml directory (see L{read_doc}). """
+
+        self.skipped = 0
+        """ The number of import lines which were skipped (because they were not referenced) when the project was last generated. """
+
+    def fingerprints(self) -> Dict[str, object]:
+        """
+        Returns the size and modification time of each input (or of each file in the Doxygen xml directory).
+        """
+        stamps: Dict[str, object] = {}
+
+        for key, filename in (("js", self.job.js_file), ("xml", self.job.xml_file), ("ign", self.job.ignfile), ("imports", self.job.imports)):
+            if filename and os.path.isdir(filename):
+                with os.scandir(filename) as entries:
+                    stamps[key] = sorted((entry.name, entry.stat().st_size, entry.stat().st_mtime_ns) for entry in entries if entry.is_file())
+            elif filename:
+                try:
+                    stat = os.stat(filename)
+                    stamps[key] = (stat.st_size, stat.st_mtime_ns)
+                except OSError:
+                    stamps[key] = None
+
+        return stamps
+
+    def poll(self) -> Optional[Set[str]]:
+        """
+        Checks the inputs and regenerates the project if any of them have changed.  Since the inputs are usually rewritten over a few
+        seconds (e.g. by Doxygen), the project is only regenerated once the inputs are unchanged since the previous poll.  If the project
+        fails to be regenerated, then it is only retried once the inputs change again (and every input which changed since the project was
+        last generated successfully is then read again).
+
+        @return: The inputs (C{js}, C{xml}, C{ign} or C{imports}) which changed since the project was last generated successfully (or None
+            if the project was not regenerated)
+        """
+        stamps = self.fingerprints()
+
+        if stamps in (self.stamps, self.failed):
+            self.pending = None
+            return None
+
+        if stamps != self.pending:
+            self.pending = stamps
+            return None
+
+        # NOTE: the inputs are compared against the last successful build, so any input which failed to be read is read again
+        changed = {key for key, stamp in stamps.items() if stamp != self.stamps.get(key)}
+        self.pending = None
+        try:
+            self.build(changed)
+        except Exception:
+            self.failed = stamps
+            raise
+
+        self.stamps = stamps
+        self.failed = None
+
+        return changed
+
+    def build(self, changed: Optional[Set[str]] = None) -> int:
+        """
+        Regenerates the project after the specified inputs have changed (all of them if C{changed} is None).
+
+        @return: The number of import lines which were skipped because they were not referenced
+        """
+        stamps = self.fingerprints() if changed is None else None
+
+        if changed is None or self.js_model is None or changed & {"js", "ign"}:
+            # NOTE: the rules are only matched while the javascript is read, so the counts of the previous read are kept until then
+            clear_ignore_stats()
+            asm_name, defs, globs = read_js(self.job.js_file, self.job.ignfile, self.jobs)
+            self.js_model = pickle.dumps((asm_name, defs, globs), pickle.HIGHEST_PROTOCOL)
+        else:
+            with paused_gc():
+                asm_name, defs, globs = pickle.loads(self.js_model)
+
+        if changed is None or self.types is None or "xml" in changed:
+            self.types = read_doc(self.job.xml_file, self.jobs, self.doc_cache)
+
+        add_doc_info(defs, self.types)
+        if self.keep is not None:
+            defs, globs, _ = shake_classes(defs, globs, self.keep, self.job.ns_name)
+
+        extra_imports = None
+        if self.job.imports:
+            with open(self.job.imports, "r") as fil:
+                extra_imports = fil.read().splitlines()
+
+        all_imports, link, tpl_dir, atomic = self.options
+        local = SymbolIndex.from_defs(self.job.out_dir, asm_name, defs)
+        externals = external_classes(local, self.symbols)
+
+        with open_output(self.job.out_dir, atomic) as out:
+            copy_tpl(out, asm_name, self.job.ns_name, link, tpl_dir, exclude={"src/index.ts"})
+            skipped = gen_ts(out, defs, extra_imports, all_imports, self.jobs, True, externals)
+            skipped += gen_index(out, defs, globs, extra_imports, all_imports, True, externals)
+            local.write(out)
+        self.skipped = skipped
+
+        if stamps is not None:
+            self.stamps = stamps
+
+        return skipped
+
+    def run(self, interval: float = 1.0) -> None:
+        """
+        Generates the project and then polls its inputs at the specified interval (in seconds), regenerating it whenever they change,
+        until interrupted.  A failure to regenerate the project (e.g. due to an input which is only partially written) is reported and
+        retried when the inputs next change.
+        """
+        start = time.monotonic()
+        self.build()
+        print("Generated %s in %.2fs, watching for changes" % (self.job.out_dir, time.monotonic() - start), file=sys.stderr)
+
+        while True:
+            time.sleep(interval)
+            start = time.monotonic()
+            try:
+                changed = self.poll()
+            except Exception as ex:  # pylint: disable=broad-except
+                print("Failed to regenerate %s: %s" % (self.job.out_dir, ex), file=sys.stderr)
+                continue
+            if changed is not None:
+                print(
+                    "Regenerated %s in %.2fs (%s changed)" % (self.job.out_dir, time.monotonic() - start, ", ".join(sorted(changed))), file=sys.stderr
+                )
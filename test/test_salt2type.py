@@ -1,18 +1,721 @@
 # pylint: disable=C0303,C0301,C0114,C0413,W0611
 
-import os, sys
+import io, json, os, pickle, re, shutil, sys, tarfile, tempfile, zipfile
 from unittest.mock import patch, mock_open, Mock
 import unittest
 
-from src import read_js
+from src import read_js, read_doc, read_model, copy_tpl, load_model, save_model, read_manifest, run_batch, read_symbols, BatchJob, Watcher
+from src import gen_index, open_output, read_ignore_rules, MemorySink
+from src.timings import Timings
+from src.typemap import TypeMapper, read_type_map
+from src.model import ClassDef, MethodDef, PropDef, STATS
+from src.ignore import IgnoreRules
+from src.jstokens import rewrite_line, rewrite_lines
+from src.jsreader import JS_ALL_KINDS, JS_LINE_RE, JS_MEMBER_RE, BlockIndex, JsSource, LazyBody, classify_js_line, plan_js_shards, read_js_sharded
+from src.doxygen import MemberIndex, doc_methods, find_method, find_prop
+from src.output import write_file
+from src.helper import CACHE_FILE, find_refs, gen_ts, index_classes, shake_classes, write_imports
 
+SAMPLE_JS = """(function() {
+\t'use strict';
+\tvar $asm = {};
+\tglobal.Acme = global.Acme || {};
+\tss.initAssembly($asm, 'Acme.Lib');
+\t////////////////////////////////////////////////////////////////////////////////
+\t// Acme.Shape
+\tvar $Acme_Shape = function(size) {
+\t\tthis.size = size;
+\t};
+\t$Acme_Shape.__typeName = 'Acme.Shape';
+\t$Acme_Shape.create = function(size) {
+\t\treturn new $Acme_Shape(size);
+\t};
+\tglobal.Acme.Shape = $Acme_Shape;
+\t////////////////////////////////////////////////////////////////////////////////
+\t// Acme.Square
+\tvar $Acme_Square = function() {
+\t};
+\tglobal.Acme.Square = $Acme_Square;
+\tss.initClass($Acme_Shape, $asm, {
+\t\tget_area: function() {
+\t\t\treturn this.size * this.size;
+\t\t},
+\t\tlabel: 'x'
+\t});
+\tss.initClass($Acme_Square, $asm, {}, $Acme_Shape);
+\t(function() {
+\t\t$Acme_Shape.count = 0;
+\t\tconsole.log('init');
+\t})();
+})();
+"""
 
-class TestSalt2Type(unittest.TestCase):
-    """Unit Tests for salt2type"""
+SAMPLE_XML = """<?xml version="1.0"?>
+<doxygen>
+<compounddef id="class_acme_1_1_shape" kind="class" prot="public" abstract="yes">
+  <compoundname>Acme::Shape</compoundname>
+  <sectiondef kind="public-attrib">
+    <memberdef kind="property" id="s1" prot="public" static="no">
+      <type>int</type><name>Size</name><briefdescription><para>The size.</para></briefdescription>
+    </memberdef>
+    <memberdef kind="function" id="s2" prot="public" static="yes">
+      <type><ref refid="class_acme_1_1_shape">Shape</ref></type><name>Create</name><briefdescription/>
+      <param><type>int</type><declname>size</declname></param>
+    </memberdef>
+  </sectiondef>
+</compounddef>
+<compounddef id="namespace_acme" kind="namespace"><compoundname>Acme</compoundname></compounddef>
+</doxygen>
+"""
 
-    def test_stuff(self):
-        """Default test"""
-        self.assertEqual(1, 1)
+
+def unreadable_shard(start, stop, *_):
+    """Counts the lines of a shard of a Script# file as if they were read, but fails to read it (see read_js_shard)"""
+    STATS["read_js.lines"] += stop - start
+
+
+def write_input(tmp_dir, name, contents=SAMPLE_JS):
+    """Writes an input file to the specified directory and returns its path"""
+    path = os.path.join(tmp_dir, name)
+    with open(path, "w") as fil:
+        fil.write(contents)
+    return path
+
+
+def sample_defs():
+    """Returns a referenced class, an unreferenced class and a class which refers to the former (new instances each time)"""
+    used = ClassDef("Acme.Util", "Used", "class_used", [], [], [], "$Acme_Util_Used", None, [])
+    unused = ClassDef("Acme.Util", "Unused", None, [], [], [], "$Acme_Util_Unused", None, [])
+    item = ClassDef("Acme.App", "Main", None, [MethodDef("run", [], None, ["\treturn new $Acme_Util_Used();"])], [], [], "$Acme_App_Main", None, [])
+    return used, unused, item
+
+
+class TestParsing(unittest.TestCase):
+    """Unit tests for reading the Script# and Doxygen files"""
+
+    def test_read_js(self):
+        """Reads classes, members and globals from a Script# file"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            js_file = write_input(tmp_dir, "test.js")
+
+            asm_name, classes, globs = read_js(js_file, None)
+            [shape, square] = list(classes)
+            shape_body = list(shape.methods[1].body)
+
+        self.assertEqual(asm_name, "Acme.Lib")
+        self.assertEqual((shape.namespace, shape.name, shape.var_id), ("Acme", "Shape", "$Acme_Shape"))
+        self.assertEqual([m.name for m in shape.methods], ["", "create", "get_area"])
+        self.assertEqual(shape_body, ["\t\treturn new Shape(size);"])
+        self.assertEqual([p.name for p in shape.props], ["__typeName", "label", "count"])
+        self.assertEqual(square.base_class, "$Acme_Shape")
+        self.assertIn("\t\tconsole.log('init');", globs)
+
+    def test_read_js_sharded(self):
+        """Reading the file in shards matches reading it in one pass"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            js_file = write_input(tmp_dir, "test.js")
+            ign_file = write_input(tmp_dir, "ign.txt", "Acme.Shape:get_area\n")
+
+            lines = JsSource(js_file)
+            self.assertEqual(plan_js_shards(lines, 10), [(0, 5, False), (5, 15, True), (15, 20, True), (20, 32, False)])
+
+            with patch("src.jsreader.JS_SHARD_LINES", 1):
+                self.assertIsNotNone(read_js_sharded(lines, BlockIndex(lines), IgnoreRules(), 3))
+                serial = read_js(js_file, ign_file)
+                sharded = read_js(js_file, ign_file, 3)
+
+            STATS.clear()
+            read_js(js_file, ign_file)
+            serial_stats = dict(STATS)
+            with patch("src.jsreader.JS_SHARD_LINES", 1):
+                STATS.clear()
+                read_js(js_file, ign_file, 3)
+                self.assertEqual(dict(STATS), serial_stats)
+
+                STATS.clear()
+                with patch("src.jsreader.read_js_shard", unreadable_shard):
+                    read_js(js_file, ign_file, 3)
+                self.assertEqual(dict(STATS), serial_stats)
+
+        self.assertEqual((sharded[0], sharded[2]), (serial[0], serial[2]))
+        for expected, actual in zip(serial[1], sharded[1]):
+            self.assertEqual((actual.name, actual.base_class, actual.interfaces), (expected.name, expected.base_class, expected.interfaces))
+            self.assertEqual([(p.name, p.def_val) for p in actual.props], [(p.name, p.def_val) for p in expected.props])
+            self.assertEqual([(m.name, list(m.body)) for m in actual.methods], [(m.name, list(m.body)) for m in expected.methods])
+
+    def test_read_doc(self):
+        """Reads classes and members from a Doxygen file"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            xml_file = write_input(tmp_dir, "all.xml", SAMPLE_XML)
+
+            shapes = list(read_doc(xml_file))
+
+        self.assertEqual(len(shapes), 1)
+        shape = shapes[0]
+
+        self.assertEqual((shape.namespace, shape.name, shape.doc_id, shape.is_abstract), ("Acme", "Shape", "class_acme_1_1_shape", True))
+        self.assertEqual([(p.name, p.typ, p.desc) for p in shape.props], [("Size", "number", "The size.")])
+        self.assertEqual([m.name for m in shape.methods], ["Create"])
+        self.assertEqual([m.name for m in doc_methods(shape)], ["get_Size", "get_$Size", "set_Size", "set_$Size", "Create"])
+        self.assertEqual([m.typ for m in doc_methods(shape)][2:], ["void", "void", "Shape | undefined"])
+        self.assertEqual(shape.links, ["class_acme_1_1_shape"])
+
+    def test_read_model(self):
+        """Reading the files concurrently matches reading them one after the other"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            js_file = write_input(tmp_dir, "test.js")
+            xml_file = write_input(tmp_dir, "all.xml", SAMPLE_XML)
+
+            serial = read_model(js_file, None, xml_file, 1)
+            concurrent = read_model(js_file, None, xml_file, 2)
+
+            self.assertEqual((concurrent[0], concurrent[2]), (serial[0], serial[2]))
+            for expected, actual in zip(serial[1], concurrent[1]):
+                self.assertEqual([(p.name, p.typ) for p in actual.props], [(p.name, p.typ) for p in expected.props])
+                self.assertEqual(
+                    [(m.name, m.typ, list(m.body or [])) for m in actual.methods], [(m.name, m.typ, list(m.body or [])) for m in expected.methods]
+                )
+            self.assertIn("The size.", [p.desc for c in concurrent[1] for p in c.props])
+
+    def test_read_doc_dir(self):
+        """Reads the per-compound files listed in a Doxygen index"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with open(os.path.join(tmp_dir, "index.xml"), "w") as fil:
+                fil.write('<doxygenindex><compound refid="class_acme_1_1_shape" kind="class"><name>Acme::Shape</name></compound>')
+                fil.write('<compound refid="namespace_acme" kind="namespace"><name>Acme</name></compound></doxygenindex>')
+            write_input(tmp_dir, "class_acme_1_1_shape.xml", SAMPLE_XML)
+
+            shapes = list(read_doc(tmp_dir, 1))
+            self.assertEqual(len(shapes), 1)
+            shape = shapes[0]
+
+            cache = {}
+            read_doc(tmp_dir, 1, cache)
+            with patch("src.doxygen.read_doc_file") as parsed:
+                self.assertEqual([item.name for item in read_doc(tmp_dir, 1, cache)], ["Shape"])
+                parsed.assert_not_called()
+
+        self.assertEqual((shape.namespace, shape.name), ("Acme", "Shape"))
+
+    def test_js_source(self):
+        """Lines are read lazily from the memory-mapped file"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            js_file = os.path.join(tmp_dir, "test.js")
+            with open(js_file, "wb") as fil:
+                fil.write("\ufeff(function() {\r\n\tvar a = function() {\n\t};\n\n})();".encode("utf-8"))
+
+            lines = JsSource(js_file)
+            self.assertEqual(list(lines), ["\ufeff(function() {", "\tvar a = function() {", "\t};", "", "})();"])
+            self.assertEqual(lines[-1], "})();")
+            self.assertEqual(lines.find_closers(), [2, 4])
+            self.assertEqual(list(pickle.loads(pickle.dumps(lines))), list(lines))
+
+    def test_classify_js_line(self):
+        """Lines are classified by prefix before falling back to every pattern"""
+        shape = ClassDef("Acme", "Shape", None, [], [], [], "$Acme_Shape", None, [])
+        self.assertEqual(classify_js_line("\t$Acme_Shape.x = 1;", shape)[0], "static_prop")
+        self.assertEqual(classify_js_line("\t$Acme_Shape.$ctor1.prototype = $Acme_Shape.prototype;", shape)[0], "ctor_proto")
+        self.assertEqual(classify_js_line("\tglobal.Acme.Shape = $Acme_Shape;", shape)[0], "global_assign")
+        self.assertEqual(classify_js_line("\tvar $x = function() {", None)[0], None)
+        self.assertEqual(classify_js_line("\tss.setMetadata($Acme_Shape, {});", shape)[0], "skip")
+        self.assertEqual(sorted(JS_ALL_KINDS), sorted(list(JS_LINE_RE) + list(JS_MEMBER_RE)))
+
+    def test_block_index(self):
+        """Block ends match a naive scan for every starting line"""
+        lines = ["\tvar a = function() {", "\t\tif (x) {", "\t\t}", "\t};", "\t}", "\tfoo();", "\t};"]
+        blocks = BlockIndex(lines)
+        pattern = re.compile(r"^\t\};$")
+
+        for start in range(len(lines)):
+            expected = next((i for i in range(start, len(lines)) if pattern.match(lines[i])), None)
+            if expected is None:
+                self.assertRaises(Exception, blocks.find, pattern, start)
+            else:
+                self.assertEqual(blocks.find(pattern, start), expected)
+
+        self.assertRaises(Exception, blocks.find, pattern, 4, 6)
+
+    def test_block_index_linear(self):
+        """The lines examined to find every block end grow linearly with the number of lines"""
+        work = []
+        for size in (100, 1000):
+            lines = ["\tss.initClass($X, $asm, {"]
+            for i in range(size):
+                lines.extend(["\t\tm%d: function() {" % i, "\t\t\tif (x) {", "\t\t\t}", "\t\t},"])
+            lines.append("\t});")
+
+            blocks = BlockIndex(lines)
+            for i, line in enumerate(lines):
+                if line.endswith("{"):
+                    blocks.find(re.compile(r"^\t\t},?$"), i + 1)
+            blocks.find(re.compile(r"^\t\}"), 1)
+            work.append(blocks.scanned / len(lines))
+
+        self.assertAlmostEqual(work[0], work[1], delta=0.05)
+
+    def test_ignore_rules(self):
+        """Exact, prefix and glob rules are matched and each match is counted"""
+        rules = IgnoreRules(["Acme.Legacy.*", "Acme.Old", "# comment", "", "Acme.Shape:get_area", "*:get_$*", "Acme.?ip:*", "Acme.Unused"])
+        self.assertEqual(rules.rules, ["Acme.Legacy.*", "Acme.Old", "Acme.Shape:get_area", "*:get_$*", "Acme.?ip:*", "Acme.Unused"])
+
+        STATS.clear()
+        self.assertTrue(rules.ignores_class("Acme.Legacy.Sub", "Thing"))
+        self.assertTrue(rules.ignores_class("Acme", "Old"))
+        self.assertFalse(rules.ignores_class("Acme", "Legacy"))
+        self.assertTrue(rules.ignores_member("Acme", "Shape", "get_area"))
+        self.assertTrue(rules.ignores_member("Acme", "Square", "get_$size"))
+        self.assertFalse(rules.ignores_member("Acme", "Square", "get_area"))
+        self.assertTrue(rules.ignores_member("Acme", "Zip", "anything"))
+
+        rules.add("$Acme_Old")
+        self.assertIn("$Acme_Old", rules)
+        self.assertIn("Acme.Legacy.Thing", rules)
+        self.assertIn("$Acme_New", rules.copy(["$Acme_New"]))
+        self.assertNotIn("$Acme_New", rules)
+        self.assertEqual(
+            dict(rules.report()), {"Acme.Legacy.*": 1, "Acme.Old": 1, "Acme.Shape:get_area": 1, "*:get_$*": 1, "Acme.?ip:*": 1, "Acme.Unused": 0}
+        )
+        STATS.clear()
+
+    def test_save_model(self):
+        """A saved model loads back without its source files"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            js_file = write_input(tmp_dir, "test.js")
+            model_file = os.path.join(tmp_dir, "model.bin")
+
+            asm_name, classes, globs = read_js(js_file, None)
+            save_model(model_file, asm_name, classes, globs)
+            os.remove(js_file)
+
+            [loaded_name, loaded, loaded_globs, type_rules] = load_model(model_file)
+            self.assertEqual((loaded_name, loaded_globs), (asm_name, globs))
+            self.assertEqual(type_rules["bool"], "boolean")
+            self.assertEqual([(c.name, [m.name for m in c.methods]) for c in loaded], [(c.name, [m.name for m in c.methods]) for c in classes])
+            self.assertEqual(list(loaded[0].methods[1].body), ["\t\treturn new Shape(size);"])
+
+            with open(model_file, "r+b") as fil:
+                fil.write(b"garbage")
+            self.assertRaises(Exception, load_model, model_file)
+
+    def test_bench_corpus(self):
+        """The synthetic benchmark corpus is parsed in full"""
+        from bench.corpus import write_corpus  # pylint: disable=import-outside-toplevel
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            js_file, xml_file = write_corpus(tmp_dir, classes=60, global_blocks=3)
+            asm_name, classes, _ = read_js(js_file, None)
+            classes = list(classes)
+            types = list(read_doc(xml_file))
+
+        self.assertEqual(asm_name, "Bench.Lib")
+        self.assertEqual(len(classes), 60)
+        self.assertEqual([c.name for c in classes if c.is_enum], ["Item24", "Item49"])
+        self.assertEqual([c.name for c in classes if c.is_generic], ["Item29"])
+        self.assertEqual(len(types), 58)
+
+
+class TestGeneration(unittest.TestCase):
+    """Unit tests for generating the typescript project"""
+
+    def test_rewrite_lines(self):
+        """Body lines are rewritten in one pass without touching strings, comments or regular expressions"""
+        self.assertEqual(
+            rewrite_line("\t\treturn $A_B.convert(TOut).call(null, fn(null));", "$A_B", "B"), "\t\treturn B.convert<TOut | undefined>(fn(undefined));"
+        )
+        self.assertEqual(rewrite_line("\t\tx = f($A_Box(T)).call(null, $A_Box$1);", "$A_Box", "Box"), "\t\tx = f<Box<T> | undefined>($A_Box$1);")
+        self.assertEqual(
+            rewrite_line("\t\treturn [$Bench0_Model_Item1, $Bench0_Model_Item10];", "$Bench0_Model_Item1", "Item1"),
+            "\t\treturn [Item1, $Bench0_Model_Item10];",
+        )
+        self.assertEqual(rewrite_line("\tf(ss.makeGenericType(ss.List, [String])).call(this, y);"), "\tf<Array<String>>(this, y);")
+        self.assertEqual(rewrite_line("\t\tvar s = 'null' + \"$A_B\"; // null", "$A_B", "B"), "\t\tvar s = 'null' + \"$A_B\"; // null")
+        self.assertEqual(rewrite_line("\t\treturn /null/.test(s) ? null : a / b / c;"), "\t\treturn /null/.test(s) ? undefined : a / b / c;")
+        self.assertEqual(rewrite_line("\t\tvar items = [];"), "\t\tvar items: any[] = [];")
+        self.assertEqual(list(rewrite_lines(["/* null", "null */ null", "x = null;"])), ["/* null", "null */ undefined", "x = undefined;"])
+
+        body = LazyBody(["/* null", "null */ null", "x = null;"], 0, 3, "$A_B", "B")
+        self.assertEqual(body[1], "null */ undefined")
+        self.assertEqual(body[1:], ["null */ undefined", "x = undefined;"])
+        self.assertEqual(body[-1], "x = undefined;")
+
+    def test_type_mapper(self):
+        """Types are translated in a single memoized pass"""
+        mapper = TypeMapper()
+        self.assertEqual(mapper.to_type("bool"), "boolean")
+        self.assertEqual(mapper.to_type("int?"), "number | undefined")
+        self.assertEqual(mapper.to_type("ss.IList< DateTime >"), "Array< Date >")
+        self.assertEqual(mapper.to_type("JsDictionary< string, jQueryObject >"), "Record< string, JQuery >")
+        self.assertEqual(mapper.to_type("params object[]"), "object[] | undefined")
+        self.assertEqual(mapper.to_type("delegate void"), "Action<void> | undefined")
+        self.assertEqual(mapper.to_type("JsDictionary"), "Record<string,unknown>")
+        self.assertEqual(mapper.to_type("bool"), "boolean")
+        self.assertEqual(mapper.stats()["hits"], 1)
+        self.assertEqual(mapper.stats()["misses"], 7)
+
+    def test_type_map_file(self):
+        """Custom type mappings are merged with the built-in ones"""
+        with patch("builtins.open", mock_open(read_data="# custom types\nJsArray = Array\n\nMoney=number\n")):
+            rules = read_type_map("types.txt")
+
+        mapper = TypeMapper()
+        mapper.update(rules)
+        self.assertEqual(rules, {"JsArray": "Array", "Money": "number"})
+        self.assertEqual(mapper.to_type("JsArray<Money>"), "Array<number>")
+        self.assertEqual(mapper.to_type("List<bool>"), "Array<boolean>")
+        self.assertEqual(mapper.to_type("MoneyBag"), "MoneyBag | undefined")
+
+    def test_member_index(self):
+        """Indexed member lookups return the same members as a linear scan"""
+        names = ["", "$ctor1", "get_Size", "get_$Size", "$compute", "$compute$1", "compute$2", "Map", "$map$String", "items1"]
+        methods = [MethodDef(name, [PropDef("a")] * (i % 3)) for i, name in enumerate(names)]
+        props = [PropDef(name, None, None, None, i % 2 == 0) for i, name in enumerate(names)]
+        members = MemberIndex(ClassDef("Acme", "Shape", None, methods, props, [], None, None, []))
+
+        for name in ["", "Size", "get_size", "Compute", "compute", "map", "Map", "items", "missing"]:
+            for args in range(3):
+                self.assertIs(members.find_method(name, args), find_method(methods, name, args))
+            self.assertIs(members.find_prop(name), find_prop(props, name))
+
+        members.add_prop(PropDef("extra"))
+        self.assertIs(members.find_prop("Extra"), props[-1])
+
+    def test_write_imports_refs(self):
+        """Only referenced classes are imported"""
+        used, unused, item = sample_defs()
+        defs = [used, unused, item]
+
+        refs = find_refs(item, index_classes(defs))
+        out = io.StringIO()
+        skipped = write_imports(defs, out, "Acme/App", item.var_id, item.name, None, refs)
+
+        self.assertIn("import $Acme_Util_Used from '../../Acme/Util/Used';", out.getvalue())
+        self.assertNotIn("Unused", out.getvalue())
+        self.assertEqual(skipped, 3)
+
+    def test_find_refs_links(self):
+        """Documentation links, base classes and member types are all references"""
+        base = ClassDef("Acme", "Base", "class_base", [], [], [], "$Acme_Base", None, [])
+        linked = ClassDef("Acme", "Linked", "class_linked", [], [], [], "$Acme_Linked", None, [])
+        item = ClassDef("Acme", "Child", None, [], [PropDef("items", None, "Array< Other >")], ["class_linked"], "$Acme_Child", "$Acme_Base", [])
+
+        refs = find_refs(item, index_classes([base, linked, item]))
+        self.assertTrue({"$Acme_Base", "Linked", "Array", "Other"} <= refs)
+
+    def test_shake_classes(self):
+        """Only the classes reachable from the globals (other than their registrations) or the kept classes are generated"""
+        base = ClassDef("Acme", "Base", None, [], [], [], "$Acme_Base", None, [])
+        shape = ClassDef("Acme", "IShape", None, [], [], [], "$Acme_IShape", None, [])
+        used = ClassDef("Acme.Util", "Used", None, [], [], [], "$Acme_Util_Used", None, [])
+        main = ClassDef(
+            "Acme.App",
+            "Main",
+            None,
+            [MethodDef("run", [], None, ["\treturn new $Acme_Util_Used();"])],
+            [],
+            [],
+            "$Acme_App_Main",
+            "$Acme_Base",
+            ["IShape"],
+        )
+        api = ClassDef("Acme.Api", "Client", None, [], [PropDef("shape", None, "IShape")], [], "$Acme_Api_Client", None, [])
+        unused = ClassDef(
+            "Acme.Legacy", "Unused", None, [MethodDef("run", [], None, ["\treturn new $Acme_Util_Used();"])], [], [], "$Acme_Legacy_Unused", None, []
+        )
+        defs = [base, shape, used, main, api, unused]
+        globs = ["\tglobal.Acme.App.Main = $Acme_App_Main;", "\tglobal.Acme.Legacy.Unused = $Acme_Legacy_Unused;", "\t$Acme_App_Main.run();"]
+
+        kept, kept_globs, dropped = shake_classes(defs, globs)
+        self.assertEqual(kept, [base, shape, used, main])
+        self.assertEqual(kept_globs, [globs[0], globs[2]])
+        self.assertEqual(dropped, [api, unused])
+
+        kept, kept_globs, dropped = shake_classes(defs, globs[:2], ["Acme.Api.*"])
+        self.assertEqual(kept, [shape, api])
+        self.assertEqual(kept_globs, [])
+        self.assertEqual(dropped, [base, used, main, unused])
+
+    def test_shake_exported(self):
+        """The classes registered in the exported namespace (and whatever they reach) survive with their registrations"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            _, classes, globs = read_js(write_input(tmp_dir, "test.js"), None)
+
+        kept, kept_globs, dropped = shake_classes(classes, globs, None, "Acme")
+        self.assertEqual([item.name for item in kept], ["Shape", "Square"])
+        self.assertEqual(kept_globs, globs)
+        self.assertEqual(dropped, [])
+
+        used, unused, item = sample_defs()
+        globs = ["\tglobal.Acme.App.Main = $Acme_App_Main;", "\tglobal.Internal.Unused = $Acme_Util_Unused;"]
+        kept, kept_globs, dropped = shake_classes([used, unused, item], globs, None, "Acme.App")
+        self.assertEqual(kept, [used, item])
+        self.assertEqual(kept_globs, globs[:1])
+        self.assertEqual(dropped, [unused])
+
+    def test_gen_ts_jobs(self):
+        """Generating the files in parallel matches generating them serially"""
+        used, unused, item = sample_defs()
+        defs = [used, unused, item]
+
+        with tempfile.TemporaryDirectory() as serial, tempfile.TemporaryDirectory() as parallel:
+            self.assertEqual(gen_ts(serial, defs), 11)
+            self.assertEqual(gen_ts(parallel, defs, jobs=2), 11)
+            for path in ("Acme/Util/Used.ts", "Acme/Util/Unused.ts", "Acme/App/Main.ts"):
+                with open(os.path.join(serial, "src", path)) as expected, open(os.path.join(parallel, "src", path)) as actual:
+                    self.assertEqual(expected.read(), actual.read())
+
+            with open(os.path.join(serial, "src", "Acme/App/Main.ts")) as fil:
+                self.assertIn("import $Acme_Util_Used from '../../Acme/Util/Used';", fil.read())
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            _, classes, _ = read_js(write_input(tmp_dir, "test.js"), None)
+            STATS.clear()
+            gen_ts(MemorySink(), classes, jobs=1)
+        self.assertEqual(STATS["rewrite.lines"], sum(len(method.body) for item in classes for method in item.methods))
+        STATS.clear()
+
+    def test_gen_ts_incremental(self):
+        """Only the files whose inputs have changed are regenerated"""
+        used, _, item = sample_defs()
+
+        with tempfile.TemporaryDirectory() as out_dir:
+            used_ts = os.path.join(out_dir, "src", "Acme/Util/Used.ts")
+            skipped = gen_ts(out_dir, [used, item], incremental=True)
+            self.assertTrue(os.path.exists(os.path.join(out_dir, CACHE_FILE)))
+
+            with patch("src.output.write_file", wraps=write_file) as written:
+                self.assertEqual(gen_ts(out_dir, [used, item], incremental=True), skipped)
+                written.assert_not_called()
+
+                item.methods[0].body = ["\treturn null;"]
+                gen_ts(out_dir, [used, item], incremental=True)
+                self.assertEqual([call.args[0] for call in written.call_args_list], [os.path.join(out_dir, "src", "Acme/App/Main.ts")])
+                self.assertNotIn("Used", written.call_args.args[1])
+
+            gen_ts(out_dir, [item], incremental=True)
+            self.assertFalse(os.path.exists(used_ts))
+
+    def test_copy_tpl(self):
+        """Only templates with keywords are rewritten and identical files are left untouched"""
+        with tempfile.TemporaryDirectory() as tpl_dir, tempfile.TemporaryDirectory() as out_dir:
+            os.makedirs(os.path.join(tpl_dir, "src"))
+            with open(os.path.join(tpl_dir, "package.json"), "wb") as fil:
+                fil.write(b'{\r\n  "name": "{{LIBNAME}}",\r\n  "main": "{{FILENAME}}"\r\n}\r\n')
+            with open(os.path.join(tpl_dir, "src", "plain.ts"), "wb") as fil:
+                fil.write(b"export default 1;\n")
+            with open(os.path.join(tpl_dir, "src", "index.ts"), "wb") as fil:
+                fil.write(b"export {};\n")
+
+            copy_tpl(out_dir, "Acme", "acme", link=True, tpl_dir=tpl_dir, exclude={"src/index.ts"})
+
+            with open(os.path.join(out_dir, "package.json"), "rb") as fil:
+                self.assertEqual(fil.read(), b'{\n  "name": "acme",\n  "main": "Acme.js"\n}\n')
+            self.assertTrue(os.path.samefile(os.path.join(tpl_dir, "src", "plain.ts"), os.path.join(out_dir, "src", "plain.ts")))
+            self.assertFalse(os.path.exists(os.path.join(out_dir, "src", "index.ts")))
+
+            with patch("src.output.write_file", wraps=write_file) as written, patch("shutil.copyfile") as copied:
+                copy_tpl(out_dir, "Acme", "acme", tpl_dir=tpl_dir, exclude={"src/index.ts"})
+                self.assertEqual(written.call_count, 1)
+                copied.assert_not_called()
+
+            with open(os.path.join(out_dir, "package.json"), "rb") as fil:
+                self.assertIn(b"acme", fil.read())
+
+            write_file(os.path.join(out_dir, "src", "plain.ts"), "export default 2;\n")
+            with open(os.path.join(tpl_dir, "src", "plain.ts")) as fil:
+                self.assertEqual(fil.read(), "export default 1;\n")
+
+    def test_output_sinks(self):
+        """The same project is written to a directory, a staging directory, an archive or memory (with or without worker processes)"""
+        used, _, item = sample_defs()
+
+        def generate(out, jobs=1):
+            copy_tpl(out, "Acme", "acme", tpl_dir=tpl_dir, exclude={"src/index.ts"})
+            gen_ts(out, [used, item], jobs=jobs)
+            gen_index(out, [used, item], ["Acme.App.Main.run();"])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tpl_dir = os.path.join(tmp_dir, "tpl")
+            os.makedirs(os.path.join(tpl_dir, "src"))
+            with open(os.path.join(tpl_dir, "package.json"), "w") as fil:
+                fil.write('{"name": "{{LIBNAME}}"}\n')
+            with open(os.path.join(tpl_dir, "src", "plain.ts"), "w") as fil:
+                fil.write("export default 1;\n")
+
+            expected = MemorySink()
+            generate(expected)
+            self.assertEqual(
+                sorted(expected.files), ["package.json", "src/Acme/App/Main.ts", "src/Acme/Util/Used.ts", "src/index.ts", "src/plain.ts"]
+            )
+            self.assertEqual(expected.files["package.json"], b'{"name": "acme"}\n')
+
+            sink = MemorySink()
+            generate(sink, jobs=2)
+            self.assertEqual(sink.files, expected.files)
+
+            def read_dir(out_dir):
+                files = {}
+                for src_dir, _, names in os.walk(out_dir):
+                    for name in names:
+                        with open(os.path.join(src_dir, name), "rb") as fil:
+                            files[os.path.relpath(os.path.join(src_dir, name), out_dir).replace(os.sep, "/")] = fil.read()
+                return files
+
+            out_dir = os.path.join(tmp_dir, "out")
+            with open_output(out_dir) as out:
+                generate(out)
+            self.assertEqual(read_dir(out_dir), expected.files)
+
+            with self.assertRaises(RuntimeError):
+                with open_output(out_dir, atomic=True) as out:
+                    gen_index(out, [], ["broken();"])
+                    raise RuntimeError("interrupted")
+            self.assertEqual(read_dir(out_dir), expected.files)
+            self.assertEqual(sorted(os.listdir(tmp_dir)), ["out", "tpl"])
+
+            with open_output(out_dir, atomic=True) as out:
+                gen_index(out, [], ["changed();"])
+                self.assertNotIn(b"changed", read_dir(out_dir)["src/index.ts"])
+            self.assertIn(b"changed", read_dir(out_dir)["src/index.ts"])
+            self.assertEqual(sorted(os.listdir(tmp_dir)), ["out", "tpl"])
+
+            for name in ("out.tar", "out.tar.gz", "out.zip"):
+                with open_output(os.path.join(tmp_dir, name)) as out:
+                    generate(out, jobs=2)
+                    with self.assertRaises(Exception):
+                        gen_ts(out, [used], incremental=True)
+                if name.endswith(".zip"):
+                    with zipfile.ZipFile(os.path.join(tmp_dir, name)) as archive:
+                        files = {info.filename: archive.read(info) for info in archive.infolist()}
+                else:
+                    with tarfile.open(os.path.join(tmp_dir, name)) as archive:
+                        files = {info.name: archive.extractfile(info).read() for info in archive.getmembers()}
+                self.assertEqual(files, expected.files)
+            self.assertFalse([name for name in os.listdir(tmp_dir) if name.endswith(".tmp")])
+
+    def test_timings(self):
+        """The time and work counters of each stage are reported (including those of worker processes)"""
+        used, _, item = sample_defs()
+        timings = Timings(True)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            js_file = write_input(tmp_dir, "test.js")
+
+            with timings.stage("read_js"):
+                read_js(js_file, None)
+            with timings.stage("gen_ts"):
+                gen_ts(tmp_dir, [used, item], jobs=2)
+
+            timings.write(os.path.join(tmp_dir, "timings.json"))
+            with open(os.path.join(tmp_dir, "timings.json")) as fil:
+                report = json.load(fil)
+
+        self.assertEqual(list(report["stages"]), ["read_js", "gen_ts"])
+        self.assertEqual(report["stages"]["read_js"]["counters"]["read_js.class_name"], 2)
+        self.assertGreater(report["stages"]["read_js"]["counters"]["regex.read_js"], 0)
+        self.assertEqual(report["stages"]["gen_ts"]["counters"]["files_written"], 2)
+        self.assertGreater(report["stages"]["gen_ts"]["counters"]["bytes_written"], 0)
+        self.assertGreaterEqual(report["stages"]["gen_ts"]["wall_seconds"], 0)
+        self.assertGreater(report["stages"]["gen_ts"]["process_peak_rss_mb"], 0)
+        self.assertGreaterEqual(report["stages"]["read_js"]["process_peak_rss_mb"], report["stages"]["read_js"]["peak_rss_growth_mb"])
+        self.assertGreaterEqual(report["stages"]["read_js"]["peak_rss_growth_mb"], 0)
+        self.assertTrue(report["hot_functions"])
+
+        for jobs in (1, 2):
+            timings = Timings()
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                read_model(write_input(tmp_dir, "test.js"), None, write_input(tmp_dir, "all.xml", SAMPLE_XML), jobs, timings)
+            self.assertEqual(list(timings.stages), ["read_js", "read_doc", "add_doc_info"])
+            self.assertEqual(timings.stages["read_js"]["counters"]["read_js.class_name"], 2)
+
+
+class TestBatch(unittest.TestCase):
+    """Unit tests for converting batches of assemblies and watching their inputs"""
+
+    def test_run_batch(self):
+        """Every assembly in a batch is converted, importing the classes of the other assemblies from their own projects"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.makedirs(os.path.join(tmp_dir, "tpl", "src"))
+            with open(os.path.join(tmp_dir, "tpl", "package.json"), "w") as fil:
+                fil.write('{"name": "{{LIBNAME}}"}\n')
+            write_input(tmp_dir, "acme.js")
+            with open(os.path.join(tmp_dir, "beta.js"), "w") as fil:
+                fil.write("\tss.initAssembly($asm, 'Beta.Lib');\n\t// Beta.Circle\n\tvar $Beta_Circle = function() {\n\t};\n")
+                fil.write("\tss.initClass($Beta_Circle, $asm, {}, $Acme_Shape);\n")
+            with open(os.path.join(tmp_dir, "empty.xml"), "w") as fil:
+                fil.write("<doxygen></doxygen>\n")
+            with open(os.path.join(tmp_dir, "manifest.txt"), "w") as fil:
+                fil.write("# js xml out ns\nacme.js empty.xml out/acme Acme\n\nbeta.js empty.xml out/beta Beta -\n")
+
+            batch = read_manifest(os.path.join(tmp_dir, "manifest.txt"))
+            self.assertEqual([(job.ns_name, job.ignfile) for job in batch], [("Acme", None), ("Beta", None)])
+            self.assertEqual(batch[1].js_file, os.path.join(tmp_dir, "beta.js"))
+
+            run_batch(batch, 2, tpl_dir=os.path.join(tmp_dir, "tpl"))
+
+            with open(os.path.join(tmp_dir, "out", "beta", "package.json")) as fil:
+                self.assertEqual(fil.read(), '{"name": "Beta"}\n')
+            with open(os.path.join(tmp_dir, "out", "acme", "src", "Acme", "Square.ts")) as fil:
+                self.assertIn("import $Acme_Shape from '../Acme/Shape';", fil.read())
+            with open(os.path.join(tmp_dir, "out", "beta", "src", "Beta", "Circle.ts")) as fil:
+                self.assertIn("import $Acme_Shape from '../../../acme/src/Acme/Shape';", fil.read())
+            self.assertFalse(os.path.exists(os.path.join(tmp_dir, "out", "beta", "src", "Acme")))
+
+            symbols = read_symbols(os.path.join(tmp_dir, "out", "acme"))
+            self.assertEqual(symbols.asm_name, "Acme.Lib")
+            self.assertEqual([item[3] for item in symbols.classes], ["$Acme_Shape", "$Acme_Square"])
+
+            shutil.rmtree(os.path.join(tmp_dir, "out", "beta"))
+            run_batch(batch[1:], 1, tpl_dir=os.path.join(tmp_dir, "tpl"), symbols=[symbols])
+            with open(os.path.join(tmp_dir, "out", "beta", "src", "Beta", "Circle.ts")) as fil:
+                self.assertIn("import $Acme_Shape from '../../../acme/src/Acme/Shape';", fil.read())
+
+            with open(os.path.join(tmp_dir, "manifest.txt"), "a") as fil:
+                fil.write("acme.js empty.xml out/acme/ Acme\n")
+            self.assertRaises(Exception, read_manifest, os.path.join(tmp_dir, "manifest.txt"))
+
+    def test_watcher(self):
+        """The project is regenerated from the changed inputs once they stop changing"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.makedirs(os.path.join(tmp_dir, "tpl", "src"))
+            js_file = write_input(tmp_dir, "test.js")
+            xml_file = write_input(tmp_dir, "all.xml", SAMPLE_XML)
+
+            ign_file = write_input(tmp_dir, "ign.txt", "Acme.Square\n")
+            rules = read_ignore_rules(ign_file)
+
+            STATS.clear()
+            job = BatchJob(js_file, xml_file, os.path.join(tmp_dir, "out"), "Acme", ign_file)
+            watcher = Watcher(job, 1, tpl_dir=os.path.join(tmp_dir, "tpl"))
+            watcher.build()
+            self.assertIsNone(watcher.poll())
+            self.assertEqual(rules.report(), [("Acme.Square", 1)])
+
+            write_input(tmp_dir, "test.js", SAMPLE_JS.replace("this.size * this.size", "this.size * 2"))
+            with patch("src.watch.read_doc") as read:
+                self.assertIsNone(watcher.poll())
+                self.assertEqual(watcher.poll(), {"js"})
+                read.assert_not_called()
+
+            with open(os.path.join(tmp_dir, "out", "src", "Acme", "Shape.ts")) as fil:
+                content = fil.read()
+            self.assertIn("this.size * 2", content)
+            self.assertIn("The size.", content)
+            self.assertEqual(rules.report(), [("Acme.Square", 1)])
+
+            write_input(tmp_dir, "all.xml", SAMPLE_XML.replace("The size.", "The new size."))
+            with patch("src.watch.read_doc", side_effect=ValueError("truncated")):
+                self.assertIsNone(watcher.poll())
+                with self.assertRaises(ValueError):
+                    watcher.poll()
+                self.assertIsNone(watcher.poll())
+
+            write_input(tmp_dir, "test.js")
+            self.assertIsNone(watcher.poll())
+            self.assertEqual(watcher.poll(), {"js", "xml"})
+            with open(os.path.join(tmp_dir, "out", "src", "Acme", "Shape.ts")) as fil:
+                self.assertIn("The new size.", fil.read())
+            self.assertEqual(rules.report(), [("Acme.Square", 1)])
+            STATS.clear()
 
 
 if __name__ == "__main__":